@@ -13,8 +13,9 @@ class Simulator(QMainWindow, Ui_Simulator):
     displayMessage    (str)    (bool) emitSafetySignal
     hover                ()    (int)       indicatorOn
     moveAway             ()    (int)      indicatorOff
-    QPushButton.pressed  ()    
-    QPushButton.released ()
+    QPushButton.pressed  ()    (str, float)    showLag
+    QPushButton.released ()    (RXBatch)  showReceived
+                               (int, float)   showLink
     safetySet            ()
     safetyReleased       ()
     """
@@ -83,6 +84,12 @@ class Simulator(QMainWindow, Ui_Simulator):
         super(Simulator, self).__init__(*args, **kwargs)
         self.setupUi(self)
         self.status_bar.addWidget(QLabel("READY"))
+        self.lags = {} # Latest event loop lag of each monitored thread in whole milliseconds
+        self.lagMonitors = {}
+        self.lagLabel = QLabel()
+        self.status_bar.addPermanentWidget(self.lagLabel)
+        self.linkLabel = QLabel()
+        self.status_bar.addPermanentWidget(self.linkLabel)
         self.displayMessage.connect(lambda msg: self.status_bar.showMessage(msg, 5000)) # Temporary messages show for 5 seconds
         self.buttons = {"semi":self.semiButton, "burst":self.burstButton, "auto":self.autoButton, "trigger":self.trigger, "safety":self.safetyButton}
         self.safetyButton.clicked.connect(self.emitSafetySignal)
@@ -194,6 +201,71 @@ class Simulator(QMainWindow, Ui_Simulator):
         else:
             self.displayMessage.emit("ERROR: Invalid indicator number passed to indicatorOff()")
     
+    def watchLag(self, monitor):
+        """METHOD: watchLag
+                
+        Shows a thread's event loop lag in the status bar
+                
+        Called by:
+            MainWindow.__init__
+                
+        Arguments:
+            LagMonitor - The monitor of the thread
+                
+        Returns:
+            none
+        """
+        self.lagMonitors[monitor.name] = monitor
+        monitor.lagMeasured.connect(self.showLag)
+    
+    def showLag(self, name, lag):
+        """SLOT: showLag
+                
+        Updates the lag shown in the status bar, only touching the label when a displayed value changes
+                
+        Expects:
+            str - The name of the monitored thread
+            float - How late its last heartbeat was in milliseconds
+                
+        Connects to:
+            LagMonitor.lagMeasured
+        """
+        lag = round(lag)
+        if self.lags.get(name) != lag:
+            self.lags[name] = lag
+            self.lagLabel.setText("lag " + " | ".join(f"{n} {l} ms" for n, l in self.lags.items()))
+            self.lagLabel.setToolTip("\n".join(m.summary() for m in self.lagMonitors.values()))
+    
+    def showReceived(self, batch):
+        """SLOT: showReceived
+                
+        Shows the newest message of a batch received over serial and the status of the read
+                
+        Expects:
+            RXBatch - The messages from one read of the serial port
+                
+        Connects to:
+            MetroMini.received
+        """
+        self.serialRcvdMsg.setText(batch.messages[-1])
+        self.statusBar().showMessage(batch.status, 5000)
+    
+    def showLink(self, rate, throughput):
+        """SLOT: showLink
+                
+        Shows the negotiated baud rate and the throughput measured at it in the status bar
+                
+        Expects:
+            int - The baud rate
+            float - The measured throughput in bytes per second, or 0 if it wasn't measured
+                
+        Connects to:
+            MetroMini.linkChanged
+        """
+        measured = f", {throughput / 1000:.1f} kB/s measured" if throughput else ""
+        self.linkLabel.setText(f"{rate} baud{measured}")
+        self.linkLabel.setToolTip(f"Nominal {rate / 10000:.1f} kB/s (10 bits per byte)")
+    
     def getSerialOutput(self):
         """METHOD: getSerialOutput
                 
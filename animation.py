@@ -0,0 +1,179 @@
+import numpy as np
+from enum import IntEnum
+from colors import hsvToRgb
+
+RING_SIZE = 24 # Number of NeoPixels in the front ring
+
+class Animation(IntEnum):
+    """ENUM: Animation
+
+    Integers representing different animation modes
+    """
+    STATIC = 0
+    BREATHE = 1
+    CYCLE = 2
+    SOLID_SPIN = 3
+    FADE_SPIN = 4
+    RAINBOW_SPIN = 5
+
+class Color(IntEnum):
+    """ENUM: Color
+
+    Integers representing different color schemes for the pixel ring
+    """
+    SINGLE = 0
+    RAINBOW = 1
+    RGB = 2
+    YCM = 3
+    RYGCBM = 4
+
+PALETTES = {Color.RGB: np.array([0.0, 120.0, 240.0]),
+            Color.YCM: np.array([60.0, 180.0, 300.0]),
+            Color.RYGCBM: np.array([0.0, 60.0, 120.0, 180.0, 240.0, 300.0])} # Hues in degrees for the multi-color schemes
+
+class RingAnimator:
+    """CLASS: RingAnimator
+
+    This class computes the colors of all 24 pixels in the front ring at any point in an animation, mirroring what the Metro Mini displays.
+    """
+
+    def __init__(self):
+        self.positions = np.arange(RING_SIZE, dtype=np.float32)
+        self.configure(Animation.STATIC, 24, False, 5, True, Color.SINGLE, 0, 0.5)
+
+    def configure(self, pattern, count, alternate, period, clockwise, scheme, hue, step):
+        """METHOD: configure
+
+        Stores new animation settings and precomputes everything that doesn't change between frames
+
+        Called by:
+            __init__, RingTool.updatePreview
+
+        Arguments:
+            int - The enum value of the animation pattern
+            int - The number of pixels that are on
+            bool - Whether the alternate layout is used
+            float - The animation time in seconds
+            bool - Whether spinning patterns rotate clockwise
+            int - The enum value of the color scheme
+            float - The hue in degrees for the single color scheme
+            float - The time in seconds between color steps
+
+        Returns:
+            none
+        """
+        self.pattern, self.scheme = pattern, scheme
+        self.period = max(float(period), 0.1)
+        self.step = max(float(step), 0.1)
+        self.direction = 1.0 if clockwise else -1.0
+        if pattern == Animation.RAINBOW_SPIN:
+            count = RING_SIZE
+        self.spacing = RING_SIZE // count
+        self.offset = self.spacing // 2 if alternate else 0
+        self.mask = (np.arange(RING_SIZE) - self.offset) % self.spacing == 0
+        self.order = np.cumsum(self.mask) - 1 # Position of each lit pixel within the layout, used to spread palettes across the ring
+        if scheme == Color.SINGLE:
+            self.hues = np.full(RING_SIZE, float(hue), dtype=np.float32)
+        else:
+            self.hues = self.positions * (360.0 / RING_SIZE)
+
+    def isAnimated(self):
+        """METHOD: isAnimated
+
+        Tells whether frames change over time with the current settings
+
+        Called by:
+            RingPreview.restart
+
+        Arguments:
+            none
+
+        Returns:
+            bool - Whether the frames are time dependent
+        """
+        return self.pattern != Animation.STATIC or self.scheme in PALETTES
+
+    def frame(self, t):
+        """METHOD: frame
+
+        Computes the colors of the ring at a given time
+
+        Called by:
+            RingPreview.nextFrame, FrameStreamer.sendFrame
+
+        Arguments:
+            float - The time in seconds since the animation began
+
+        Returns:
+            ndarray - A (24, 3) array of 8-bit red, green, and blue values
+        """
+        cycle = (t / self.period) % 1.0
+        hues = self.hues
+        if self.scheme in PALETTES and self.pattern != Animation.RAINBOW_SPIN:
+            palette = PALETTES[self.scheme]
+            hues = palette[(self.order + int(t / self.step)) % len(palette)]
+
+        if self.pattern == Animation.STATIC:
+            brightness = self.mask.astype(np.float32)
+        elif self.pattern == Animation.BREATHE:
+            brightness = self.mask * np.float32(0.5 - 0.5 * np.cos(2.0 * np.pi * cycle))
+        elif self.pattern == Animation.SOLID_SPIN:
+            brightness = np.roll(self.mask, int(self.direction * cycle * RING_SIZE)).astype(np.float32)
+            hues = np.roll(hues, int(self.direction * cycle * RING_SIZE))
+        elif self.pattern == Animation.FADE_SPIN:
+            phase = (self.direction * (self.positions - self.offset) - cycle * RING_SIZE) % self.spacing
+            brightness = np.clip(1.0 - phase / self.spacing, 0.0, 1.0) # Each lit pixel leads a tail that fades out before the next one
+        else:
+            brightness = np.ones(RING_SIZE, dtype=np.float32)
+            hues = (self.hues + self.direction * cycle * 360.0) % 360.0
+        return hsvToRgb(hues, 1.0, brightness)
+
+class PixelAnimator:
+    """CLASS: PixelAnimator
+
+    This class computes the color of a single side NeoPixel at any point in an animation, mirroring what the Metro Mini displays.
+    """
+
+    def __init__(self):
+        self.configure(Animation.STATIC, (0, 0, 0), 1)
+
+    def configure(self, mode, rgb, period):
+        """METHOD: configure
+
+        Stores new animation settings
+
+        Called by:
+            __init__, PixelTool.updateAnimator
+
+        Arguments:
+            int - The enum value of the animation mode
+            tuple - The red, green, and blue values of the color
+            float - The animation time in seconds
+
+        Returns:
+            none
+        """
+        self.mode = mode
+        self.rgb = np.array(rgb, dtype=np.float32)
+        self.period = max(float(period), 1.0)
+
+    def frame(self, t):
+        """METHOD: frame
+
+        Computes the color of the pixel at a given time
+
+        Called by:
+            FrameStreamer.sendFrame
+
+        Arguments:
+            float - The time in seconds since the animation began
+
+        Returns:
+            ndarray - A (1, 3) array of 8-bit red, green, and blue values
+        """
+        cycle = (t / self.period) % 1.0
+        if self.mode == Animation.CYCLE:
+            return hsvToRgb(np.array([cycle * 360.0]), 1.0, 1.0)
+        if self.mode == Animation.BREATHE:
+            return (self.rgb * (0.5 - 0.5 * np.cos(2.0 * np.pi * cycle)) + 0.5).astype(np.uint8)[None, :]
+        return self.rgb.astype(np.uint8)[None, :]
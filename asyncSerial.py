@@ -0,0 +1,347 @@
+import os, tty, termios, asyncio
+from PyQt5.QtCore import QObject, QSocketNotifier, QTimer, QMutex
+from signalTracer import tracer
+from flightRecorder import recorder, Event
+from metroMini import MetroMini, BAUD_RATE
+from baudNegotiator import BaudNegotiator
+from deliveryWindow import DeliveryWindow
+from commands import Priority
+
+TICK_INTERVAL = 20 # Milliseconds between runs of the asyncio loop when no file descriptor is ready, which bounds timeout accuracy
+READ_SIZE = 4096 # Bytes taken from the tty per read
+HANDSHAKE_TIMEOUT = 10.0 # Seconds to wait for the Metro Mini's ready message and the baud negotiation before saying so
+WRITE_TIMEOUT = 1.0 # Seconds a message may take to leave the tty before it's abandoned
+
+class EventLoopDriver(QObject):
+    """CLASS: EventLoopDriver
+
+    This class runs an asyncio event loop inside the Qt event loop. Each tick runs one pass of the asyncio loop without blocking: the
+    callbacks that are due and any file descriptors that are ready. Ticks come from socket notifiers the moment a file descriptor is
+    ready, and from a slow timer so coroutine timeouts still expire. The timer only runs while a coroutine is waiting with a timeout,
+    so an idle link, or no link at all, doesn't wake the CPU every tick.
+
+    SIGNALS            SLOTS
+    -------    -------------
+    none       ()       tick
+    """
+
+    def __init__(self, interval = TICK_INTERVAL):
+        super().__init__()
+        self.loop = asyncio.new_event_loop()
+        self.waiting = 0 # Coroutines in waitFor, which are the only reason for the timer to run
+        self.timer = QTimer(self)
+        self.timer.setInterval(interval)
+        self.timer.timeout.connect(self.tick)
+
+    def tick(self):
+        """SLOT: tick
+
+        Runs one non-blocking pass of the asyncio loop. A tick asked for from inside a pass (by a signal a callback emitted, for
+        example) runs as soon as control is back in the Qt event loop.
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout (timer), QSocketNotifier.activated (AsyncMetroMini.readNotifier, AsyncMetroMini.writeNotifier)
+        """
+        if self.loop.is_running():
+            QTimer.singleShot(0, self.tick)
+            return
+        self.loop.call_soon(self.loop.stop) # Stops after everything that's ready now has run
+        self.loop.run_forever()
+
+    def spawn(self, coroutine):
+        """METHOD: spawn
+
+        Starts a coroutine on the asyncio loop
+
+        Called by:
+            AsyncMetroMini.begin
+
+        Arguments:
+            coroutine - The coroutine to run
+
+        Returns:
+            asyncio.Task - Its task
+        """
+        task = self.loop.create_task(coroutine)
+        self.tick()
+        return task
+
+    async def waitFor(self, awaitable, timeout):
+        """COROUTINE: waitFor
+
+        Waits for an awaitable like asyncio.wait_for, keeping the timer running meanwhile so the timeout can expire
+        """
+        self.waiting += 1
+        self.timer.start()
+        try:
+            return await asyncio.wait_for(awaitable, timeout)
+        finally:
+            self.waiting -= 1
+            if not self.waiting:
+                self.timer.stop()
+
+    def stop(self):
+        """METHOD: stop
+
+        Cancels every task, lets them finish and closes the asyncio loop
+
+        Called by:
+            AsyncMetroMini.closePort
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        self.timer.stop()
+        tasks = asyncio.all_tasks(self.loop)
+        for task in tasks:
+            task.cancel()
+        self.loop.run_until_complete(asyncio.gather(*tasks, return_exceptions = True))
+        self.loop.close()
+
+def openPort(path, baudRate = BAUD_RATE):
+    """FUNCTION: openPort
+
+    Opens a tty for non-blocking reads and writes of raw bytes
+
+    Arguments:
+        str - The path of the tty
+        int - The baud rate
+
+    Returns:
+        int - The file descriptor
+    """
+    fd = os.open(path, os.O_RDWR | os.O_NOCTTY | os.O_NONBLOCK)
+    tty.setraw(fd)
+    attributes = termios.tcgetattr(fd)
+    attributes[2] |= termios.CLOCAL | termios.CREAD # Ignore modem control lines and enable the receiver
+    termios.tcsetattr(fd, termios.TCSANOW, attributes)
+    setSpeed(fd, baudRate)
+    return fd
+
+def setSpeed(fd, baudRate):
+    """FUNCTION: setSpeed
+
+    Changes the baud rate of a tty once everything already written to it has been sent
+
+    Arguments:
+        int - The file descriptor
+        int - The baud rate
+
+    Returns:
+        none
+    """
+    attributes = termios.tcgetattr(fd)
+    attributes[4] = attributes[5] = getattr(termios, "B" + str(baudRate))
+    termios.tcsetattr(fd, termios.TCSADRAIN, attributes)
+
+class AsyncMetroMini(MetroMini):
+    """CLASS: AsyncMetroMini
+
+    This class talks to the Metro Mini from the GUI thread on an asyncio loop instead of from a QThread. Reads happen when the tty's
+    file descriptor is readable, writes are queued to one coroutine that drains them without blocking, and the handshake and write
+    timeouts are coroutines too. It has the same signals and slots as MetroMini, so the rest of the program can't tell the two
+    apart, but it saves the second thread, its event loop and the queued signals between them on the single-core BeagleBone.
+
+    SIGNALS                                 SLOTS
+    ------------------------    -----------------
+    (see MetroMini)             ()          begin
+                                ()      closePort
+                                ()       readData
+    """
+
+    def begin(self):
+        """SLOT: begin
+
+        Opens the serial port and starts the coroutines that write to it and wait for the handshake
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.singleShot (MainWindow.__init__)
+        """
+        path = self.findPort()
+        self.fd = None
+        self.negotiator = BaudNegotiator(self, BAUD_RATE, self.preferredRate)
+        self.negotiator.finished.connect(self.negotiated)
+        self.delivery = DeliveryWindow(self, self.shadow, self.windowSize)
+        self.delivery.finished.connect(self.acknowledging)
+        self.lock = QMutex(QMutex.Recursive) # Never contended here, but writeData is MetroMini's
+        self.driver = EventLoopDriver()
+        if path is None:
+            self.displayRXMessage.emit("No serial connected")
+            self.ready.emit()
+        else:
+            self.fd = openPort(path)
+            self.buffer = b""
+            self.outbox = asyncio.PriorityQueue()
+            self.sequence = 0
+            self.heardReady = asyncio.Event()
+            self.ready.connect(self.heardReady.set)
+            self.driver.loop.add_reader(self.fd, self.readData)
+            self.readNotifier = QSocketNotifier(self.fd, QSocketNotifier.Read, self)
+            self.readNotifier.activated.connect(self.driver.tick)
+            self.writeNotifier = QSocketNotifier(self.fd, QSocketNotifier.Write, self)
+            self.writeNotifier.setEnabled(False) # Only while a write is waiting, since a tty is writable nearly all the time
+            self.writeNotifier.activated.connect(self.driver.tick)
+            self.driver.spawn(self.sendQueued())
+            self.driver.spawn(self.handshake())
+            self.close.connect(self.closePort)
+        tracer.connect(self.broadcast, self.writeData, "broadcast")
+
+    def closePort(self):
+        """SLOT: closePort
+
+        Stops the coroutines and closes the serial port
+
+        Expects:
+            none
+
+        Connects to:
+            close
+        """
+        self.readNotifier.setEnabled(False)
+        self.writeNotifier.setEnabled(False)
+        self.driver.loop.remove_reader(self.fd)
+        self.driver.stop()
+        os.close(self.fd)
+        self.fd = None
+
+    def supportsRate(self, rate):
+        """METHOD: supportsRate
+
+        Checks whether termios has a constant for a baud rate, which rules out nonstandard rates such as 250000
+
+        Called by:
+            BaudNegotiator.start, BaudNegotiator.propose
+
+        Arguments:
+            int - The baud rate
+
+        Returns:
+            bool - Whether the rate can be tried
+        """
+        return hasattr(termios, "B" + str(rate))
+
+    def setLinkRate(self, rate):
+        """METHOD: setLinkRate
+
+        Changes the baud rate of the tty
+
+        Called by:
+            BaudNegotiator.handle, BaudNegotiator.fail
+
+        Arguments:
+            int - The new baud rate
+
+        Returns:
+            none
+        """
+        setSpeed(self.fd, rate)
+
+    def readData(self):
+        """SLOT: readData
+
+        Reads everything the tty has without blocking
+
+        Expects:
+            none
+
+        Connects to:
+            asyncio reader callback (driver.loop)
+        """
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return
+        self.parse(data)
+
+    def transmit(self, msg, text = None):
+        """METHOD: transmit
+
+        Queues a message for the serial port
+
+        Called by:
+            MetroMini.writeData, DeliveryWindow.fill
+
+        Arguments:
+            Command - The message
+            str - Its text numbered to be acknowledged, or None to send the message as it encodes itself
+
+        Returns:
+            none
+        """
+        data = msg.encode() if text is None else text.encode("ascii")
+        text = msg.text() if text is None else text
+        recorder.record(Event.SERIAL_TX, text = text)
+        if self.fd is not None:
+            self.sequence += 1
+            self.outbox.put_nowait((msg.priority, self.sequence, data)) # The sequence keeps messages of equal priority in order
+            self.driver.tick()
+        if msg.priority != Priority.REQUEST: # Requests prevent all others from being visible, and we know they're sent if values are coming back
+            self.displayTXMessage.emit(text)
+
+    async def sendQueued(self):
+        """COROUTINE: sendQueued
+
+        Writes queued messages one at a time, so a message that only partly fits in the tty's buffer isn't interleaved with the next.
+        Negotiation messages go before settings, and settings before requests and frames.
+        """
+        while True:
+            priority, sequence, data = await self.outbox.get()
+            try:
+                written = os.write(self.fd, data) # Usually all of it, in the pass that queued it rather than the next one
+            except BlockingIOError:
+                written = 0
+            try:
+                if written < len(data):
+                    await self.driver.waitFor(self.drain(data[written:]), WRITE_TIMEOUT)
+            except asyncio.TimeoutError:
+                self.printStatus.emit(f"Serial write timed out after {WRITE_TIMEOUT:.0f} s: {data!r}")
+            else:
+                self.printStatus.emit("Serial write complete")
+
+    async def drain(self, data):
+        """COROUTINE: drain
+
+        Writes bytes to the tty, waiting for it to become writable whenever its buffer is full
+        """
+        view = memoryview(data)
+        while view:
+            try:
+                view = view[os.write(self.fd, view):]
+            except BlockingIOError:
+                pass
+            if view:
+                await self.writable()
+
+    async def writable(self):
+        """COROUTINE: writable
+
+        Waits until the tty can take more bytes
+        """
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        loop.add_writer(self.fd, lambda: ready.done() or ready.set_result(None))
+        self.writeNotifier.setEnabled(True)
+        try:
+            await ready
+        finally:
+            loop.remove_writer(self.fd)
+            self.writeNotifier.setEnabled(False)
+
+    async def handshake(self):
+        """COROUTINE: handshake
+
+        Reports a Metro Mini that doesn't announce itself in time
+        """
+        try:
+            await self.driver.waitFor(self.heardReady.wait(), HANDSHAKE_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.printStatus.emit(f"No ready message from the Metro Mini after {HANDSHAKE_TIMEOUT:.0f} s")
@@ -0,0 +1,149 @@
+import time
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from commands import LinkRate, Echo
+
+BAUD_RATES = (57600, 115200, 250000) # Tried in order after the handshake, each only once the one before it has passed
+ACK_TIMEOUT = 500 # Milliseconds the Metro Mini has to agree to a rate, after which it's assumed not to support the rate or the command
+ECHO_TIMEOUT = 500 # Milliseconds the echo test may take at a new rate
+REVERT_DELAY = 1200 # Milliseconds to wait after a failed echo, by which time the Metro Mini has gone back to the last good rate
+ECHO_PATTERN = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ" # Every character the protocol uses
+
+class BaudNegotiator(QObject):
+    """CLASS: BaudNegotiator
+
+    This class raises the baud rate of the serial link once the Metro Mini has said it's ready. For each rate it sends
+    "baud <rate>;", and the Metro Mini answers "baud <rate>" at the old rate and switches. Both sides then test the new rate with
+    "echo <pattern>;", which the Metro Mini sends back as "echo <pattern>". A rate that isn't echoed correctly within ECHO_TIMEOUT is
+    abandoned and both sides go back to the last good rate (the Metro Mini does this on its own if it hasn't seen a good echo within
+    a second of switching). Firmware that doesn't answer "baud" at all just stays at the starting rate.
+
+    The last good rate from the previous run is tried first. If it fails, the rates below it are tried from the bottom.
+
+    SIGNALS                         SLOTS
+    ---------------------    ------------
+    finished (int, float)    ()   timeout
+    """
+
+    finished = pyqtSignal(int, float)
+    """SIGNAL: finished
+
+    Announces the rate the link settled on
+
+    Broadcasts:
+        int - The baud rate
+        float - The throughput measured by the last echo test in bytes per second, or 0 if no rate passed one
+
+    Connects to:
+        MetroMini.negotiated
+    """
+
+    def __init__(self, serial, startRate, preferredRate):
+        super().__init__()
+        self.serial = serial
+        self.good = startRate
+        self.preferred = preferredRate
+        self.throughput = 0.0
+        self.plan = []
+        self.state = None # "ack" while waiting for the Metro Mini to agree, "echo" while testing, "revert" after a failure
+        self.rate = None
+        self.sentAt = 0.0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.timeout)
+
+    def start(self):
+        """METHOD: start
+
+        Begins trying faster rates
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        if self.preferred > self.good and self.serial.supportsRate(self.preferred):
+            self.plan = [self.preferred] + [r for r in BAUD_RATES if r > self.preferred]
+        else:
+            self.plan = [r for r in BAUD_RATES if r > self.good]
+        self.propose()
+
+    def active(self):
+        return self.state is not None
+
+    def propose(self):
+        self.plan = [r for r in self.plan if self.serial.supportsRate(r)]
+        if not self.plan:
+            return self.finish()
+        self.rate = self.plan.pop(0)
+        self.state = "ack"
+        self.serial.writeData(LinkRate(self.rate))
+        self.timer.start(ACK_TIMEOUT)
+
+    def handle(self, msg):
+        """METHOD: handle
+
+        Checks whether a message belongs to the negotiation, and acts on it if it does
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            str - A message from the Metro Mini
+
+        Returns:
+            bool - Whether the message was part of the negotiation
+        """
+        if self.state == "ack" and msg == f"baud {self.rate}":
+            self.serial.setLinkRate(self.rate)
+            self.state = "echo"
+            self.sentAt = time.monotonic()
+            self.serial.writeData(Echo(ECHO_PATTERN))
+            self.timer.start(ECHO_TIMEOUT)
+            return True
+        if self.state == "echo":
+            if msg == f"echo {ECHO_PATTERN}":
+                elapsed = time.monotonic() - self.sentAt
+                self.throughput = (2 * len(ECHO_PATTERN) + 12) / elapsed # Both directions, with the command and line endings
+                self.good = self.rate
+                self.timer.stop()
+                self.propose()
+            elif msg.startswith("echo"):
+                self.fail()
+            return True # Anything else at this point is noise from the switch
+        return self.state == "revert"
+
+    def timeout(self):
+        """SLOT: timeout
+
+        Gives up on a rate the Metro Mini didn't agree to or echo, or carries on once it has had time to go back to the last good rate
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout (timer)
+        """
+        if self.state == "ack":
+            self.finish()
+        elif self.state == "echo":
+            self.fail()
+        elif self.state == "revert":
+            if self.rate == self.preferred and self.preferred > self.good: # The remembered rate failed, so start from the bottom
+                self.plan = [r for r in BAUD_RATES if self.good < r < self.preferred]
+                self.propose()
+            else:
+                self.finish()
+
+    def fail(self):
+        self.serial.setLinkRate(self.good)
+        self.state = "revert"
+        self.timer.start(REVERT_DELAY)
+
+    def finish(self):
+        self.timer.stop()
+        self.state = None
+        self.finished.emit(self.good, self.throughput)
@@ -0,0 +1,425 @@
+"""Benchmarks for the blaster GUI
+
+Each benchmark builds the real main window and reports timings for one hot path. They can run without a display:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks.py [name ...]
+"""
+
+import sys, json, time, statistics
+from collections import deque
+import numpy as np
+from PyQt5.QtCore import pyqtSignal, Qt, QByteArray, QObject, QEvent, QThread
+from PyQt5.QtWidgets import QApplication
+from animation import Animation, Color
+from colors import hsvValues, rgbToHsv, CACHE_SIZE
+from metroMini import BAUD_RATE
+from pixelTool import LIVE_LINK_SHARE
+from feedbackDisplay import DELAY_BEFORE_SET
+from telemetryRing import TelemetryRing
+from commands import PixelColor, PixelMode, RingPattern, SetTarget
+from shadowState import ShadowState
+
+PATTERN_CYCLES = 50 # Number of times every pattern is selected in the pattern change benchmark
+COLOR_SAMPLES = 10000 # Number of random colors converted in the color benchmark
+DRAG_TIME = 3.0 # Length in seconds of the simulated slider drag
+DRAG_EVENT_RATE = 60 # Slider values per second during the drag
+LATENCY_TARGET = 0.15 # Longest acceptable time in seconds between a slider change and the pixel message carrying it
+TAP_COUNT = 100 # Taps of the PSI up button in the tap storm benchmark
+TAP_RATES = (20, 200) # Taps per second: faster than the display settles, and faster than it repaints
+RX_MESSAGES = 20000 # Pressure readings pushed through MetroMini.readData in the serial burst benchmark
+RX_CHUNKS = (1, 16) # Messages per readyRead: one at a time, and a burst that arrived while the serial thread was busy
+HANDOFF_BURST = 100000 # Readings sent as fast as possible to measure handoff throughput
+HANDOFF_PACED = 5000 # Readings sent at HANDOFF_RATE to measure handoff latency
+HANDOFF_RATE = 2000 # Readings per second, far above what the Metro Mini sends
+ENCODE_SAMPLES = 100000 # Messages built in the encode benchmark
+
+class EventCounter(QObject):
+    """Counts the paint and style change events a widget receives"""
+
+    def __init__(self, widget):
+        super().__init__()
+        self.counts = {QEvent.Paint: 0, QEvent.StyleChange: 0}
+        widget.installEventFilter(self)
+
+    def eventFilter(self, obj, event):
+        if event.type() in self.counts:
+            self.counts[event.type()] += 1
+        return False
+
+class CallCounter(QObject):
+    """Counts the queued signal deliveries the GUI thread handles, and when it handled the last one"""
+
+    def __init__(self, app):
+        super().__init__()
+        self.count, self.last = 0, None
+        app.installEventFilter(self) # Application event filters only see the events of the GUI thread
+
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.MetaCall:
+            self.count += 1
+            self.last = time.perf_counter()
+        return False
+
+class FakePort(QObject):
+    """Stands in for the QSerialPort, handing out queued chunks of bytes one read at a time and dropping writes"""
+
+    readyRead = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = deque()
+
+    def readAll(self):
+        return QByteArray(self.chunks.popleft() if self.chunks else b"")
+
+    def write(self, data):
+        return len(data)
+
+    def bytesToWrite(self):
+        return 0
+
+class Producer(QObject):
+    """Sends readings from its own thread, either through a telemetry ring or as a queued signal like MetroMini used to"""
+
+    run = pyqtSignal(int, float, bool)
+    reading = pyqtSignal(float)
+
+    def __init__(self, ring):
+        super().__init__()
+        self.ring = ring
+        self.sent = []
+
+    def produce(self, count, interval, useRing):
+        start = time.monotonic()
+        for i in range(count):
+            wait = start + i * interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait) # Sleeping rather than spinning leaves the GIL to the GUI thread, as the serial port would
+            if useRing:
+                self.ring.push(float(i))
+            else:
+                self.sent.append(time.monotonic())
+                self.reading.emit(float(i))
+
+class TimedRing(TelemetryRing):
+    """A telemetry ring that records how long each reading waited before it was drained"""
+
+    def __init__(self):
+        super().__init__(lambda: 0.0)
+        self.latencies = []
+
+    def drain(self):
+        now = time.monotonic()
+        self.latencies.extend(now - self.times[n & self.mask] for n in range(max(self.tail, self.head - self.mask - 1), self.head))
+        super().drain()
+
+def report(name, samples, unit = "ms"):
+    """FUNCTION: report
+
+    Prints the mean, median and worst time of a set of samples
+
+    Arguments:
+        str - The name of the measurement
+        list - The samples in seconds
+        str - The unit to print, either ms or us
+
+    Returns:
+        none
+    """
+    scale = 1e3 if unit == "ms" else 1e6
+    print(f"{name:<40} mean {statistics.mean(samples) * scale:8.3f} {unit}   median {statistics.median(samples) * scale:8.3f} {unit}   "
+          f"max {max(samples) * scale:8.3f} {unit}   (n={len(samples)})")
+
+def patternChanges(app, window):
+    """FUNCTION: patternChanges
+
+    Times RingTool.patternChanged for every pattern, including the resulting polish and paint events, and compares the style
+    registry against setting every widget's style sheet the way the tools used to
+
+    Arguments:
+        QApplication - The running application
+        MainWindow - The window under test
+
+    Returns:
+        none
+    """
+    tool = window.frontTool
+    window.tabWidget.setCurrentWidget(window.led)
+    window.toolBox.setCurrentWidget(window.frontPattern)
+    app.processEvents()
+    order = [Animation.BREATHE, Animation.SOLID_SPIN, Animation.FADE_SPIN, Animation.RAINBOW_SPIN, Animation.STATIC]
+
+    polishes, saved = tool.styles.polishCount, tool.repaintsSaved
+    samples = []
+    for i in range(PATTERN_CYCLES):
+        for p in order:
+            start = time.perf_counter()
+            tool.patterns.button(p).click()
+            app.processEvents()
+            samples.append(time.perf_counter() - start)
+    report("pattern change (style registry)", samples)
+    print(f"{'':<40} {(tool.styles.polishCount - polishes) / len(samples):.1f} widgets re-polished and "
+          f"{(tool.repaintsSaved - saved) / len(samples):.1f} repaints saved per change")
+
+    with open("styles.json") as file:
+        styles = json.load(file)
+        file.close()
+    widgets = [*tool.aLabels, *tool.directions.buttons(), *tool.otherColors, *tool.sLabels, tool.alternateLayout]
+    samples = []
+    for i in range(PATTERN_CYCLES):
+        for p in order:
+            en = p != Animation.STATIC
+            start = time.perf_counter()
+            for w in widgets:
+                w.setStyleSheet(styles[type(w).__name__ + "-" + str(en)])
+            for w in tool.counts.buttons():
+                w.setStyleSheet(styles["LayoutCountButton-" + str(en)])
+            app.processEvents()
+            samples.append(time.perf_counter() - start)
+    report("style sheets only (previous approach)", samples)
+
+def colorConversions(app, window):
+    """FUNCTION: colorConversions
+
+    Times the RGB to HSV conversion for single colors, with and without the cache, and for whole arrays of pixels
+
+    Arguments:
+        QApplication - The running application (unused)
+        MainWindow - The window under test (unused)
+
+    Returns:
+        none
+    """
+    rgb = np.random.default_rng(0).integers(0, 256, (COLOR_SAMPLES, 3))
+    colors = [tuple(int(c) for c in p) for p in rgb]
+    hsvValues.cache_clear()
+    start = time.perf_counter()
+    for c in colors:
+        hsvValues.__wrapped__(*c)
+    report("single color, uncached", [(time.perf_counter() - start) / COLOR_SAMPLES], "us")
+    for c in colors[:CACHE_SIZE]:
+        hsvValues(*c)
+    start = time.perf_counter()
+    for i in range(COLOR_SAMPLES):
+        hsvValues(*colors[i % CACHE_SIZE])
+    report("single color, cached", [(time.perf_counter() - start) / COLOR_SAMPLES], "us")
+    samples = []
+    for i in range(20):
+        start = time.perf_counter()
+        rgbToHsv(rgb)
+        samples.append((time.perf_counter() - start) / COLOR_SAMPLES)
+    report("per pixel in an array", samples, "us")
+
+def sliderDrag(app, window):
+    """FUNCTION: sliderDrag
+
+    Drags a side pixel's red slider at the touchscreen's event rate and measures how long each color change waits before it's sent
+    and what share of the serial bandwidth the drag uses
+
+    Arguments:
+        QApplication - The running application
+        MainWindow - The window under test
+
+    Returns:
+        none
+    """
+    tool = window.leftTool
+    slider = tool.colorObjects[0]["slider"]
+    sent, changes = [], []
+    tool.sendToSerial.connect(lambda msg: sent.append((time.perf_counter(), msg)))
+
+    slider.setSliderDown(True)
+    start = time.perf_counter()
+    i = 0
+    while time.perf_counter() - start < DRAG_TIME:
+        i += 1
+        changes.append(time.perf_counter())
+        slider.setValue(i % 256)
+        deadline = time.perf_counter() + 1.0 / DRAG_EVENT_RATE
+        while time.perf_counter() < deadline:
+            app.processEvents()
+    slider.setSliderDown(False)
+    duration = time.perf_counter() - start
+
+    latencies, pending = [], 0
+    for t, msg in sent:
+        waiting = [c for c in changes[pending:] if c <= t]
+        if waiting:
+            latencies.append(t - waiting[0])
+            pending += len(waiting)
+    report("color latency during drag", latencies)
+    share = sum(len(msg.text()) for t, msg in sent) * 10 / BAUD_RATE / duration
+    print(f"{'':<40} {len(sent)} messages for {len(changes)} slider values, {share * 100:.1f}% of the link "
+          f"(targets: {LATENCY_TARGET * 1000:.0f} ms, {LIVE_LINK_SHARE * 100:.0f}%)")
+    tool.sendToSerial.disconnect()
+    tool.sendToSerial.connect(window.uc.broadcast)
+
+def tapStorm(app, window):
+    """FUNCTION: tapStorm
+
+    Taps the PSI up button much faster than the display settles and counts how often psiLCD is re-styled and repainted
+
+    Arguments:
+        QApplication - The running application
+        MainWindow - The window under test
+
+    Returns:
+        none
+    """
+    window.tabWidget.setCurrentWidget(window.status)
+    app.processEvents()
+    display, target = window.psiDisplay, window.psiDisplay.getTarget()
+    entries = [0]
+    display.upState.entered.connect(lambda: entries.__setitem__(0, entries[0] + 1))
+    for rate in TAP_RATES:
+        entries[0] = 0
+        counter = EventCounter(window.psiLCD)
+        start = time.perf_counter()
+        for i in range(TAP_COUNT):
+            window.PSIupButton.click()
+            deadline = start + (i + 1) / rate
+            while time.perf_counter() < deadline:
+                app.processEvents()
+        deadline = time.perf_counter() + DELAY_BEFORE_SET / 1000 + 0.2 # Let the display settle back to the measured value
+        while time.perf_counter() < deadline:
+            app.processEvents()
+
+        paints, styles = counter.counts[QEvent.Paint], counter.counts[QEvent.StyleChange]
+        print(f"{f'tap storm ({rate} taps/s)':<40} {entries[0]} state entries, {styles} style changes, {paints} repaints "
+              f"({paints / TAP_COUNT:.2f} per tap)")
+        window.psiLCD.removeEventFilter(counter)
+    display.target = target
+
+def serialBurst(app, window):
+    """FUNCTION: serialBurst
+
+    Pushes a burst of pressure readings through MetroMini.readData in the serial thread and counts the events the GUI thread has to
+    handle for them
+
+    Arguments:
+        QApplication - The running application
+        MainWindow - The window under test
+
+    Returns:
+        none
+    """
+    uc, port = window.uc, FakePort()
+    real = uc.serialPort
+    uc.serialPort, uc.buffer = port, b""
+    port.readyRead.connect(uc.readData) # Queued into the serial thread, like the real port's signal
+    parsed = [0]
+    count = lambda batch: parsed.__setitem__(0, parsed[0] + len(batch.messages)) # Runs in the serial thread
+    uc.received.connect(count, Qt.DirectConnection)
+    for size in RX_CHUNKS:
+        app.processEvents()
+        parsed[0] = 0
+        counter = CallCounter(app)
+        start = time.perf_counter()
+        for i in range(0, RX_MESSAGES, size):
+            port.chunks.append(b"".join(b"%.1f\r\n" % (60 + (i + j) % 7 * 0.5) for j in range(size)))
+            port.readyRead.emit()
+        while parsed[0] < RX_MESSAGES or time.perf_counter() - counter.last < 0.02: # Until the GUI thread has caught up
+            app.processEvents()
+        duration = counter.last - start
+        print(f"{f'serial burst ({size} per read)':<40} {RX_MESSAGES / duration:8.0f} messages/s   "
+              f"{counter.count / duration:8.0f} GUI events/s   {counter.count / RX_MESSAGES:.2f} GUI events per message")
+        app.removeEventFilter(counter)
+    port.readyRead.disconnect()
+    uc.received.disconnect(count)
+    uc.serialPort = real
+
+def handoff(app, window):
+    """FUNCTION: handoff
+
+    Compares the telemetry ring with a queued signal per reading for passing readings from another thread to the GUI thread,
+    both flat out and at a steady rate
+
+    Arguments:
+        QApplication - The running application
+        MainWindow - The window under test (unused)
+
+    Returns:
+        none
+    """
+    ring = TimedRing()
+    producer, thread = Producer(ring), QThread()
+    producer.moveToThread(thread)
+    producer.run.connect(producer.produce) # After the move, so it's queued into the producer's thread
+    thread.start()
+    latencies = []
+    producer.reading.connect(lambda i: latencies.append(time.monotonic() - producer.sent[int(i)]))
+
+    for useRing in (False, True):
+        path = "ring" if useRing else "signal"
+        for count, interval in ((HANDOFF_BURST, 0.0), (HANDOFF_PACED, 1 / HANDOFF_RATE)):
+            ring.latencies, producer.sent, latencies[:] = [], [], []
+            ring.overruns, end = 0, ring.head + count
+            done = ring.latencies if useRing else latencies
+            start = time.monotonic()
+            producer.run.emit(count, interval, useRing)
+            while (ring.tail < end) if useRing else (len(done) < count):
+                app.processEvents()
+            duration = time.monotonic() - start
+            if interval:
+                p = statistics.quantiles(done, n = 1000)
+                print(f"{f'handoff by {path} ({HANDOFF_RATE}/s)':<40} median {p[499] * 1e6:8.1f} us   p99 {p[989] * 1e6:8.1f} us   "
+                      f"p99.9 {p[998] * 1e6:8.1f} us   max {max(done) * 1e6:8.1f} us")
+            else:
+                overruns = f"   {ring.overruns} overwritten before the GUI drained them" if useRing else ""
+                print(f"{f'handoff by {path} (flat out)':<40} {count / duration:8.0f} readings/s{overruns}")
+    thread.quit()
+    thread.wait()
+
+def encoding(app, window):
+    """FUNCTION: encoding
+
+    Times building and encoding the most common messages as commands against the f-strings the tools used to build, and the
+    shadow state's check of each command
+
+    Arguments:
+        QApplication - The running application (unused)
+        MainWindow - The window under test (unused)
+
+    Returns:
+        none
+    """
+    rng = np.random.default_rng(0)
+    colors = [tuple(int(v) for v in c) for c in rng.integers(0, 256, (ENCODE_SAMPLES, 3))]
+    builds = {"pixel color": (lambda i, c: f"pixel {i & 1} {c[0] * 257} {c[1]} {c[2]};",
+                              lambda i, c: PixelColor(i & 1, c[0] * 257, c[1], c[2]).encode()),
+              "pixel mode": (lambda i, c: f"pixel {i & 1} " + ("breathe", "cycle")[c[0] & 1] + f" {c[1] + 1};",
+                             lambda i, c: PixelMode(i & 1, Animation.BREATHE + (c[0] & 1), c[1] + 1).encode()),
+              "ring pattern": (lambda i, c: f"ring spin {(1, 2, 3, 4)[c[0] & 3]}{''} {c[1]} {'clw' if c[2] & 1 else 'ccw'} rgb {float(c[2] / 2.0)};",
+                               lambda i, c: RingPattern(Animation.SOLID_SPIN, (1, 2, 3, 4)[c[0] & 3], False, c[1], bool(c[2] & 1), Color.RGB,
+                                                        float(c[2] / 2.0)).encode()),
+              "set target": (lambda i, c: "set {0};".format(float(c[0])), lambda i, c: SetTarget(c[0]).encode())}
+    for name, (old, new) in builds.items():
+        for label, build in (("f-string", old), ("command", new)):
+            start = time.perf_counter()
+            for i, c in enumerate(colors):
+                build(i, c)
+            report(f"{name} ({label})", [(time.perf_counter() - start) / ENCODE_SAMPLES], "us")
+    commands = [PixelColor(0, 0, 0, c[0] & 1) for c in colors] # Half of them repeat the color before
+    shadow = ShadowState()
+    start = time.perf_counter()
+    for cmd in commands:
+        shadow.update(cmd)
+    report("shadow check", [(time.perf_counter() - start) / ENCODE_SAMPLES], "us")
+    print(f"{'':<40} {shadow.summary()}")
+
+BENCHMARKS = {"patterns": patternChanges, "colors": colorConversions, "drag": sliderDrag, "taps": tapStorm, "serial": serialBurst, "handoff": handoff,
+              "encode": encoding}
+
+if __name__ == '__main__':
+    import main
+    app = QApplication(sys.argv)
+    window = main.MainWindow()
+    window.show()
+    app.processEvents()
+    window.buildLightingTools()
+    for name in sys.argv[1:] or BENCHMARKS.keys():
+        BENCHMARKS[name](app, window)
+    window.closeSerial.emit()
+    if window.thread is not None:
+        window.thread.quit()
+        window.thread.wait()
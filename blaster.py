@@ -5,6 +5,8 @@ from things.LEDbutton import LEDButton
 from things.motor import Motor
 from things.controlledMotor import ControlledMotor
 from things.indicator import Indicator
+from signalTracer import tracer
+from flightRecorder import recorder, Event
 
 class FHK76(QObject):
     """CLASS: FHK76
@@ -70,7 +72,7 @@ class FHK76(QObject):
             self.light = Indicator(5, simulator = sim)
             self.printStatus.connect(lambda msg: sim.statusBar().showMessage(msg, 5000))
             
-        self.safety.pressed.connect(self.setSafety)
+        tracer.connect(self.safety.pressed, self.setSafety, "pressed")
         self.safety.released.connect(self.releaseSafety)
         
         modes = ["semi", "burst", "auto"]
@@ -82,9 +84,9 @@ class FHK76(QObject):
             else:
                 l = LEDButton(i, simulator = sim)
             self.modeButtons[m] = l
-            self.turnOn.connect(l.turnOn)
-            self.turnOff.connect(l.turnOff)
-            self.modeButtons[m].pressed.connect(mb.button(i).click)
+            tracer.connect(self.turnOn, l.turnOn, "turnOn")
+            tracer.connect(self.turnOff, l.turnOff, "turnOff")
+            tracer.connect(self.modeButtons[m].pressed, mb.button(i).click, "pressed")
 
         self.mode = None
         self.fps = fps
@@ -92,9 +94,11 @@ class FHK76(QObject):
         # self.belt = Motor(sim)
         # self.flywheels = [ControlledMotor(sim), ControlledMotor(sim)]
         
+        self.turnOn.connect(lambda num: recorder.record(Event.INDICATOR_ON, num))
+        self.turnOff.connect(lambda num: recorder.record(Event.INDICATOR_OFF, num))
         for ind in [self.safetyLED, self.laser, self.light]:
-            self.turnOn.connect(ind.turnOn)
-            self.turnOff.connect(ind.turnOff)
+            tracer.connect(self.turnOn, ind.turnOn, "turnOn")
+            tracer.connect(self.turnOff, ind.turnOff, "turnOff")
         if sim is None:
             pass #TODO: check state of safety
         else:
@@ -193,7 +197,7 @@ class FHK76(QObject):
         #     self.belt.turnOff()
         #     for f in self.flywheels:
         #         f.sleep()
-        pass
+        recorder.record(Event.TRIGGER, val)
     
     def changeMode(self, modeID):
         """SLOT: changeMode
@@ -209,6 +213,7 @@ class FHK76(QObject):
         if self.mode is not None: # Don't throw an error the first time this is called
             self.turnOff.emit(self.mode)
         self.mode = modeID
+        recorder.record(Event.MODE, modeID)
         self.turnOn.emit(self.mode)
         
     def setBurstValue(self, val):
@@ -265,5 +270,5 @@ class FHK76(QObject):
         sim.getButton("trigger").pressed.connect(self.trigger.pressed)
         sim.getButton("trigger").released.connect(self.trigger.released)
         sim.moveAway.connect(self.trigger.letGo)
-        self.turnOn.connect(sim.indicatorOn)
-        self.turnOff.connect(sim.indicatorOff)
\ No newline at end of file
+        tracer.connect(self.turnOn, sim.indicatorOn, "turnOn")
+        tracer.connect(self.turnOff, sim.indicatorOff, "turnOff")
\ No newline at end of file
@@ -0,0 +1,92 @@
+import numpy as np
+from functools import lru_cache
+
+HUE_SCALE = 65536 / 360 # The Metro Mini stores hue as a 16-bit number covering a full turn
+CACHE_SIZE = 1024 # Number of single colors remembered by hsvValues
+
+def encodeHue(degrees):
+    """FUNCTION: encodeHue
+
+    Converts a hue in degrees to the Metro Mini's 16-bit hue
+
+    Arguments:
+        float - The hue in degrees
+
+    Returns:
+        int - The 16-bit hue
+    """
+    return int(degrees * HUE_SCALE)
+
+def rgbToHsv(rgb):
+    """FUNCTION: rgbToHsv
+
+    Converts an array of RGB colors to the Metro Mini's HSV encoding without looping over the pixels
+
+    Arguments:
+        ndarray - An (n, 3) array of 8-bit red, green, and blue values
+
+    Returns:
+        ndarray - An (n, 3) array of 16-bit hues and 8-bit saturations and values
+    """
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    r, g, b = rgb[..., 0], rgb[..., 1], rgb[..., 2]
+    v = rgb.max(axis=-1)
+    c = v - rgb.min(axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"): # Gray pixels divide by zero, but those results are never selected
+        h = np.select([c == 0, v == r, v == g], [0.0, 60.0 * ((g - b) / c), 60.0 * (2.0 + (b - r) / c)], 60.0 * (4.0 + (r - g) / c))
+        s = np.where(v == 0, 0.0, c / v)
+    h = np.where(h < 0, h + 360.0, h)
+    return np.stack([h * 65536 / 360, s * 255, v * 255], axis=-1).astype(np.int32)
+
+@lru_cache(maxsize = CACHE_SIZE)
+def hsvValues(r, g, b):
+    """FUNCTION: hsvValues
+
+    Converts a single RGB color to the Metro Mini's HSV encoding, remembering recent colors. This uses the same arithmetic as
+    rgbToHsv in plain Python because NumPy's per-call overhead outweighs its speed for a single pixel.
+
+    Called by:
+        PixelTool.sendNewColor, PixelTool.sendLiveColor
+
+    Arguments:
+        int, int, int - The red, green, and blue values of the color
+
+    Returns:
+        int, int, int - The 16-bit hue and 8-bit saturation and value of the color
+    """
+    r, g, b = r / 255.0, g / 255.0, b / 255.0
+    v = max(r, g, b)
+    c = v - min(r, g, b)
+    if c == 0:
+        h = 0.0
+    elif v == r:
+        h = 60.0 * ((g - b) / c)
+    elif v == g:
+        h = 60.0 * (2.0 + (b - r) / c)
+    else:
+        h = 60.0 * (4.0 + (r - g) / c)
+    s = 0.0 if v == 0 else c / v
+    if h < 0:
+        h += 360.0
+    return int(h * 65536 / 360), int(s * 255), int(v * 255)
+
+def hsvToRgb(h, s, v):
+    """FUNCTION: hsvToRgb
+
+    Converts arrays of HSV values to RGB without looping over the pixels
+
+    Called by:
+        RingAnimator.frame, PixelAnimator.frame
+
+    Arguments:
+        ndarray - Hues in degrees
+        ndarray or float - Saturations from 0 to 1
+        ndarray or float - Values from 0 to 1
+
+    Returns:
+        ndarray - An (n, 3) array of 8-bit red, green, and blue values
+    """
+    h = np.asarray(h, dtype=np.float32)
+    k = (np.array([5.0, 3.0, 1.0], dtype=np.float32) + h[..., None] / 60.0) % 6.0
+    rgb = np.asarray(v, dtype=np.float32)[..., None] * (1.0 - np.asarray(s, dtype=np.float32)[..., None] * np.clip(np.minimum(k, 4.0 - k), 0.0, 1.0))
+    return (rgb * 255.0 + 0.5).astype(np.uint8)
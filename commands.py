@@ -0,0 +1,298 @@
+import math
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from enum import IntEnum
+from animation import Animation, Color, RING_SIZE
+
+RING_SCHEMES = {Color.SINGLE: "single", Color.RAINBOW: "rainbow", Color.RGB: "rgb", Color.YCM: "ycm", Color.RYGCBM: "rygcbm"}
+RING_DIALS = ("time", "hue", "step") # Settings that "ring change" can adjust without restarting the animation
+
+class Priority(IntEnum):
+    """ENUM: Priority
+
+    Integers ordering messages that are waiting to be sent, lowest first
+    """
+    LINK = 0 # Baud rate negotiation, which has to finish before anything else is worth sending
+    SETTING = 1
+    REQUEST = 2
+    FRAME = 3 # Streamed frames, which are replaced by the next one anyway
+
+class Command(ABC):
+    """CLASS: Command
+
+    This class is the base of every message sent to the Metro Mini. Each command is a frozen, slotted dataclass whose fields are
+    checked once when it's created, so the rest of the program passes commands around instead of strings and never has to parse
+    one back. Each subclass has a precompiled encoder, the format method of its message template, which is looked up once at import
+    instead of every time an f-string is evaluated.
+
+    key is the setting a command sets, or None if it doesn't set one, and commands with the same key replace each other.
+    priority orders commands waiting to be written, in both serial transports.
+    """
+    __slots__ = ()
+    priority = Priority.SETTING
+
+    @property
+    def key(self):
+        return None
+
+    @abstractmethod
+    def text(self):
+        """METHOD: text
+
+        Encodes the command as the ASCII message the Metro Mini parses, or for a binary command, a readable form for logs and the
+        display
+
+        Called by:
+            encode, MetroMini.transmit, AsyncMetroMini.transmit, DeliveryWindow.fill
+
+        Arguments:
+            none
+
+        Returns:
+            str - The message, including its semicolon
+        """
+
+    def encode(self):
+        """METHOD: encode
+
+        Encodes the command as the bytes written to the serial port, which are its text unless a subclass sends binary
+
+        Called by:
+            MetroMini.transmit, AsyncMetroMini.transmit
+
+        Arguments:
+            none
+
+        Returns:
+            bytes - The message
+        """
+        return self.text().encode("ascii")
+
+@dataclass(frozen = True, slots = True)
+class SetTarget(Command):
+    """CLASS: SetTarget
+
+    Sets the compressor's target pressure in PSI
+    """
+    psi: float
+    FORMAT = "set {};".format
+
+    def __post_init__(self):
+        psi = float(self.psi)
+        if not math.isfinite(psi):
+            raise ValueError("Target pressure must be finite: " + str(self.psi))
+        object.__setattr__(self, "psi", psi) # Frozen dataclasses can only normalize their fields this way
+
+    @property
+    def key(self):
+        return "set"
+
+    def text(self):
+        return self.FORMAT(self.psi)
+
+@dataclass(frozen = True, slots = True)
+class Request(Command):
+    """CLASS: Request
+
+    Asks the Metro Mini for a pressure reading
+    """
+    priority = Priority.REQUEST
+    MESSAGE = "request;"
+
+    def text(self):
+        return self.MESSAGE
+
+@dataclass(frozen = True, slots = True)
+class PixelColor(Command):
+    """CLASS: PixelColor
+
+    Sets the color of a side pixel in the Metro Mini's HSV encoding
+    """
+    index: int
+    hue: int
+    saturation: int
+    value: int
+    FORMAT = "pixel {} {} {} {};".format
+
+    def __post_init__(self):
+        checkPixel(self.index)
+        if not (0 <= self.hue < 65536 and 0 <= self.saturation < 256 and 0 <= self.value < 256):
+            raise ValueError(f"Color out of range: {self.hue} {self.saturation} {self.value}")
+
+    @property
+    def key(self):
+        return ("pixel", self.index, "color")
+
+    def text(self):
+        return self.FORMAT(self.index, self.hue, self.saturation, self.value)
+
+@dataclass(frozen = True, slots = True)
+class PixelMode(Command):
+    """CLASS: PixelMode
+
+    Sets the animation mode of a side pixel, and its animation time in seconds unless it's static
+    """
+    index: int
+    mode: Animation
+    seconds: int = 0
+    FORMATS = {Animation.STATIC: "pixel {} static;".format,
+               Animation.BREATHE: "pixel {} breathe {};".format,
+               Animation.CYCLE: "pixel {} cycle {};".format}
+
+    def __post_init__(self):
+        checkPixel(self.index)
+        if self.mode not in self.FORMATS:
+            raise ValueError("Not a pixel mode: " + str(self.mode))
+        if self.mode == Animation.STATIC and self.seconds: # Unused, and cleared so equal settings compare equal
+            object.__setattr__(self, "seconds", 0)
+
+    @property
+    def key(self):
+        return ("pixel", self.index, "mode")
+
+    def text(self):
+        return self.FORMATS[self.mode](self.index, self.seconds)
+
+@dataclass(frozen = True, slots = True)
+class RingPattern(Command):
+    """CLASS: RingPattern
+
+    Sets everything about the ring's animation. The animation time only applies to animated patterns, the direction only to spinning
+    patterns, and the color scheme and its argument (a 16-bit hue for a single color, otherwise the seconds between color steps) to
+    every pattern except the rainbow spin.
+    """
+    pattern: Animation
+    count: int
+    alternate: bool
+    seconds: int
+    clockwise: bool
+    scheme: Color
+    argument: float
+    FORMATS = {Animation.STATIC: "ring static {0}{1} {4} {5};".format,
+               Animation.BREATHE: "ring breathe {0}{1} {2} {4} {5};".format,
+               Animation.SOLID_SPIN: "ring spin {0}{1} {2} {3} {4} {5};".format,
+               Animation.FADE_SPIN: "ring fade {0}{1} {2} {3} {4} {5};".format,
+               Animation.RAINBOW_SPIN: "ring rainbow {0}{1} {2} {3};".format} # Each leaves out the fields its pattern doesn't use
+
+    def __post_init__(self):
+        if self.pattern not in self.FORMATS:
+            raise ValueError("Not a ring pattern: " + str(self.pattern))
+        if self.count < 1 or RING_SIZE % self.count:
+            raise ValueError("Layouts must divide the ring evenly: " + str(self.count))
+        if self.scheme not in RING_SCHEMES:
+            raise ValueError("Not a color scheme: " + str(self.scheme))
+        if self.pattern == Animation.STATIC and self.seconds: # Fields a pattern doesn't use are cleared so equal settings compare equal
+            object.__setattr__(self, "seconds", 0)
+        if self.pattern < Animation.SOLID_SPIN and not self.clockwise: # Only the spins have a direction
+            object.__setattr__(self, "clockwise", True)
+        if self.pattern == Animation.RAINBOW_SPIN and (self.scheme != Color.RAINBOW or self.argument):
+            object.__setattr__(self, "scheme", Color.RAINBOW)
+            object.__setattr__(self, "argument", 0)
+
+    @property
+    def key(self):
+        return "ring"
+
+    def text(self):
+        return self.FORMATS[self.pattern](self.count, "a" if self.alternate else "", self.seconds, "clw" if self.clockwise else "ccw",
+                                          RING_SCHEMES[self.scheme], self.argument)
+
+@dataclass(frozen = True, slots = True)
+class RingChange(Command):
+    """CLASS: RingChange
+
+    Adjusts one of the ring's dials without restarting its animation
+    """
+    dial: str
+    value: float
+    FORMAT = "ring change {} {};".format
+
+    def __post_init__(self):
+        if self.dial not in RING_DIALS:
+            raise ValueError("Not a ring dial: " + self.dial)
+
+    @property
+    def key(self):
+        return ("ring change", self.dial)
+
+    def text(self):
+        return self.FORMAT(self.dial, self.value)
+
+@dataclass(frozen = True, slots = True)
+class LinkRate(Command):
+    """CLASS: LinkRate
+
+    Proposes a new baud rate
+    """
+    rate: int
+    priority = Priority.LINK
+    FORMAT = "baud {};".format
+
+    def text(self):
+        return self.FORMAT(self.rate)
+
+@dataclass(frozen = True, slots = True)
+class Echo(Command):
+    """CLASS: Echo
+
+    Asks the Metro Mini to send a pattern back, to test a new baud rate
+    """
+    pattern: str
+    priority = Priority.LINK
+    FORMAT = "echo {};".format
+
+    def text(self):
+        return self.FORMAT(self.pattern)
+
+@dataclass(frozen = True, slots = True)
+class AckMode(Command):
+    """CLASS: AckMode
+
+    Asks the Metro Mini to acknowledge numbered commands, or to stop
+    """
+    on: bool
+    priority = Priority.LINK
+    MESSAGES = ("acks off;", "acks on;")
+
+    def text(self):
+        return self.MESSAGES[self.on]
+
+@dataclass(frozen = True, slots = True)
+class Stream(Command):
+    """CLASS: Stream
+
+    Switches the Metro Mini between streamed frames and its own animations
+    """
+    on: bool
+    MESSAGES = ("stream off;", "stream on;")
+
+    def text(self):
+        return self.MESSAGES[self.on]
+
+@dataclass(frozen = True, slots = True)
+class Frame(Command):
+    """CLASS: Frame
+
+    Carries the pixels that changed in a streamed frame, four bytes each: the pixel's index followed by its red, green and blue values.
+    Frames are sent as binary, "F" followed by one byte giving the number of pixel bytes and then the pixel bytes themselves, since
+    the Metro Mini knows how many bytes to take instead of looking for a semicolon. The text is only for logs and the display.
+    """
+    pixels: bytes
+    priority = Priority.FRAME
+    HEADER = b"F"
+
+    def __post_init__(self):
+        if len(self.pixels) % 4:
+            raise ValueError("Frames take four bytes per pixel, not " + str(len(self.pixels)))
+        if len(self.pixels) > 255:
+            raise ValueError("A frame's length has to fit in one byte, not " + str(len(self.pixels)))
+
+    def text(self):
+        return "frame " + self.pixels.hex() + ";"
+
+    def encode(self):
+        return self.HEADER + bytes((len(self.pixels),)) + self.pixels
+
+def checkPixel(index):
+    if index not in (0, 1):
+        raise ValueError("Side pixels are 0 and 1, not " + str(index))
@@ -0,0 +1,248 @@
+import time
+from collections import deque
+from PyQt5.QtCore import Qt, QObject, QTimer, pyqtSignal
+from commands import AckMode
+
+WINDOW_SIZE = 8 # Numbered commands that may be waiting for an acknowledgement at once, or 0 to never ask for acknowledgements
+SEQUENCE_SPACE = 256 # Sequence numbers wrap here, far more than a window's worth so a late acknowledgement can't be taken for a new one
+ACK_TIMEOUT = 250 # Milliseconds a command may go unacknowledged before it's sent again
+HANDSHAKE_TIMEOUT = 500 # Milliseconds the Metro Mini has to agree to acknowledge commands, after which it's assumed not to support them
+MAX_ATTEMPTS = 5 # Times a command is sent before it's given up on
+SEQUENCED = "@{} {}".format # A numbered command: its sequence number followed by the command's own text
+
+class DeliveryWindow(QObject):
+    """CLASS: DeliveryWindow
+
+    This class makes sure lighting and compressor settings reach the Metro Mini. When the Metro Mini starts it sends "acks on;", and
+    firmware that answers "acks on" is sent every setting as "@<sequence> <command>;" and answers each with "ack <sequence>". Up to
+    WINDOW_SIZE settings may be waiting for their acknowledgements at once, so sending doesn't wait a round trip per command, and
+    settings beyond that wait their turn, replacing any waiting setting with the same key. A setting that isn't acknowledged within
+    ACK_TIMEOUT is sent again under a new number, unless a newer one has replaced it in the meantime; the rest of the window isn't.
+    Firmware that doesn't answer "acks on" is sent plain commands as before. deliveryWindowCheck.py checks a setting that's given up
+    on can be sent again.
+
+    SIGNALS                   SLOTS
+    ---------------    ------------
+    finished (bool)    ()   timeout
+    """
+
+    finished = pyqtSignal(bool)
+    """SIGNAL: finished
+
+    Announces whether the Metro Mini acknowledges commands
+
+    Broadcasts:
+        bool - Whether settings will be numbered and acknowledged
+
+    Connects to:
+        MetroMini.acknowledging
+    """
+
+    def __init__(self, serial, shadow, size = WINDOW_SIZE):
+        super().__init__()
+        self.serial = serial
+        self.shadow = shadow
+        self.size = size
+        self.enabled = False
+        self.waitingForHandshake = False
+        self.inFlight = {} # Sequence number: [command, time sent from time.monotonic, attempts]
+        self.queue = deque() # (command, attempts) waiting for room in the window
+        self.nextSequence = 0
+        self.sent, self.acked, self.retransmitted, self.superseded, self.lost = 0, 0, 0, 0, 0
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.setTimerType(Qt.PreciseTimer) # A coarse timer may fire early, before anything is overdue
+        self.timer.timeout.connect(self.timeout)
+
+    def start(self):
+        """METHOD: start
+
+        Asks the Metro Mini to start acknowledging commands, unless the window size is 0
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        if self.size < 1:
+            self.finished.emit(False)
+            return
+        self.waitingForHandshake = True
+        self.serial.writeData(AckMode(True))
+        self.timer.start(HANDSHAKE_TIMEOUT)
+
+    def reset(self):
+        """METHOD: reset
+
+        Forgets every command in flight and stops numbering commands, because the Metro Mini has restarted
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        self.timer.stop()
+        self.enabled = self.waitingForHandshake = False
+        self.inFlight.clear()
+        self.queue.clear()
+
+    def send(self, cmd):
+        """METHOD: send
+
+        Numbers and sends a setting if there's room in the window, or queues it behind the others
+
+        Called by:
+            MetroMini.writeData
+
+        Arguments:
+            Command - The setting to send
+
+        Returns:
+            none
+        """
+        replaced = lambda key: key == cmd.key or (cmd.key == "ring" and isinstance(key, tuple) and key[0] == "ring change")
+        for waiting in [w for w in self.queue if replaced(w[0].key)]:
+            self.queue.remove(waiting) # Replaced by this command, which goes to the back so it still follows everything queued before it
+            self.superseded += 1
+        self.queue.append((cmd, 1))
+        self.fill()
+
+    def fill(self):
+        """METHOD: fill
+
+        Numbers and sends queued settings, oldest first, until the window is full, and sets the timer if it isn't already running
+
+        Called by:
+            send, handle, timeout
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        while self.queue and len(self.inFlight) < self.size:
+            cmd, attempts = self.queue.popleft()
+            while self.nextSequence in self.inFlight: # Only possible if one command has outlived a whole lap of sequence numbers
+                self.nextSequence = (self.nextSequence + 1) % SEQUENCE_SPACE
+            sequence, self.nextSequence = self.nextSequence, (self.nextSequence + 1) % SEQUENCE_SPACE
+            self.inFlight[sequence] = [cmd, time.monotonic(), attempts]
+            self.sent += 1
+            self.serial.transmit(cmd, SEQUENCED(sequence, cmd.text()))
+        if not self.timer.isActive(): # Otherwise it's already set for an older command, which is due first
+            self.schedule()
+
+    def handle(self, msg):
+        """METHOD: handle
+
+        Checks whether a message is an acknowledgement, and acts on it if it is
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            str - A message from the Metro Mini
+
+        Returns:
+            bool - Whether the message was an acknowledgement or an answer to "acks on;"
+        """
+        if self.waitingForHandshake and msg == "acks on":
+            self.timer.stop()
+            self.waitingForHandshake = False
+            self.enabled = True
+            self.finished.emit(True)
+            return True
+        if not msg.startswith("ack "):
+            return False
+        try:
+            entry = self.inFlight.pop(int(msg[4:]), None)
+        except ValueError:
+            return True
+        if entry is not None: # Otherwise it's a late acknowledgement of a command that has already been sent again
+            self.acked += 1
+            self.shadow.confirm(entry[0])
+            self.fill()
+        return True
+
+    def timeout(self):
+        """SLOT: timeout
+
+        Gives up waiting for the Metro Mini to agree to acknowledge commands, or sends again every setting whose acknowledgement is
+        overdue and hasn't been replaced since
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout (timer)
+        """
+        if self.waitingForHandshake:
+            self.waitingForHandshake = False
+            self.finished.emit(False)
+            return
+        now = time.monotonic()
+        overdue = [s for s, (cmd, sent, attempts) in self.inFlight.items() if now - sent >= ACK_TIMEOUT / 1000]
+        retries = []
+        for sequence in overdue:
+            cmd, sent, attempts = self.inFlight.pop(sequence)
+            resend = self.shadow.restore(cmd)
+            if not resend:
+                self.superseded += 1
+            elif attempts >= MAX_ATTEMPTS:
+                self.lost += 1
+                self.shadow.lose(cmd) # So the same setting can be sent again
+                self.serial.printStatus.emit(f"No acknowledgement after {attempts} attempts: {cmd.text()} ({self.summary()})")
+            else:
+                self.retransmitted += 1
+                retries.extend((c, attempts + 1) for c in resend)
+        self.queue.extendleft(reversed(retries)) # Ahead of newer commands, in their original order
+        if retries:
+            self.serial.printStatus.emit("Sent again: " + self.summary())
+        self.fill()
+        self.schedule()
+
+    def schedule(self):
+        """METHOD: schedule
+
+        Sets the timer for when the oldest setting in flight becomes overdue, or stops it if nothing is in flight
+
+        Called by:
+            fill, timeout
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        if self.inFlight:
+            oldest = min(sent for cmd, sent, attempts in self.inFlight.values())
+            self.timer.start(max(round((oldest + ACK_TIMEOUT / 1000 - time.monotonic()) * 1000), 1))
+        else:
+            self.timer.stop()
+
+    def summary(self):
+        """METHOD: summary
+
+        Builds a one-line description of how delivery has gone since the program started
+
+        Called by:
+            timeout, Soak.summarize
+
+        Arguments:
+            none
+
+        Returns:
+            str - How many settings were sent, sent again, acknowledged, replaced before they were sent and given up on
+        """
+        rate = self.retransmitted / self.sent if self.sent else 0.0
+        return (f"{self.retransmitted} of {self.sent} commands sent again ({rate:.1%}), {self.acked} acknowledged, "
+                f"{self.superseded} replaced, {self.lost} lost")
@@ -0,0 +1,117 @@
+"""Checks for acknowledged delivery
+
+Runs a DeliveryWindow and its ShadowState against a fake Metro Mini that can be told to drop every acknowledgement, and checks which
+settings are sent and which are skipped as unchanged, including a setting sent again after it was given up on. No hardware is
+needed, and it runs in a couple of seconds:
+
+    python deliveryWindowCheck.py
+"""
+
+import sys, time
+from PyQt5.QtCore import QObject, QCoreApplication, pyqtSignal
+from commands import SetTarget
+from deliveryWindow import DeliveryWindow, ACK_TIMEOUT, MAX_ATTEMPTS
+from shadowState import ShadowState
+
+class FakeMetroMini(QObject):
+    """Sends settings through the delivery window the way MetroMini.writeData does, acknowledging them unless told not to"""
+
+    printStatus = pyqtSignal(str)
+
+    def __init__(self):
+        super().__init__()
+        self.shadow = ShadowState()
+        self.delivery = DeliveryWindow(self, self.shadow)
+        self.delivery.enabled = True # As if the Metro Mini had answered "acks on"
+        self.sent = []
+        self.acking = True
+
+    def writeData(self, cmd):
+        if self.shadow.update(cmd):
+            self.delivery.send(cmd)
+
+    def transmit(self, cmd, text):
+        self.sent.append(cmd.text())
+        if self.acking:
+            sequence = text[1:text.index(" ")]
+            self.delivery.handle(f"ack {sequence}")
+
+def wait(app, done, limit):
+    """FUNCTION: wait
+
+    Runs the event loop until a condition holds or a time limit passes
+
+    Arguments:
+        QCoreApplication - The application
+        function - Returns whether to stop waiting
+        float - The time limit in seconds
+
+    Returns:
+        bool - Whether the condition held
+    """
+    deadline = time.monotonic() + limit
+    while not done() and time.monotonic() < deadline:
+        app.processEvents()
+        time.sleep(0.005)
+    return done()
+
+def check(name, ok, detail):
+    """FUNCTION: check
+
+    Prints whether a case passed
+
+    Arguments:
+        str - The name of the case
+        bool - Whether it passed
+        object - What happened, to help when it didn't
+
+    Returns:
+        bool - Whether it passed
+    """
+    print(f"{name:<40} {'ok' if ok else 'FAILED'}   {detail}")
+    return ok
+
+def sends(serial, cmd):
+    """FUNCTION: sends
+
+    Sends a setting and finds out how many times it went out
+
+    Arguments:
+        FakeMetroMini - The fake Metro Mini
+        Command - The setting
+
+    Returns:
+        int - The number of times it was sent
+    """
+    before = len(serial.sent)
+    serial.writeData(cmd)
+    return serial.sent[before:].count(cmd.text())
+
+def run(app):
+    """FUNCTION: run
+
+    Runs every case against one fake Metro Mini, in order, since each one depends on the settings the last left behind
+
+    Arguments:
+        QCoreApplication - The application, whose event loop runs the delivery window's timer
+
+    Returns:
+        bool - Whether every case passed
+    """
+    serial = FakeMetroMini()
+    results = [check("new setting", sends(serial, SetTarget(60)) == 1, serial.sent),
+               check("acknowledged setting again", sends(serial, SetTarget(60)) == 0, serial.shadow.summary())]
+    serial.acking = False
+    results.append(check("setting while acks are dropped", sends(serial, SetTarget(70)) == 1, serial.sent))
+    results.append(check("same setting still in flight", sends(serial, SetTarget(70)) == 0, serial.shadow.summary()))
+    lost = wait(app, lambda: serial.delivery.lost == 1, MAX_ATTEMPTS * ACK_TIMEOUT / 1000 + 1)
+    results.append(check("given up on", lost and serial.sent.count("set 70.0;") == MAX_ATTEMPTS, serial.delivery.summary()))
+    results.append(check("acknowledged setting rolled back", serial.shadow.desired.get("set") == SetTarget(60), serial.shadow.desired))
+    serial.acking = True
+    results.append(check("lost setting sent again", sends(serial, SetTarget(70)) == 1, serial.sent[-1:]))
+    results.append(check("nothing left unconfirmed", serial.shadow.unconfirmed() == 0, serial.delivery.summary()))
+    return all(results)
+
+if __name__ == '__main__':
+    app = QCoreApplication(sys.argv)
+    sys.exit(0 if run(app) else 1)
@@ -0,0 +1,202 @@
+import time
+from array import array
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QTimer, QVariant
+from PyQt5.QtWidgets import QAbstractItemView, QHeaderView, QScroller, QTableView, QVBoxLayout
+from flightRecorder import Event, describe
+
+LOG_CAPACITY = 200000 # Events kept for the data tab, after which the oldest are dropped
+REFRESH_INTERVAL = 100 # Milliseconds between checks for new events
+ROW_HEIGHT = 28 # Fixed row height in pixels, large enough to scroll by touch
+COLUMNS = ["time", "event", "detail"]
+
+class EventStore:
+    """CLASS: EventStore
+
+    This class keeps the events shown in the data tab in fixed arrays used as a ring buffer, so memory stays bounded no matter how
+    long the blaster runs. It drains the flight recorder's file on a timer in the GUI thread, which is the only thread that touches
+    it, so recording stays lock-free and the store needs no lock either. Texts are the recorder's, cut to 28 bytes.
+    """
+
+    def __init__(self, recorder, capacity = LOG_CAPACITY):
+        self.recorder = recorder
+        self.next = recorder.first # Sequence number of the next record to drain
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.events = array("B", bytes(capacity))
+        self.args = array("i", bytes(4 * capacity)) # Signed like the recorder's, since a button group with nothing checked gives -1
+        self.lengths = array("H", bytes(2 * capacity))
+        self.texts = [""] * capacity
+        self.count = 0 # Events ever appended, so the newest is at (count - 1) % capacity
+        self.timer = QTimer()
+        self.timer.setInterval(REFRESH_INTERVAL)
+        self.timer.timeout.connect(self.drain)
+        self.timer.start()
+
+    def drain(self):
+        """SLOT: drain
+
+        Appends every record written to the flight recorder since the last drain
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout (timer)
+        """
+        for n, t, event, arg, length, value, text in self.recorder.read(self.next):
+            self.append(t, event, arg, length, value, text)
+            self.next = n + 1
+
+    def append(self, t, event, arg, length, value, text):
+        """METHOD: append
+
+        Stores one event, overwriting the oldest once the store is full
+
+        Called by:
+            drain
+
+        Arguments:
+            float - The wall time of the event
+            Event - The kind of event
+            int - Its small argument
+            int - The length of its full text in bytes
+            float - Its value
+            str - Its text
+
+        Returns:
+            none
+        """
+        i = self.count % self.capacity
+        self.times[i], self.events[i], self.args[i], self.lengths[i], self.values[i], self.texts[i] = t, event, arg, length, value, text
+        self.count += 1
+
+    def row(self, n):
+        """METHOD: row
+
+        Access method for one event by the number of events appended before it. An event overwritten since the model last refreshed
+        isn't mistaken for the one that replaced it.
+
+        Called by:
+            EventTableModel.data
+
+        Arguments:
+            int - The event number
+
+        Returns:
+            float, Event, int, int, float, str - The fields of the event, or None if it has been overwritten
+        """
+        if n < self.count - self.capacity:
+            return None
+        i = n % self.capacity
+        return self.times[i], Event(self.events[i]), self.args[i], self.lengths[i], self.values[i], self.texts[i]
+
+class EventTableModel(QAbstractTableModel):
+    """CLASS: EventTableModel
+
+    This model exposes the event store to a QTableView. Rows are only formatted when the view asks for them, which it only does for
+    the rows on screen. New events are picked up each time the store drains and inserted as one block, and events overwritten in the
+    store are removed from the top, so the view never resets.
+
+    SIGNALS            SLOTS
+    -------    -------------
+    none       ()    refresh
+    """
+
+    def __init__(self, store):
+        super().__init__()
+        self.store = store
+        self.last = store.count # Events the model has taken in
+        self.first = max(self.last - store.capacity, 0) # Number of the event in row 0
+        store.timer.timeout.connect(self.refresh) # After the store's own connection, so it runs once the store has drained
+
+    def rowCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else self.last - self.first
+
+    def columnCount(self, parent = QModelIndex()):
+        return 0 if parent.isValid() else len(COLUMNS)
+
+    def headerData(self, section, orientation, role = Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return COLUMNS[section]
+        return QVariant()
+
+    def data(self, index, role = Qt.DisplayRole):
+        if role != Qt.DisplayRole or not index.isValid():
+            return QVariant()
+        row = self.store.row(self.first + index.row())
+        if row is None: # Its row goes at the next refresh
+            return QVariant()
+        t, event, arg, length, value, text = row
+        if index.column() == 0:
+            return time.strftime("%H:%M:%S", time.localtime(t)) + f".{int(t * 1000) % 1000:03d}"
+        lane, description = describe(event, arg, length, value, text)
+        return lane if index.column() == 1 else description
+
+    def refresh(self):
+        """SLOT: refresh
+
+        Removes rows whose events were overwritten and inserts rows for new events
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout (EventStore.timer)
+        """
+        last = self.store.count
+        if last == self.last:
+            return
+        first = max(last - self.store.capacity, 0)
+        if first > self.first:
+            dropped = min(first, self.last) - self.first # Rows showing events that have been overwritten
+            if dropped > 0:
+                self.beginRemoveRows(QModelIndex(), 0, dropped - 1)
+                self.first += dropped
+                self.endRemoveRows()
+            if self.first < first: # Every row was overwritten, along with events that never made it into a row
+                self.first = self.last = first
+        self.beginInsertRows(QModelIndex(), self.last - self.first, last - 1 - self.first)
+        self.last = last
+        self.endInsertRows()
+
+class EventLogView(QTableView):
+    """CLASS: EventLogView
+
+    This table fills the data tab. Rows have a fixed height so the view can find any row without measuring, it follows new events
+    while scrolled to the bottom, and it scrolls by dragging like the rest of the touchscreen.
+    """
+
+    def __init__(self, tab, store):
+        super().__init__(tab)
+        layout = QVBoxLayout(tab)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self)
+
+        self.model = EventTableModel(store)
+        self.setModel(self.model)
+        self.setSelectionMode(QAbstractItemView.NoSelection)
+        self.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        self.setWordWrap(False)
+        self.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.verticalHeader().hide()
+        self.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.verticalHeader().setDefaultSectionSize(ROW_HEIGHT)
+        self.horizontalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.horizontalHeader().setStretchLastSection(True)
+        self.setColumnWidth(0, 130)
+        self.setColumnWidth(1, 100)
+        QScroller.grabGesture(self.viewport(), QScroller.LeftMouseButtonGesture)
+
+        self.model.rowsAboutToBeInserted.connect(self.checkFollowing)
+        self.model.rowsInserted.connect(self.follow)
+        self.following = True
+        self.scrollToBottom()
+
+    def checkFollowing(self):
+        bar = self.verticalScrollBar()
+        self.following = bar.value() == bar.maximum()
+
+    def follow(self):
+        if self.following:
+            self.scrollToBottom()
@@ -1,8 +1,11 @@
 from enum import Enum
-from PyQt5.QtCore import QStateMachine, QState, QTimer, pyqtSignal
+from PyQt5.QtCore import QObject, QStateMachine, QState, QTimer, pyqtSignal
+from signalTracer import tracer
+from commands import Request
 
 DELAY_BEFORE_SET = 1000 # Represents the time delay in milliseconds between the last GUI button press and the display returning to normal
 REFRESH_PERIOD = 2000 # Represents the amount of time in milliseconds between sending data requests to the Metro Mini
+FRAME_INTERVAL = 16 # Milliseconds between LCD updates at most, about one per frame
 
 class Color(Enum):
     """ENUM: Color
@@ -13,6 +16,86 @@ class Color(Enum):
     GREEN = "00FF00"
     RED = "FF0000"
 
+STYLES = {c: "border: 3px solid #61136e;\n"
+             "border-radius: 8px;\n"
+             f"color: #{c.value}" for c in Color} # Built once, and identical to the style sheets in mainwindow.ui
+
+class LCDWriter(QObject):
+    """CLASS: LCDWriter
+    
+    This class owns all changes to one QLCDNumber. Style sheets and values that are already showing are skipped, and the rest are
+    applied together at most once per frame, so a burst of state changes costs one re-polish and one repaint.
+    
+    SIGNALS                  SLOTS
+    -------    -------------------
+    none       (float)     display
+               ()            flush
+               (Color)    setColor
+    """
+    
+    def __init__(self, lcd):
+        super().__init__()
+        self.lcd = lcd
+        self.style, self.value = lcd.styleSheet(), lcd.value()
+        self.pendingStyle, self.pendingValue = self.style, self.value
+        self.styleChanges, self.valueChanges = 0, 0
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.setInterval(FRAME_INTERVAL)
+        self.timer.timeout.connect(self.flush)
+    
+    def setColor(self, color):
+        """SLOT: setColor
+                
+        Queues the style sheet for a display color
+                
+        Expects:
+            Color - The new color
+                
+        Called by:
+            DisplayState.onEntry
+        """
+        self.pendingStyle = STYLES[color]
+        self.schedule()
+    
+    def display(self, value):
+        """SLOT: display
+                
+        Queues a new value to show
+                
+        Expects:
+            float - The value
+                
+        Connects to:
+            DisplayState.newValue
+        """
+        self.pendingValue = value
+        self.schedule()
+    
+    def schedule(self):
+        if not self.timer.isActive():
+            self.timer.start()
+    
+    def flush(self):
+        """SLOT: flush
+                
+        Applies whatever changed since the last frame
+                
+        Expects:
+            none
+                
+        Connects to:
+            QTimer.timeout (timer)
+        """
+        if self.pendingStyle != self.style:
+            self.style = self.pendingStyle
+            self.lcd.setStyleSheet(self.style)
+            self.styleChanges += 1
+        if self.pendingValue != self.value:
+            self.value = self.pendingValue
+            self.lcd.display(self.value)
+            self.valueChanges += 1
+
 class DisplayState(QState):
     """CLASS: DisplayState
     
@@ -34,7 +117,7 @@ class DisplayState(QState):
         float - The new number to be displayed
     
     Connects to:
-        QLCDNumber.display
+        LCDWriter.display
     """
     
     done = pyqtSignal()
@@ -49,11 +132,11 @@ class DisplayState(QState):
         (FeedbackDisplay.upState, FeedbackDisplay.downState) FeedbackDisplay.stateMachine transition (* -> FeedbackDisplay.waitState)
     """
     
-    def __init__(self, lcd, color, value = None):
+    def __init__(self, writer, color, value = None):
         super().__init__()
-        self.color = color.value
-        self.lcd = lcd
-        self.newValue.connect(lcd.display)
+        self.color = color
+        self.writer = writer
+        self.newValue.connect(writer.display)
         self.value = value # The existence (i.e. not None) of this value is how you know the state cares about the actual value instead of the target value
     
     def onEntry(self, event):
@@ -70,9 +153,7 @@ class DisplayState(QState):
         Emits:
             newValue, done
         """
-        self.lcd.setStyleSheet("border: 3px solid #61136e;\n"
-                               "border-radius: 8px;\n"
-                               f"color: #{self.color}")
+        self.writer.setColor(self.color)
         dispVal = self.machine().getTarget() if self.value is None else self.value
         self.newValue.emit(dispVal)
         self.done.emit()
@@ -99,12 +180,12 @@ class FeedbackDisplay(QStateMachine):
     
     This class wraps a QStateMachine and a QLCDNumber in the GUI so it can keep track of a target value and prevent competing display changes.
     
-    SIGNALS                                 SLOTS
-    ---------------------    --------------------
-    lowerTarget        ()    (float) changeTarget
-    raiseTarget        ()    ()       sendRequest
-    sendToSerial    (str)    ()        sendTarget
-    targetChanged (float)
+    SIGNALS                                     SLOTS
+    -------------------------    --------------------
+    lowerTarget            ()    (float) changeTarget
+    raiseTarget            ()    ()       sendRequest
+    sendToSerial    (Command)    ()        sendTarget
+    targetChanged     (float)
     """
     
     targetChanged = pyqtSignal(float)
@@ -143,24 +224,25 @@ class FeedbackDisplay(QStateMachine):
         stateMachine transition (* -> downState)
     """
     
-    sendToSerial = pyqtSignal(str)
+    sendToSerial = pyqtSignal(object)
     """SIGNAL: sendToSerial
             
     Delivers a message to be sent over serial
             
     Broadcasts:
-        str - The message being sent
+        Command - The message being sent
             
     Connects to:
         MetroMini.broadcast
     """
 
-    def __init__(self, lcd, targetVal, serial = None, template = None):
+    def __init__(self, lcd, targetVal, serial = None, command = None):
         super().__init__()
         
-        self.defaultState = DisplayState(lcd, Color.BLACK, 0.0)
-        self.upState = DisplayState(lcd, Color.GREEN)
-        self.downState = DisplayState(lcd, Color.RED)
+        self.writer = LCDWriter(lcd)
+        self.defaultState = DisplayState(self.writer, Color.BLACK, 0.0)
+        self.upState = DisplayState(self.writer, Color.GREEN)
+        self.downState = DisplayState(self.writer, Color.RED)
         self.waitState = QState()
         
         self.setTimer = QTimer()
@@ -175,6 +257,7 @@ class FeedbackDisplay(QStateMachine):
             s.addTransition(self.lowerTarget, self.downState)
         for s in [self.upState, self.downState]:
             s.addTransition(s.done, self.waitState)
+            tracer.watch(s.done, "done")
         self.waitState.addTransition(self.setTimer.timeout, self.defaultState)
         
         self.setInitialState(self.defaultState)
@@ -183,12 +266,12 @@ class FeedbackDisplay(QStateMachine):
         
         if serial is not None:
             #self.serial = serial
-            self.template = template
+            self.command = command # The Command class that carries a new target
             
-            serial.newDataAvailable.connect(self.defaultState.updateDisplay)
+            tracer.connect(serial.newDataAvailable, self.defaultState.updateDisplay, "newDataAvailable")
             
             self.waitState.exited.connect(self.sendTarget)
-            self.sendToSerial.connect(serial.broadcast)
+            tracer.connect(self.sendToSerial, serial.broadcast, "sendToSerial")
             
             self.requestTimer = QTimer()
             self.requestTimer.setInterval(REFRESH_PERIOD)
@@ -249,7 +332,7 @@ class FeedbackDisplay(QStateMachine):
         Emits:
             sendToSerial
         """
-        self.sendToSerial.emit("request;")
+        self.sendToSerial.emit(Request())
     
     def sendTarget(self):
         """SLOT: sendTarget
@@ -268,4 +351,4 @@ class FeedbackDisplay(QStateMachine):
         Emits:
             sendToSerial
         """
-        self.sendToSerial.emit(self.template.format(self.target))
\ No newline at end of file
+        self.sendToSerial.emit(self.command(self.target))
\ No newline at end of file
@@ -0,0 +1,237 @@
+"""Always-on flight recorder for the blaster
+
+Events are written as fixed-size binary records into a memory-mapped file used as a ring buffer, so the last few thousand events
+survive a crash or power loss and cost next to nothing to record. To read a recording:
+
+    python flightRecorder.py [flight-recorder.bin]
+"""
+
+import os, sys, mmap, time, struct
+from enum import IntEnum
+from itertools import count
+
+RECORD_FILE = "flight-recorder.bin"
+CAPACITY = 16384 # Records kept before the oldest are overwritten (880 KiB of file)
+MAGIC = b"FHKFR002"
+HEADER = struct.Struct("<8sIIQ") # Magic, record size, capacity, next sequence number
+RECORD = struct.Struct("<QdBiHf28s") # Sequence number, wall time, event, argument, full text length, value, text (truncated)
+
+class Event(IntEnum):
+    """ENUM: Event
+
+    Kinds of record
+    """
+    SESSION = 1 # The program started
+    TRIGGER = 2 # Argument is the transition from FHK76.triggerStateChange
+    MODE = 3 # Argument is the firing mode
+    INDICATOR_ON = 4 # Argument is the indicator number
+    INDICATOR_OFF = 5
+    SERIAL_TX = 6 # Text is the message
+    SERIAL_RX = 7
+    PRESSURE = 8 # Value is the pressure in PSI
+
+TRIGGER_STATES = {0: "touched", 1: "pulled", 2: "released", 3: "let go"}
+MODES = {0: "semi", 1: "burst", 2: "auto"}
+
+class FlightRecorder:
+    """CLASS: FlightRecorder
+
+    This class appends events to the flight recorder file. Recording is one struct.pack_into into shared memory, which the operating
+    system writes back to the file on its own, even if the program dies. Sequence numbers continue across runs so the decoder can put
+    records from several sessions back in order. The data tab reads the same records back out of the map rather than being handed a
+    copy, so recording never waits on anything.
+    """
+
+    def __init__(self):
+        self.map = None
+        self.writing = [] # One entry per record call in progress; appending to and popping from a list are atomic, unlike +=
+        self.first = 1 # Sequence number of this session's first record, where the data tab starts reading
+
+    def open(self, path = RECORD_FILE, capacity = CAPACITY):
+        """METHOD: open
+
+        Maps the recorder file, creating it if needed, and records the start of a session
+
+        Called by:
+            MainWindow.__init__
+
+        Arguments:
+            str - The file to record into
+            int - The number of records the file holds
+
+        Returns:
+            none
+        """
+        size = HEADER.size + capacity * RECORD.size
+        with open(path, "a+b") as file:
+            if os.path.getsize(path) != size:
+                file.truncate(0)
+                file.truncate(size)
+            self.map = mmap.mmap(file.fileno(), size)
+            file.close()
+        magic, recordSize, oldCapacity, nextSequence = HEADER.unpack_from(self.map)
+        if magic != MAGIC or recordSize != RECORD.size or oldCapacity != capacity: # A new file or an old format starts over
+            nextSequence = 1
+            self.map[:] = bytes(size)
+        self.capacity = capacity
+        self.first = nextSequence
+        self.sequence = count(nextSequence) # Taking the next number is atomic, so both threads can record without a lock
+        HEADER.pack_into(self.map, 0, MAGIC, RECORD.size, capacity, nextSequence)
+        self.record(Event.SESSION)
+
+    def record(self, event, arg = 0, value = 0.0, text = ""):
+        """METHOD: record
+
+        Writes one record, overwriting the oldest one once the file is full. Nothing is written until the file is open.
+
+        Called by:
+            open, FHK76.changeMode, FHK76.triggerStateChange, FHK76.__init__ (indicators), MetroMini.parse, MetroMini.transmit,
+            AsyncMetroMini.transmit
+
+        Arguments:
+            Event - The kind of record
+            int - A small argument such as an indicator number, which may be negative
+            float - A measurement such as a pressure
+            str - A message, of which the first 28 characters are kept
+
+        Returns:
+            none
+        """
+        t = time.time()
+        self.writing.append(None) # Before looking at the map, so close either sees this write or this write sees it closed
+        try:
+            buffer = self.map
+            if buffer is None:
+                return
+            n = next(self.sequence)
+            data = text.encode()
+            RECORD.pack_into(buffer, HEADER.size + (n % self.capacity) * RECORD.size, n, t, event, arg, len(data), value, data)
+            struct.pack_into("<Q", buffer, HEADER.size - 8, n + 1) # Where the next session picks up
+        finally:
+            self.writing.pop()
+
+    def read(self, since):
+        """METHOD: read
+
+        Reads the records written since a sequence number, oldest first, stopping at the first one that hasn't been written yet. A
+        record is packed and unpacked in one call each, so one written by the serial thread while it's being read can't come back
+        half written. Records that have already been overwritten are skipped.
+
+        Called by:
+            EventStore.drain
+
+        Arguments:
+            int - The sequence number of the first record wanted
+
+        Returns:
+            list - (sequence number, wall time, Event, argument, full text length, value, text) for each record
+        """
+        buffer = self.map # Only ever closed from the GUI thread, which is the one reading
+        if buffer is None:
+            return []
+        since = max(since, struct.unpack_from("<Q", buffer, HEADER.size - 8)[0] - self.capacity)
+        records = []
+        for n in range(since, since + self.capacity):
+            record = RECORD.unpack_from(buffer, HEADER.size + (n % self.capacity) * RECORD.size)
+            if record[0] != n: # Not written yet, or by a thread that hasn't finished taking its number
+                break
+            n, t, e, arg, length, value, text = record
+            records.append((n, t, Event(e), arg, length, value, text.rstrip(b"\0").decode(errors = "replace")))
+        return records
+
+    def close(self):
+        """METHOD: close
+
+        Stops recording, waits for any write already under way in the serial thread to finish, then writes everything back to the
+        file and unmaps it
+
+        Called by:
+            MainWindow.closeEvent
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        buffer, self.map = self.map, None
+        if buffer is None:
+            return
+        while self.writing: # At most one pack_into per thread left to go
+            time.sleep(0)
+        buffer.flush()
+        buffer.close()
+
+def decode(path = RECORD_FILE):
+    """FUNCTION: decode
+
+    Reads every record in a recorder file, oldest first
+
+    Arguments:
+        str - The recorder file
+
+    Returns:
+        list - (sequence number, wall time, Event, argument, full text length, value, text) for each record
+    """
+    with open(path, "rb") as file:
+        data = file.read()
+        file.close()
+    magic, recordSize, capacity, nextSequence = HEADER.unpack_from(data)
+    if magic != MAGIC or recordSize != RECORD.size:
+        raise ValueError(path + " is not a flight recorder file")
+    records = [r for r in RECORD.iter_unpack(data[HEADER.size:HEADER.size + capacity * RECORD.size]) if r[0] != 0]
+    records.sort(key = lambda r: r[0])
+    return [(n, t, Event(e), arg, length, value, text.rstrip(b"\0").decode(errors = "replace")) for n, t, e, arg, length, value, text in records]
+
+def describe(event, arg, length, value, text):
+    """FUNCTION: describe
+
+    Builds the timeline text for one record
+
+    Arguments:
+        Event, int, int, float, str - The fields of the record
+
+    Returns:
+        str, str - The lane the record belongs in and its description
+    """
+    if event == Event.SESSION:
+        return "session", "program started"
+    if event == Event.TRIGGER:
+        return "trigger", TRIGGER_STATES.get(arg, str(arg))
+    if event == Event.MODE:
+        return "mode", MODES.get(arg, str(arg))
+    if event == Event.INDICATOR_ON or event == Event.INDICATOR_OFF:
+        return "indicator", f"{arg} {'on' if event == Event.INDICATOR_ON else 'off'}"
+    if event == Event.PRESSURE:
+        return "pressure", f"{value:.1f} psi"
+    return "serial", f"{'TX' if event == Event.SERIAL_TX else 'RX'} {text}{'…' if length > len(text.encode()) else ''}"
+
+def timeline(records):
+    """FUNCTION: timeline
+
+    Renders records as a timeline, one line per record, with the time since the previous record and the lane indented so each kind
+    of event lines up in its own column
+
+    Arguments:
+        list - Records from decode
+
+    Returns:
+        str - The timeline
+    """
+    lanes = ["session", "trigger", "mode", "indicator", "serial", "pressure"]
+    lines, last = [], None
+    for n, t, event, arg, length, value, text in records:
+        lane, description = describe(event, arg, length, value, text)
+        if event == Event.SESSION:
+            lines.append("")
+            lines.append("=" * 24 + " " + time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(t)) + " " + "=" * 24)
+        gap = "" if last is None or event == Event.SESSION else f"+{(t - last) * 1000:9.1f} ms"
+        stamp = time.strftime("%H:%M:%S", time.localtime(t)) + f".{int(t * 1000) % 1000:03d}"
+        lines.append(f"{stamp} {gap:>13} " + "    " * lanes.index(lane) + f"{lane}: {description}")
+        last = t
+    return "\n".join(lines)
+
+recorder = FlightRecorder()
+
+if __name__ == '__main__':
+    print(timeline(decode(sys.argv[1] if len(sys.argv) > 1 else RECORD_FILE)))
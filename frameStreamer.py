@@ -0,0 +1,136 @@
+import time
+import numpy as np
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+from animation import RING_SIZE
+from signalTracer import tracer
+from commands import Stream, Frame
+
+MAX_STREAM_FPS = 30 # Upper limit on frames per second, even when the link could carry more
+LINK_SHARE = 0.75 # Fraction of the serial bandwidth frames may use, leaving the rest for commands and telemetry
+KEYFRAME_PERIOD = 2.0 # Time in seconds between full frames, which repair any pixel corrupted by a dropped byte
+
+class FrameStreamer(QObject):
+    """CLASS: FrameStreamer
+
+    This class computes every frame of the ring and side pixel animations on the BeagleBone and streams them to the Metro Mini.
+    Only the pixels that changed since the previous frame are sent, and the frame rate adapts to the bandwidth of the serial link.
+
+    Frames are sent as binary (see Frame) where every changed pixel takes four bytes: its index (0-23 for the ring, 24 and 25 for
+    the left and right pixels) followed by its red, green and blue values.
+
+    SIGNALS                                      SLOTS
+    ----------------------    ------------------------
+    sendToSerial (Command)    ()                 begin
+                              ()             sendFrame
+                              (int, float) setLinkRate
+                              ()                  stop
+    """
+
+    sendToSerial = pyqtSignal(object)
+    """SIGNAL: sendToSerial
+
+    Delivers a message to be sent over serial
+
+    Broadcasts:
+        Command - The message being sent
+
+    Connects to:
+        MetroMini.broadcast
+    """
+
+    def __init__(self, serial, ringAnimator, pixelAnimators):
+        super().__init__()
+        self.animators = [ringAnimator, *pixelAnimators]
+        self.frameSize = RING_SIZE + len(pixelAnimators)
+        self.setLinkRate(serial.linkRate)
+        serial.linkChanged.connect(self.setLinkRate)
+        self.last = None
+        self.lastKeyframe = 0.0
+        self.start = time.monotonic()
+        self.frameRate = 0.0
+
+        self.timer = QTimer()
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.sendFrame)
+
+        tracer.connect(self.sendToSerial, serial.broadcast, "sendToSerial")
+
+    def setLinkRate(self, rate, throughput = 0.0):
+        """SLOT: setLinkRate
+
+        Sets the bandwidth frames may use from the baud rate of the link
+
+        Expects:
+            int - The baud rate
+            float - The measured throughput (unused)
+
+        Connects to:
+            MetroMini.linkChanged
+        """
+        self.budget = LINK_SHARE * rate / 10.0 # Bytes per second, counting start and stop bits
+
+    def begin(self):
+        """SLOT: begin
+
+        Switches the Metro Mini to streamed frames and starts sending them
+
+        Expects:
+            none
+
+        Called by:
+            MainWindow.initializeSerialObjects
+
+        Emits:
+            sendToSerial
+        """
+        self.sendToSerial.emit(Stream(True))
+        self.last = None
+        self.start = time.monotonic()
+        self.sendFrame()
+
+    def stop(self):
+        """SLOT: stop
+
+        Stops sending frames and returns the Metro Mini to its own animations
+
+        Expects:
+            none
+
+        Emits:
+            sendToSerial
+        """
+        self.timer.stop()
+        self.sendToSerial.emit(Stream(False))
+
+    def sendFrame(self):
+        """SLOT: sendFrame
+
+        Computes the current frame, sends the pixels that changed and schedules the next frame based on how long this one occupies the link
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout (timer)
+
+        Emits:
+            sendToSerial
+        """
+        now = time.monotonic()
+        t = now - self.start
+        frame = np.concatenate([a.frame(t) for a in self.animators])
+        if self.last is None or now - self.lastKeyframe >= KEYFRAME_PERIOD:
+            changed = np.arange(self.frameSize)
+            self.lastKeyframe = now
+        else:
+            changed = np.flatnonzero((frame != self.last).any(axis=1))
+        self.last = frame
+
+        length = 0
+        if changed.size > 0:
+            msg = Frame(np.column_stack((changed, frame[changed])).astype(np.uint8).tobytes())
+            self.sendToSerial.emit(msg)
+            length = len(msg.pixels) + 2 # Plus "F" and the length byte
+        interval = max(1.0 / MAX_STREAM_FPS, length / self.budget)
+        self.frameRate = 1.0 / interval
+        self.timer.start(int(interval * 1000))
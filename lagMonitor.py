@@ -0,0 +1,248 @@
+import sys, time, threading, traceback
+from bisect import bisect_left
+from collections import deque
+from PyQt5.QtCore import QObject, QTimer, Qt, pyqtSignal
+
+HEARTBEAT_INTERVAL = 50 # Milliseconds between heartbeats in each monitored thread
+STALL_THRESHOLD = 0.25 # Seconds a heartbeat can be late before the stalled thread's stack is logged
+HISTORY = 1200 # Heartbeats kept in the rolling histogram (one minute at the default interval)
+BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000) # Upper edges of the histogram buckets in milliseconds, plus one for anything later
+
+class LagMonitor(QObject):
+    """CLASS: LagMonitor
+
+    This class measures how late an event loop runs by scheduling a heartbeat at a fixed interval and timing how long after its due
+    time it actually fires. One monitor lives in each thread with an event loop (the GUI and the MetroMini thread). A watchdog thread
+    notices heartbeats that don't come at all and logs the Python stack of the stalled thread while it's still stuck.
+
+    SIGNALS                                  SLOTS
+    --------------------------    ---------------
+    lagMeasured (str, float)      ()        beat
+                                  ()       start
+                                  ()        stop
+    """
+
+    lagMeasured = pyqtSignal(str, float)
+    """SIGNAL: lagMeasured
+
+    Reports the lateness of every heartbeat
+
+    Broadcasts:
+        str - The name of the monitored thread
+        float - How late the heartbeat was in milliseconds
+
+    Connects to:
+        Simulator.showLag
+    """
+
+    def __init__(self, name, interval = HEARTBEAT_INTERVAL):
+        super().__init__()
+        self.name = name
+        self.interval = interval
+        self.history = deque(maxlen = HISTORY) # Bucket index of each recent heartbeat
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.worst = 0.0
+        self.threadId = None
+        self.timer = None
+        self.expected = None # When the next heartbeat is due, from time.perf_counter
+        self.lastBeat = None
+
+    def start(self):
+        """SLOT: start
+
+        Starts the heartbeat. This has to run in the monitored thread, so the serial thread's monitor is started by QThread.started.
+
+        Expects:
+            none
+
+        Connects to:
+            QThread.started
+
+        Called by:
+            MainWindow.__init__
+        """
+        self.threadId = threading.get_ident()
+        self.timer = QTimer()
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setSingleShot(True) # Rescheduled from each beat so a late beat doesn't make the next one look late too
+        self.timer.timeout.connect(self.beat)
+        self.lastBeat = time.perf_counter()
+        self.expected = self.lastBeat + self.interval / 1000
+        self.timer.start(self.interval)
+        Watchdog.shared().watch(self)
+
+    def stop(self):
+        """SLOT: stop
+
+        Stops the heartbeat and takes the monitor off the watchdog's list
+
+        Expects:
+            none
+
+        Connects to:
+            QThread.finished
+
+        Called by:
+            MainWindow.closeEvent
+        """
+        Watchdog.shared().forget(self)
+        if self.timer is not None:
+            self.timer.stop()
+
+    def beat(self):
+        """SLOT: beat
+
+        Records how late this heartbeat is and schedules the next one
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout
+
+        Emits:
+            lagMeasured
+        """
+        now = time.perf_counter()
+        lag = max(now - self.expected, 0.0) * 1000
+        self.lastBeat = now
+        self.expected = now + self.interval / 1000
+        self.timer.start(self.interval)
+
+        if len(self.history) == self.history.maxlen:
+            self.counts[self.history[0]] -= 1 # The deque drops this one when the new beat is appended
+        bucket = bisect_left(BUCKETS, lag)
+        self.history.append(bucket)
+        self.counts[bucket] += 1
+        self.worst = max(self.worst, lag)
+        self.lagMeasured.emit(self.name, lag)
+
+    def histogram(self):
+        """METHOD: histogram
+
+        Access method for the rolling histogram of recent heartbeats
+
+        Called by:
+            summary
+
+        Arguments:
+            none
+
+        Returns:
+            list - (upper edge in milliseconds, count) for each bucket, with None as the edge of the last one
+        """
+        return list(zip((*BUCKETS, None), self.counts))
+
+    def percentile(self, fraction):
+        """METHOD: percentile
+
+        Finds the histogram bucket holding a given share of recent heartbeats
+
+        Called by:
+            summary
+
+        Arguments:
+            float - The share of heartbeats from 0 to 1
+
+        Returns:
+            float - The upper edge of the bucket in milliseconds (infinite for the last bucket)
+        """
+        needed = fraction * len(self.history)
+        total = 0
+        for edge, count in self.histogram():
+            total += count
+            if total >= needed:
+                break
+        return float("inf") if edge is None else float(edge)
+
+    def summary(self):
+        """METHOD: summary
+
+        Builds a one-line description of recent lag
+
+        Called by:
+            Simulator.showLag
+
+        Arguments:
+            none
+
+        Returns:
+            str - The median, 99th percentile and worst lag
+        """
+        return f"{self.name}: p50 ≤ {self.percentile(0.5):g} ms, p99 ≤ {self.percentile(0.99):g} ms, worst {self.worst:.0f} ms"
+
+class Watchdog(threading.Thread):
+    """CLASS: Watchdog
+
+    This thread checks every monitor for overdue heartbeats. It's a plain Python thread so it keeps running when a Qt event loop is
+    blocked, and it logs the stack of a stalled thread once per stall.
+    """
+
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        """METHOD: shared
+
+        Access method for the one watchdog, started the first time it's needed
+
+        Called by:
+            LagMonitor.start, LagMonitor.stop
+
+        Arguments:
+            none
+
+        Returns:
+            Watchdog - The watchdog
+        """
+        if cls._shared is None:
+            cls._shared = Watchdog()
+            cls._shared.start()
+        return cls._shared
+
+    def __init__(self, threshold = STALL_THRESHOLD):
+        super().__init__(name = "LagWatchdog", daemon = True)
+        self.threshold = threshold
+        self.monitors = {} # Monitor and the heartbeat its current stall was logged for, if any
+        self.lock = threading.Lock()
+
+    def watch(self, monitor):
+        with self.lock:
+            self.monitors[monitor] = None
+
+    def forget(self, monitor):
+        with self.lock:
+            self.monitors.pop(monitor, None)
+
+    def run(self):
+        while True:
+            time.sleep(self.threshold / 2)
+            now = time.perf_counter()
+            with self.lock:
+                monitors = list(self.monitors.items())
+            for monitor, logged in monitors:
+                beat = monitor.lastBeat
+                if now - monitor.expected > self.threshold and logged != beat:
+                    with self.lock:
+                        if monitor in self.monitors:
+                            self.monitors[monitor] = beat
+                    self.logStack(monitor, now - monitor.expected)
+
+    def logStack(self, monitor, lag):
+        """METHOD: logStack
+
+        Prints where a stalled thread is stuck
+
+        Called by:
+            run
+
+        Arguments:
+            LagMonitor - The monitor of the stalled thread
+            float - How late its heartbeat is in seconds
+
+        Returns:
+            none
+        """
+        frame = sys._current_frames().get(monitor.threadId)
+        stack = "".join(traceback.format_stack(frame)) if frame is not None else "  (no Python frames)\n"
+        print(f"{monitor.name} thread stalled, heartbeat {lag * 1000:.0f} ms late:\n{stack}", end="", file=sys.stderr)
@@ -11,18 +11,32 @@ Indicator Numbers are as follows:
 5 - Laser
 """
 
-import sys, os, json
+from startupProfile import profile
+import sys, os, json, time
+if "--profile-startup" in sys.argv: # Imports are only timed from here on, so this has to come before Qt is loaded
+    profile.enable()
+from signalTracer import tracer
+if "--trace-signals" in sys.argv: # Only connections made after this are traced
+    tracer.enable()
 from PyQt5.QtWidgets import QMainWindow, QApplication
-from PyQt5.QtCore import QThread, pyqtSignal
+from PyQt5.QtCore import Qt, QThread, QTimer, QEvent, QRect, pyqtSignal
 from MainWindow import Ui_MainWindow
 from FHKSimulator import Simulator
 from blaster import FHK76
-from metroMini import MetroMini
+from metroMini import MetroMini, BAUD_RATE
+from asyncSerial import AsyncMetroMini
+from deliveryWindow import WINDOW_SIZE
 from feedbackDisplay import FeedbackDisplay
-from pixelTool import PixelTool
-from ringTool import RingTool
+from commands import SetTarget
+from lagMonitor import LagMonitor
+from flightRecorder import recorder
+from eventLog import EventStore, EventLogView
+from pressureHistory import PressureHistory
+from sparkline import Sparkline
 
 useSimulator = True
+useHostAnimation = False # Compute NeoPixel frames here and stream them instead of sending animation modes
+useAsyncSerial = False # Run the serial port on an asyncio loop in the GUI thread instead of in its own QThread
 
 #FUTURE: save GUI window settings
 class MainWindow(QMainWindow, Ui_MainWindow):
@@ -30,22 +44,24 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     
     This class wraps the UI translated into Python from mainwindow.ui and adds methods to interact with the rest of the blaster.
     
-    SIGNALS                                    SLOTS
-    ------------------    --------------------------
-    sendToSerial (str)    (str)          changeColor
-                          (int)   changeFrontSliders
-                          (bool)       enableButtons
-                          () initializeSerialObjects
-                          (int)     updateBurstValue
+    SIGNALS                                        SLOTS
+    ----------------------    --------------------------
+    sendToSerial (Command)    (int)        buildEventLog
+                              ()      buildLightingTools
+                              (str)          changeColor
+                              (int)   changeFrontSliders
+                              (bool)       enableButtons
+                              () initializeSerialObjects
+                              (int)     updateBurstValue
     """
     
-    sendToSerial = pyqtSignal(str)
+    sendToSerial = pyqtSignal(object)
     """SIGNAL: sendToSerial
             
     Delivers a message to be sent over serial
             
     Broadcasts:
-        str - The message being sent
+        Command - The message being sent
             
     Connects to:
         MetroMini.broadcast
@@ -55,7 +71,11 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     
     def __init__(self, *args, **kwargs):
         super(MainWindow, self).__init__(*args, **kwargs)
-        self.setupUi(self)
+        recorder.open()
+        self.events = EventStore(recorder)
+        with profile.phase("setupUi"):
+            self.setupUi(self)
+        self.tabWidget.setCurrentWidget(self.status) # Only the firing-critical main tab is needed for the first frame
         
         #TODO: Add LED settings to JSON
         if os.path.exists("settings.json"): # load settings from file
@@ -63,36 +83,58 @@ class MainWindow(QMainWindow, Ui_MainWindow):
                 settings = json.load(file)
                 file.close()
         else: # default settings 
-            settings = {"fps":100, "psi":60, "burst":3}
+            settings = {"fps":100, "psi":60, "burst":3, "baud":BAUD_RATE, "port":None, "window":WINDOW_SIZE}
         
         self.modeButtons.setId(self.semiButton, 0)
         self.modeButtons.setId(self.burstButton, 1)
         self.modeButtons.setId(self.autoButton, 2)
         
         #FUTURE: Allow for blaster to function without Metro Mini connected features
-        self.thread = QThread()
-        self.uc = MetroMini()
-        self.uc.moveToThread(self.thread)
-        self.thread.started.connect(self.uc.begin)
+        if useAsyncSerial: # There's no second thread to start or monitor
+            self.thread, self.serialLag = None, None
+            self.uc = AsyncMetroMini(settings.get("baud", BAUD_RATE), settings.get("port"), settings.get("window", WINDOW_SIZE))
+            self.closeSerial.connect(self.uc.close)
+        else:
+            self.thread = QThread()
+            self.thread.setObjectName("MetroMini")
+            self.uc = MetroMini(settings.get("baud", BAUD_RATE), settings.get("port"), settings.get("window", WINDOW_SIZE))
+            self.uc.moveToThread(self.thread)
+            self.thread.started.connect(self.uc.begin)
+            self.serialLag = LagMonitor("serial")
+            self.serialLag.moveToThread(self.thread)
+            self.thread.started.connect(self.serialLag.start)
+            self.thread.finished.connect(self.serialLag.stop)
+            self.closeSerial.connect(self.serialLag.stop) # Its timer has to be stopped from its own thread
         self.uc.ready.connect(self.initializeSerialObjects)
-        self.sendToSerial.connect(self.uc.broadcast)
+        tracer.connect(self.sendToSerial, self.uc.broadcast, "sendToSerial")
+        self.guiLag = LagMonitor("GUI")
         
-        self.leftTool = PixelTool(self.leftSide, self.uc, 0)
-        self.rightTool = PixelTool(self.rightSide, self.uc, 1)
-        self.frontTool = RingTool(self.frontPattern, self.frontColor, self.uc)
+        # The NeoPixel tools are built once the first frame is on screen (see buildLightingTools)
+        self.leftTool, self.rightTool, self.frontTool, self.streamer = None, None, None, None
+        self.serialReady = False
         
         self.simulator = None
-        if useSimulator:
-            self.simulator = Simulator()
-            self.blaster = FHK76(self.modeButtons, settings["fps"], self.simulator)
-            self.uc.connectSimulator(self.simulator)
-            self.blaster.connectSimulator(self.simulator)
-            self.simulator.show()
-        else:
-            self.blaster = FHK76(self.modeButtons, settings["fps"])
-        
-        self.fpsDisplay = FeedbackDisplay(self.fpsLCD, settings["fps"])
-        self.psiDisplay = FeedbackDisplay(self.psiLCD, settings["psi"], self.uc, "set {0};")
+        with profile.phase("blaster"):
+            if useSimulator: # The simulator stands in for the blaster's inputs, so it can't wait
+                self.simulator = Simulator()
+                self.blaster = FHK76(self.modeButtons, settings["fps"], self.simulator)
+                self.uc.connectSimulator(self.simulator)
+                self.blaster.connectSimulator(self.simulator)
+                self.simulator.watchLag(self.guiLag)
+                if self.serialLag is not None:
+                    self.simulator.watchLag(self.serialLag)
+                self.simulator.show()
+            else:
+                self.blaster = FHK76(self.modeButtons, settings["fps"])
+            
+            self.fpsDisplay = FeedbackDisplay(self.fpsLCD, settings["fps"])
+            self.psiDisplay = FeedbackDisplay(self.psiLCD, settings["psi"], self.uc, SetTarget)
+            
+            self.psiHistory = PressureHistory()
+            self.uc.newDataAvailable.connect(self.psiHistory.addSample)
+            self.uc.newReading.connect(self.psiHistory.addReading)
+            self.blaster.trigger.pressed.connect(self.psiHistory.shotFired)
+            self.psiSparkline = Sparkline(self.status, self.psiHistory, QRect(10, 274, 400, 24)) # In the gap above psiLCD
         
         self.blaster.changeMode(self.modeButtons.checkedId())
         self.updateBurstValue(settings["burst"])
@@ -100,7 +142,13 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         self.modeButtons.idClicked.connect(self.blaster.changeMode)
         self.burstSlider.valueChanged.connect(self.updateBurstValue)
         
-        self.thread.start()
+        if self.thread is None:
+            QTimer.singleShot(0, self.uc.begin) # Once the event loop is running, like the thread's start
+        else:
+            threadStart = time.perf_counter()
+            self.thread.started.connect(lambda: profile.interval("QThread start (MetroMini)", threadStart, time.perf_counter()), Qt.DirectConnection)
+            self.thread.start()
+        self.guiLag.start()
         
         #FUTURE: Allow for finer control of target values
         self.FPSupButton.clicked.connect(lambda: self.fpsDisplay.changeTarget(5.0))
@@ -110,11 +158,85 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         
         self.lightButton.toggled.connect(self.blaster.toggleLight)
         self.laserButton.toggled.connect(self.blaster.toggleLaser)
+        
+        self.tabWidget.currentChanged.connect(self.buildLightingTools) # In case the LED tab is opened before idle time comes
+        self.eventLogView = None
+        self.tabWidget.currentChanged.connect(self.buildEventLog)
+        self.installEventFilter(self)
+    
+    def eventFilter(self, obj, event):
+        """METHOD: eventFilter
+                
+        Inherited method from QObject, used once to notice the first frame and schedule the rest of startup for idle time
+        """
+        if event.type() == QEvent.Paint:
+            self.removeEventFilter(self)
+            profile.mark("first frame")
+            QTimer.singleShot(0, self.buildLightingTools)
+        return False
+    
+    def buildLightingTools(self):
+        """SLOT: buildLightingTools
+    
+        Builds the NeoPixel tools, their previews and the frame streamer. This is deferred until after the first frame because none of
+        it is needed to fire and it brings in NumPy.
+    
+        Expects:
+            none
+    
+        Connects to:
+            QTabWidget.currentChanged
+    
+        Called by:
+            eventFilter
+        """
+        if self.frontTool is not None:
+            return
+        self.tabWidget.currentChanged.disconnect(self.buildLightingTools)
+        with profile.phase("lighting tools"):
+            from styleRegistry import StyleRegistry
+            from pixelTool import PixelTool
+            from ringTool import RingTool
+            from frameStreamer import FrameStreamer
+            from widgetIndex import WidgetIndex
+            
+            StyleRegistry.shared().install(self.toolBox)
+            with profile.phase("widget index"):
+                index = WidgetIndex(self.leftSide, self.rightSide, self.frontPattern, self.frontColor)
+            with profile.phase("PixelTool (left)"):
+                self.leftTool = PixelTool(index.panel(self.leftSide), self.uc, 0)
+            with profile.phase("PixelTool (right)"):
+                self.rightTool = PixelTool(index.panel(self.rightSide), self.uc, 1)
+            with profile.phase("RingTool"):
+                self.frontTool = RingTool(index.panel(self.frontPattern), index.panel(self.frontColor), self.uc)
+            
+            if useHostAnimation:
+                self.streamer = FrameStreamer(self.uc, self.frontTool.animator, [self.leftTool.animator, self.rightTool.animator])
+                for tool in [self.leftTool, self.rightTool, self.frontTool]:
+                    tracer.disconnect(tool.serialLink) # Animation modes would fight with the streamed frames
+        if self.serialReady:
+            self.initializeLightingTools()
+        self.finishStartupProfile()
+    
+    def buildEventLog(self, index):
+        """SLOT: buildEventLog
+    
+        Builds the event table in the data tab the first time it's opened. Events are stored from startup either way.
+    
+        Expects:
+            int - The index of the newly opened tab
+    
+        Connects to:
+            QTabWidget.currentChanged
+        """
+        if self.tabWidget.widget(index) is self.data:
+            self.tabWidget.currentChanged.disconnect(self.buildEventLog)
+            self.eventLogView = EventLogView(self.data, self.events)
     
     def initializeSerialObjects(self):
         """SLOT: initializeSerialObjects
     
-        Initializes the NeoPixels and the compressor once the serial port is ready
+        Initializes the compressor once the serial port is ready, and the NeoPixels if their tools have been built
     
         Expects:
             none
@@ -122,10 +244,51 @@ class MainWindow(QMainWindow, Ui_MainWindow):
         Connects to:
             MetroMini.ready
         """
+        self.serialReady = True
+        self.psiDisplay.sendTarget()
+        profile.mark("armed")
+        if self.frontTool is not None:
+            self.initializeLightingTools()
+        if self.simulator is not None:
+            self.simulator.statusBar().showMessage("Startup: " + profile.summary(), 5000)
+        self.finishStartupProfile()
+    
+    def finishStartupProfile(self):
+        """METHOD: finishStartupProfile
+    
+        Writes the startup report if --profile-startup was given, once the blaster is armed and the lighting tools are built
+    
+        Called by:
+            initializeSerialObjects, buildLightingTools
+    
+        Arguments:
+            none
+    
+        Returns:
+            none
+        """
+        if profile.enabled and self.serialReady and self.frontTool is not None:
+            profile.write()
+    
+    def initializeLightingTools(self):
+        """METHOD: initializeLightingTools
+    
+        Sends the initial NeoPixel settings to the Metro Mini, or starts streaming frames
+    
+        Called by:
+            initializeSerialObjects, buildLightingTools
+    
+        Arguments:
+            none
+    
+        Returns:
+            none
+        """
         self.leftTool.initialize()
         self.rightTool.initialize()
         self.frontTool.initialize()
-        self.psiDisplay.sendTarget()
+        if self.streamer is not None:
+            self.streamer.begin()
 
     def updateBurstValue(self, val):
         """SLOT: updateBurstValue
@@ -143,10 +306,18 @@ class MainWindow(QMainWindow, Ui_MainWindow):
     
     def closeEvent(self, *args, **kwargs):
         # TODO: Stop program from closing "unexpectedly"
+        if self.streamer is not None:
+            self.streamer.stop()
+        self.guiLag.stop()
         self.closeSerial.emit()
         if useSimulator:
             self.simulator.close()
-        settings = {"fps":self.fpsDisplay.getTarget(), "psi":self.psiDisplay.getTarget(), "burst":self.blaster.getBurstValue()}
+        if tracer.enabled:
+            tracer.write()
+        recorder.close()
+        settings = {"fps":self.fpsDisplay.getTarget(), "psi":self.psiDisplay.getTarget(), "burst":self.blaster.getBurstValue(),
+                    "baud":self.uc.preferredRate,
+                    "port":self.uc.port, "window":self.uc.windowSize}
         with open('settings.json', 'w') as file:
             json.dump(settings,file,indent=2)
         file.close()
@@ -1,41 +1,81 @@
-import glob
+import time, heapq
 from PyQt5.QtSerialPort import QSerialPort
-from PyQt5.QtCore import pyqtSignal, QIODevice, QObject, QMutex, QMutexLocker
+from PyQt5.QtCore import pyqtSignal, Qt, QIODevice, QObject, QMutex, QMutexLocker
+from signalTracer import tracer
+from flightRecorder import recorder, Event
+from telemetry import TelemetryFilter
+from telemetryRing import TelemetryRing
+from baudNegotiator import BaudNegotiator
+from portDiscovery import findPort
+from shadowState import ShadowState
+from deliveryWindow import DeliveryWindow, WINDOW_SIZE
+from commands import Priority
+from startupProfile import profile
 
 # _UPDATE_INTERVAL = 3
+BAUD_RATE = 9600 # The rate the Metro Mini starts at, before any negotiation
+
+class RXBatch:
+    """CLASS: RXBatch
+    
+    Everything decoded from one readyRead, handed to the GUI thread in a single signal instead of several signals per message
+    """
+    __slots__ = ("messages", "status")
+    
+    def __init__(self):
+        self.messages = [] # Complete messages in the order they arrived
+        self.status = "Serial read complete" # The status of the last message
 
 class MetroMini(QObject):
     """CLASS: MetroMini
     
     This class wraps the serial port used to communicate with the peripheral Metro Mini processor.
     
-    SIGNALS                                 SLOTS
-    ------------------------    -----------------
-    broadcast          (str)    (Simulator) begin
-    displayRXMessage   (str)    ()       readData
-    displayTXMessage   (str)    (str)   writeData
-    newDataAvailable (float)
-    printStatus        (str)
-    ready                 ()
+    SIGNALS                                        SLOTS
+    -------------------------    -----------------------
+    broadcast       (Command)    (bool)    acknowledging
+    displayRXMessage    (str)    (Simulator)       begin
+    displayTXMessage    (str)    (int, float) negotiated
+    linkChanged  (int, float)    ()             readData
+    newDataAvailable  (float)    (Command)     writeData
+    newReading (float, float)    (int)       writeQueued
+    printStatus         (str)
+    ready                  ()
+    received        (RXBatch)
     """
     # TODO: Gracefully handle serial connection errors
     
     newDataAvailable = pyqtSignal(float)
     """SIGNAL: newDataAvailable
             
-    Emitted when a new pressure value has been received from the Metro Mini
+    Emitted in the GUI thread when a new pressure value has been received from the Metro Mini and passed the telemetry filter, at most
+    once per DISPLAY_INTERVAL. Readings reach the GUI thread through the telemetry ring rather than a queued signal.
             
     Broadcasts:
         float - The new value
             
     Connects to:
-        DisplayState.updateDisplay (MainWindow.psiDisplay.defaultState)
+        DisplayState.updateDisplay (MainWindow.psiDisplay.defaultState), PressureHistory.addSample (MainWindow.psiHistory)
+    """
+    
+    newReading = pyqtSignal(float, float)
+    """SIGNAL: newReading
+            
+    Emitted in the GUI thread for every pressure value that passed the telemetry filter, unlike newDataAvailable, which is limited to
+    the display's rate
+            
+    Broadcasts:
+        float - When the reading was received, from time.monotonic
+        float - The new value
+            
+    Connects to:
+        PressureHistory.addReading (MainWindow.psiHistory)
     """
     
     printStatus = pyqtSignal(str)
     """SIGNAL: printStatus
             
-    Displays a temporary message on the simulator's status bar
+    Displays a temporary message about a write on the simulator's status bar
             
     Broadcasts:
         str - The temporary message to display
@@ -59,7 +99,7 @@ class MetroMini(QObject):
     displayRXMessage = pyqtSignal(str)
     """SIGNAL: displayRXMessage
             
-    Displays a message received from serial in the simulator window
+    Displays a message in the simulator window in place of received messages when there is no serial port
             
     Broadcasts:
         str - The message to display
@@ -68,13 +108,13 @@ class MetroMini(QObject):
         QLabel.showMessage (MainWindow.simulator.serialRcvdMsg)
     """
     
-    broadcast = pyqtSignal(str)
+    broadcast = pyqtSignal(object)
     """SIGNAL: broadcast
             
     This signal is called when a message needs to be written to serial. It exists to ensure that the write signal is emitted in the correct thread.
             
     Broadcasts:
-        str - The message to be sent
+        Command - The message to be sent
             
     Connects to:
         QState.exited (MainWindow.psiDisplay.waitState), (MainWindow.psiDisplay.requestTimer) QTimer.timeout, writeData
@@ -92,8 +132,48 @@ class MetroMini(QObject):
         MainWindow.initializeSerialObjects
     """
     
+    received = pyqtSignal(RXBatch)
+    """SIGNAL: received
+            
+    Delivers the messages decoded from one read of the serial port
+            
+    Broadcasts:
+        RXBatch - The messages and the status of the read
+            
+    Connects to:
+        Simulator.showReceived (MainWindow.simulator)
+    """
+    
+    linkChanged = pyqtSignal(int, float)
+    """SIGNAL: linkChanged
+            
+    Announces the baud rate of the link once it has been negotiated
+            
+    Broadcasts:
+        int - The baud rate
+        float - The throughput measured at that rate in bytes per second, or 0 if it wasn't measured
+            
+    Connects to:
+        Simulator.showLink (MainWindow.simulator), FrameStreamer.setLinkRate, PixelTool.setLinkRate
+    """
+    
     close = pyqtSignal()
     
+    def __init__(self, preferredRate = BAUD_RATE, port = None, windowSize = WINDOW_SIZE):
+        super().__init__()
+        self.linkRate = BAUD_RATE
+        self.preferredRate = preferredRate # The last good rate, tried first and saved in the settings
+        self.port = port # The port that worked last time, checked before scanning and saved in the settings
+        self.windowSize = windowSize # Settings that may await acknowledgement at once, saved in the settings
+        self.outbox = [] # A heap of (priority, sequence, bytes) waiting for the port's write buffer to empty
+        self.sequence = 0
+        self.settling = set() # The handshakes ("baud", "acks") still running since the Metro Mini said it was ready
+        self.shadow = ShadowState() # Only touched from the thread the port runs in
+        self.telemetry = TelemetryFilter()
+        self.pressures = TelemetryRing(self.telemetry.displayDelay) # Stays in the GUI thread, which drains it
+        self.pressures.newDataAvailable.connect(self.newDataAvailable, Qt.DirectConnection) # Keeps the emit in the GUI thread
+        self.pressures.readingDrained.connect(self.newReading, Qt.DirectConnection)
+    
     def begin(self):
         """SLOT: begin
                 
@@ -105,23 +185,46 @@ class MetroMini(QObject):
         Connects to:
             QThread.started
         """
-        path = glob.glob("/dev/tty.usbserial-*")
+        path = self.findPort()
         self.serialPort = None
-        try:
-            path = path[0]
-        except IndexError:
+        self.negotiator = BaudNegotiator(self, BAUD_RATE, self.preferredRate)
+        self.negotiator.finished.connect(self.negotiated)
+        self.delivery = DeliveryWindow(self, self.shadow, self.windowSize)
+        self.delivery.finished.connect(self.acknowledging)
+        self.lock = QMutex(QMutex.Recursive) # The baud negotiation and delivery window write from inside readData
+        tracer.connect(self.broadcast, self.writeData, "broadcast")
+        if path is None:
             self.displayRXMessage.emit("No serial connected")
             self.ready.emit()
         else:
             self.serialPort = QSerialPort(path)
-            self.serialPort.setBaudRate(9600)
-            self.buffer = bytearray()
+            self.serialPort.setBaudRate(BAUD_RATE)
+            self.buffer = b""
             self.serialPort.readyRead.connect(self.readData)
+            self.serialPort.bytesWritten.connect(self.writeQueued)
             self.close.connect(self.serialPort.close)
             self.serialPort.open(QIODevice.ReadWrite)
-        finally:
-            self.lock = QMutex()
-            self.broadcast.connect(self.writeData)
+    
+    def findPort(self):
+        """METHOD: findPort
+                
+        Finds the Metro Mini's port, trying the one that worked last time first, and remembers it for next time
+                
+        Called by:
+            begin, AsyncMetroMini.begin
+                
+        Arguments:
+            none
+                
+        Returns:
+            str - The path of the port, or None if there is none
+        """
+        start = time.perf_counter()
+        path, how = findPort(self.port)
+        profile.interval(f"port discovery ({how or 'not found'})", start, time.perf_counter())
+        if path is not None:
+            self.port = path
+        return path
     
     def connectSimulator(self, sim):
         """METHOD: connectSimulator
@@ -141,6 +244,8 @@ class MetroMini(QObject):
         self.printStatus.connect(lambda msg: self.sim.statusBar().showMessage(msg, 5000))
         self.displayTXMessage.connect(self.sim.serialSentMsg.setText)
         self.displayRXMessage.connect(self.sim.serialRcvdMsg.setText)
+        self.received.connect(self.sim.showReceived)
+        self.linkChanged.connect(self.sim.showLink)
     
     def readData(self):
         """SLOT: readData
@@ -152,40 +257,213 @@ class MetroMini(QObject):
                 
         Connects to:
             QSerialPort.readyRead
+        """
+        with QMutexLocker(self.lock):
+            self.parse(bytes(self.serialPort.readAll()))
+    
+    def parse(self, data):
+        """METHOD: parse
+                
+        Splits received bytes into messages. Every complete message is recorded and filtered here, accepted pressures are pushed
+        into the telemetry ring, and the whole read crosses to the GUI thread as one batch.
+                
+        Called by:
+            readData, AsyncMetroMini.readData
+                
+        Arguments:
+            bytes - Everything read from the port since the last call
+                
+        Returns:
+            none
         
         Emits:
-           newDataAvailable
+           received
         """
-        with QMutexLocker(self.lock):
-            bytesIn = self.serialPort.readAll()
-            for b in bytesIn:
-                if b == b'\n': # This translates to the \n character which means the message is complete
-                    msg = self.buffer.decode().strip()
-                    self.displayRXMessage.emit(msg)
-                    if msg == "ready":
-                        self.ready.emit()
-                    else:
-                        self.newDataAvailable.emit(float(msg))
-                    self.printStatus.emit("Serial read complete")
-                    self.buffer = bytearray() # Clear buffer
-                elif b != b'\r': # Ignore '\r' character too
-                    self.buffer = self.buffer + b
+        lines = (self.buffer + data).replace(b"\r", b"").split(b"\n")
+        self.buffer = lines.pop() # Whatever follows the last \n is the start of a message that isn't complete yet
+        if not lines:
+            return
+        batch = RXBatch()
+        for line in lines:
+            msg = line.decode(errors = "replace").strip() # Garbled bytes are rejected by the telemetry filter
+            recorder.record(Event.SERIAL_RX, text = msg)
+            batch.messages.append(msg)
+            batch.status = "Serial read complete"
+            if self.delivery.handle(msg): # First, since the negotiation takes anything while it's testing a rate
+                batch.status = f"Acknowledged: {self.shadow.unconfirmed()} settings unconfirmed"
+            elif self.negotiator.active() and self.negotiator.handle(msg):
+                batch.status = f"Negotiating baud rate ({self.negotiator.rate})"
+            elif msg == "ready":
+                self.shadow.reset() # The Metro Mini has just started, so none of the settings sent before are in effect
+                self.delivery.reset()
+                self.settling = {"baud", "acks"} # ready is emitted once both handshakes have finished
+                self.delivery.start() # Sent before the first baud rate, so both are answered in the same round trip at the old rate
+                self.negotiator.start()
+            else:
+                value, reason = self.telemetry.addFrame(msg)
+                if value is None:
+                    batch.status = f"Rejected pressure reading ({reason}): {self.telemetry.summary()}"
+                else:
+                    recorder.record(Event.PRESSURE, value = value)
+                    self.pressures.push(value)
+        self.received.emit(batch)
+    
+    def negotiated(self, rate, throughput):
+        """SLOT: negotiated
+                
+        Records the rate the link settled on
+                
+        Expects:
+            int - The baud rate
+            float - The measured throughput in bytes per second
+                
+        Connects to:
+            BaudNegotiator.finished
+        
+        Emits:
+           linkChanged
+        """
+        self.linkRate = self.preferredRate = rate
+        self.linkChanged.emit(rate, throughput)
+        self.settled("baud")
+    
+    def acknowledging(self, enabled):
+        """SLOT: acknowledging
+                
+        Records whether the Metro Mini acknowledges commands
+                
+        Expects:
+            bool - Whether it does
+                
+        Connects to:
+            DeliveryWindow.finished
+        
+        Emits:
+           printStatus
+        """
+        self.printStatus.emit(f"Acknowledged delivery {'on' if enabled else 'off'}, window of {self.windowSize}")
+        self.settled("acks")
+    
+    def settled(self, handshake):
+        """METHOD: settled
+                
+        Announces that the Metro Mini is ready once the baud rate and acknowledgement handshakes have both finished. They run at the
+        same time, so firmware that answers neither only waits out one timeout.
+                
+        Called by:
+            negotiated, acknowledging
+                
+        Arguments:
+            str - The handshake that finished, "baud" or "acks"
+                
+        Returns:
+            none
+        
+        Emits:
+           ready
+        """
+        self.settling.discard(handshake)
+        if not self.settling:
+            self.ready.emit()
+    
+    def supportsRate(self, rate):
+        """METHOD: supportsRate
+                
+        Checks whether the serial port can run at a baud rate. QSerialPort sets any rate the adapter accepts.
+                
+        Called by:
+            BaudNegotiator.start, BaudNegotiator.propose
+                
+        Arguments:
+            int - The baud rate
+                
+        Returns:
+            bool - Whether the rate can be tried
+        """
+        return True
+    
+    def setLinkRate(self, rate):
+        """METHOD: setLinkRate
+                
+        Changes the baud rate of the serial port
+                
+        Called by:
+            BaudNegotiator.handle, BaudNegotiator.fail
+                
+        Arguments:
+            int - The new baud rate
+                
+        Returns:
+            none
+        """
+        self.serialPort.setBaudRate(rate)
     
     def writeData(self, msg):
         """SLOT: writeData
                 
-        Writes data to the serial port
+        Sends a message, unless it would set something to what it already is. Settings go through the delivery window if the
+        Metro Mini acknowledges them.
                 
         Expects:
-            str - The message to be sent
+            Command - The message to be sent
                 
         Connects to:
             broadcast
         """
         with QMutexLocker(self.lock):
+            if not self.shadow.update(msg):
+                self.printStatus.emit("Unchanged, not sent: " + self.shadow.summary())
+            elif self.delivery.enabled and msg.key is not None:
+                self.delivery.send(msg)
+            else:
+                self.shadow.confirm(msg) # Nothing will acknowledge it
+                self.transmit(msg)
+    
+    def transmit(self, msg, text = None):
+        """METHOD: transmit
+                
+        Queues a message for the serial port and writes it straight away unless an earlier write is still leaving
+                
+        Called by:
+            writeData, DeliveryWindow.fill
+                
+        Arguments:
+            Command - The message
+            str - Its text numbered to be acknowledged, or None to send the message as it encodes itself
+                
+        Returns:
+            none
+        """
+        with QMutexLocker(self.lock):
+            data = msg.encode() if text is None else text.encode("ascii")
+            text = msg.text() if text is None else text
+            recorder.record(Event.SERIAL_TX, text = text)
             if self.serialPort is not None:
-                self.serialPort.write(msg.encode())
-                self.serialPort.waitForBytesWritten()
-                self.printStatus.emit("Serial write complete")
-            if msg != "request;": # This message prevents all others from being visible, and we know it's being sent if values are coming back
-                self.displayTXMessage.emit(msg)
\ No newline at end of file
+                self.sequence += 1
+                heapq.heappush(self.outbox, (msg.priority, self.sequence, data)) # The sequence keeps messages of equal priority in order
+                self.writeQueued()
+            if msg.priority != Priority.REQUEST: # Requests prevent all others from being visible, and we know they're sent if values are coming back
+                self.displayTXMessage.emit(text)
+    
+    def writeQueued(self, written = 0):
+        """SLOT: writeQueued
+                
+        Writes the most urgent queued message once the port has passed everything written before it to the driver, so messages that
+        pile up behind a slow write go out in priority order like AsyncMetroMini's
+                
+        Expects:
+            int - The bytes just written (unused)
+                
+        Connects to:
+            QSerialPort.bytesWritten
+        
+        Emits:
+           printStatus
+        """
+        with QMutexLocker(self.lock):
+            if self.serialPort.bytesToWrite():
+                return
+            if self.outbox:
+                self.serialPort.write(heapq.heappop(self.outbox)[2])
+            elif written:
+                self.printStatus.emit("Serial write complete")
\ No newline at end of file
@@ -1,7 +1,14 @@
-import json
-from PyQt5.QtCore import QObject, pyqtSignal, QRegularExpression
-from PyQt5.QtWidgets import QWidget, QLabel, QDial, QRadioButton
-from ringTool import Animation
+import math
+from PyQt5.QtCore import QObject, pyqtSignal, QTimer
+from animation import Animation, PixelAnimator
+from styleRegistry import StyleRegistry
+from colors import hsvValues
+from commands import PixelColor, PixelMode
+from widgetIndex import CHANNELS
+from signalTracer import tracer
+
+LIVE_LINK_SHARE = 0.25 # Largest fraction of the serial bandwidth a slider drag may use
+MAX_PIXEL_MESSAGE = len("pixel 0 65535 255 255;")
 
 #FUTURE: Create superclass for all NeoPixel tool classes
 class PixelTool(QObject):
@@ -9,21 +16,24 @@ class PixelTool(QObject):
     
     This class handles some of the interactions between the objects in a QToolBox pane for a NeoPixel and sends messages to the Metro Mini when settings change.
     
-    SIGNALS                          SLOTS
-    ------------------    ----------------
-    sendToSerial (str)    (int) changeMode
-                          ()  colorChanged
-                          ()  sendNewColor
-                          ()  sendNewCycle
+    SIGNALS                                      SLOTS
+    ----------------------    ------------------------
+    sendToSerial (Command)    (int)         changeMode
+                              ()          colorChanged
+                              ()         sendLiveColor
+                              ()          sendNewColor
+                              ()          sendNewCycle
+                              (int, float) setLinkRate
+                              ()        updateAnimator
     """
 
-    sendToSerial = pyqtSignal(str)
+    sendToSerial = pyqtSignal(object)
     """SIGNAL: sendToSerial
             
     Delivers a message to be sent over serial
             
     Broadcasts:
-        str - The message being sent
+        Command - The message being sent
             
     Connects to:
         MetroMini.broadcast
@@ -31,29 +41,33 @@ class PixelTool(QObject):
     
     #TODO: Add argument for passing initial settings
     #FUTURE: Incorporate RingTool's Color enum (both would be moved to the superclass)
-    def __init__(self, widget, serial, index):
+    def __init__(self, panel, serial, index):
         super().__init__()
         
-        with open("styles.json") as file:
-            self.styles = json.load(file)
-            file.close()
+        self.styles = StyleRegistry.shared()
         
         self.index = index
-        self.modes = {Animation.STATIC: "static", Animation.BREATHE: "breathe", Animation.CYCLE: "cycle"}
         
-        self.colorObjects = [self.identifyObjects(widget, ".*Red.*"), self.identifyObjects(widget, ".*Green.*"), self.identifyObjects(widget, ".*Blue.*")]
-        self.square = widget.findChildren(QLabel, QRegularExpression("Color$"))[0]
+        self.colorObjects = [{role: panel.get(role, c) for role in ("slider", "label", "value")} for c in CHANNELS]
+        self.square = panel.get("square")
+        self.cycleLabel = panel.get("heading", "CYCLE")
         
-        self.dial = widget.findChild(QDial)
-        self.cycleLabel = widget.findChildren(QLabel, QRegularExpression("CYCLE$"))[0]
+        self.dial = panel.get("dial")
         self.dial.valueChanged.connect(lambda val: self.cycleLabel.setText(f"AnimAtion time: {max(val, 1)} sec"))
         self.dial.sliderReleased.connect(self.sendNewCycle)
         
+        self.lastColor = None
+        self.liveTimer = QTimer()
+        self.liveTimer.timeout.connect(self.sendLiveColor)
+        self.setLinkRate(serial.linkRate)
+        serial.linkChanged.connect(self.setLinkRate)
+        
         for obj in self.colorObjects:
             obj["slider"].valueChanged.connect(self.colorChanged)
+            obj["slider"].sliderPressed.connect(self.liveTimer.start)
             obj["slider"].sliderReleased.connect(self.sendNewColor)
         
-        self.buttons = widget.findChildren(QRadioButton)[0].group()
+        self.buttons = panel.get("optionButton").group()
         for b in self.buttons.buttons():
             if b.text() == "stAtic":
                 self.buttons.setId(b, Animation.STATIC)
@@ -63,7 +77,12 @@ class PixelTool(QObject):
                 self.buttons.setId(b, Animation.CYCLE)
         self.buttons.idClicked.connect(self.changeMode)
         
-        self.sendToSerial.connect(serial.broadcast)
+        self.animator = PixelAnimator() # Only used when frames are computed on the host
+        self.dial.valueChanged.connect(self.updateAnimator)
+        self.buttons.idClicked.connect(self.updateAnimator)
+        self.updateAnimator()
+        
+        self.serialLink = tracer.connect(self.sendToSerial, serial.broadcast, "sendToSerial") # Kept so host animation can break it
         
     def initialize(self):
         """METHOD: initialize
@@ -71,7 +90,7 @@ class PixelTool(QObject):
         Sends initial settings to the Metro Mini by calling three slots as methods
                 
         Called by:
-            MainWindow.initializeSerialObjects
+            MainWindow.initializeLightingTools
                 
         Arguments:
             none
@@ -82,48 +101,58 @@ class PixelTool(QObject):
         self.sendNewColor()
         self.changeMode(self.buttons.checkedId())
     
-    def identifyObjects(self, widget, regex):
-        """METHOD: identifyObjects
-                
-        Identifies objects using a regular expression and labels them in a dictionary
+    def sendNewColor(self):
+        """SLOT: sendNewColor
                 
-        Called by:
-            __init__
+        Sends the new color of the pixel to the serial port. The final color of a drag is always sent.
                 
-        Arguments:
-            QWidget - The widget containing the objects being identified
-            str - The regular expression used to identify the objects
+        Expects:
+            none
                 
-        Returns:
-            dict - The identified and labeled objects
+        Connects to:
+            QSlider.sliderReleased
+        
+        Emits:
+            sendToSerial
         """
-        objects = {}
-        children = widget.findChildren(QWidget, QRegularExpression(regex))
-        for obj in children:
-            if obj.inherits("QSlider"):
-                objects["slider"] = obj
-            elif obj.objectName().endswith("Label"):
-                objects["label"] = obj
-            elif obj.objectName().endswith("Value"):
-                objects["value"] = obj
-        return objects
+        self.liveTimer.stop()
+        self.lastColor = hsvValues(self.colorObjects[0]["slider"].value(),self.colorObjects[1]["slider"].value(),self.colorObjects[2]["slider"].value())
+        self.sendToSerial.emit(PixelColor(self.index, *self.lastColor))
     
-    def sendNewColor(self):
-        """SLOT: sendNewColor
+    def sendLiveColor(self):
+        """SLOT: sendLiveColor
                 
-        Compiles a string containing the new color of the pixel and sends it to the serial port
+        Sends the latest color while a slider is being dragged, skipping the message if nothing changed since the last one. Values in
+        between ticks are dropped so the pixel follows the slider without flooding the serial port.
                 
         Expects:
             none
                 
         Connects to:
-            QSlider.sliderReleased
+            QTimer.timeout (liveTimer)
         
         Emits:
             sendToSerial
         """
-        self.sendToSerial.emit(f'pixel {self.index} {self.convertToHSV(self.colorObjects[0]["slider"].value(),self.colorObjects[1]["slider"].value(),self.colorObjects[2]["slider"].value())};')
-    
+        color = hsvValues(self.colorObjects[0]["slider"].value(),self.colorObjects[1]["slider"].value(),self.colorObjects[2]["slider"].value())
+        if color != self.lastColor:
+            self.lastColor = color
+            self.sendToSerial.emit(PixelColor(self.index, *color))
+
+    def setLinkRate(self, rate, throughput = 0.0):
+        """SLOT: setLinkRate
+
+        Sets how often colors are sent during a drag, so a drag uses at most LIVE_LINK_SHARE of the link's bandwidth
+
+        Expects:
+            int - The baud rate
+            float - The measured throughput (unused)
+
+        Connects to:
+            MetroMini.linkChanged
+        """
+        self.liveTimer.setInterval(math.ceil(1000 * MAX_PIXEL_MESSAGE * 10 / (LIVE_LINK_SHARE * rate))) # Milliseconds, counting start and stop bits
+
     def colorChanged(self):
         """SLOT: colorChanged
                 
@@ -136,6 +165,23 @@ class PixelTool(QObject):
             QSlider.valueChanged
         """
         self.updateSquare()
+        self.updateAnimator()
+    
+    def updateAnimator(self):
+        """SLOT: updateAnimator
+                
+        Passes the current color, mode and cycle time to the animator used for host-side frames
+                
+        Expects:
+            none
+                
+        Connects to:
+            QDial.valueChanged, QButtonGroup.idClicked
+        
+        Called by:
+            __init__, colorChanged
+        """
+        self.animator.configure(self.buttons.checkedId(), [obj["slider"].value() for obj in self.colorObjects], self.dial.value())
     
     def updateSquare(self, colorString = None):
         """METHOD: updateSquare
@@ -181,7 +227,7 @@ class PixelTool(QObject):
         if self.dial.value() == 0:
             self.dial.setValue(1)
         if self.buttons.checkedId() != Animation.STATIC:
-            self.sendToSerial.emit(f"pixel {self.index} " + self.modes[self.buttons.checkedId()] + f" {self.dial.value()};")
+            self.sendToSerial.emit(PixelMode(self.index, self.buttons.checkedId(), self.dial.value()))
     
     def changeMode(self, mode):
         """SLOT: changeMode
@@ -196,49 +242,11 @@ class PixelTool(QObject):
         
         Emits: sendToSerial
         """
-        arg = ""
-        if mode != Animation.STATIC:
-            arg = f" {self.dial.value()}"
         notCycle = mode != Animation.CYCLE
         for obj in self.colorObjects:
-            obj["slider"].setStyleSheet(self.styles["QSlider-" + str(notCycle)])
-            obj["label"].setStyleSheet(self.styles["QLabel-" + str(notCycle)])
-            obj["value"].setStyleSheet(self.styles["QLabel-" + str(notCycle)])
+            self.styles.setLook(notCycle, obj["slider"], obj["label"], obj["value"])
         if notCycle:
             self.updateSquare()
         else:
             self.updateSquare("qlineargradient(spread:pad, x1:0, y1:0, x2:1, y2:1, stop:0 rgba(255, 0, 0, 255), stop:0.166 rgba(255, 255, 0, 255), stop:0.333 rgba(0, 255, 0, 255), stop:0.5 rgba(0, 255, 255, 255), stop:0.666 rgba(0, 0, 255, 255), stop:0.833 rgba(255, 0, 255, 255), stop:1 rgba(255, 0, 0, 255))")
-        self.sendToSerial.emit(f"pixel {self.index} {self.modes[mode]}{arg};")
-    
-    def convertToHSV(self, ri, gi, bi):
-        """METHOD: convertToHSV
-                
-        Converts an RGB value to HSV before sending it to the Metro Mini
-                
-        Called by:
-            sendNewColor, RingTool.revertColors
-                
-        Arguments:
-            int, int, int - The red, green, and blue values of the color
-                
-        Returns:
-            str - A string containing the hue, saturation, and value of the color
-        """
-        r, g, b = float(ri / 255.0), float(gi / 255.0), float(bi / 255.0)
-        v = max(r, g, b)
-        c = v - min(r, g, b)
-        if c == 0:
-            h = float(0)
-        elif v == r:
-            h = float(60.0 * ((g - b) / c))
-        elif v == g:
-            h = float(60.0 * (2.0 + (b - r) / c))
-        elif v == b:
-            h = float(60.0 * (4.0 + (r - g) / c))
-        if v == 0:
-            s = float(0)
-        else:
-            s = float(c / v)
-        if h < 0:
-            h += 360.0
-        return f"{int(h * 65536 / 360)} {int(s * 255)} {int(v * 255)}"          
\ No newline at end of file
+        self.sendToSerial.emit(PixelMode(self.index, mode, self.dial.value()))
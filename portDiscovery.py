@@ -0,0 +1,96 @@
+"""Serial port discovery for the Metro Mini
+
+The Metro Mini's USB serial adapter is found by its USB vendor and product IDs, read from sysfs, rather than by the name of its tty.
+The port that worked last time is checked first, which only reads the IDs of that one device. Every path can be pointed at a
+fake tree for testing. To see what would be opened:
+
+    python portDiscovery.py [cached port] [sys root] [dev root]
+
+portDiscoveryCheck.py builds such a tree and checks each way the port can be found or missed.
+"""
+
+import os, sys, glob, time
+
+USB_IDS = {("10c4", "ea60"), # Silicon Labs CP2104, on the Metro Mini 328
+           ("1a86", "7523"), # WCH CH340, on some clones
+           ("1a86", "55d4"), # WCH CH9102F, on later Metro Minis
+           ("0403", "6001")} # FTDI FT232R, on FTDI cables
+SYS_ROOT = "/sys"
+DEV_ROOT = "/dev"
+MAC_PATTERN = "/dev/tty.usbserial-*" # macOS names USB serial ports by pattern and has no sysfs, which is enough for development
+
+def usbIds(tty, sysRoot = SYS_ROOT):
+    """FUNCTION: usbIds
+
+    Reads the vendor and product IDs of the USB device a tty belongs to
+
+    Arguments:
+        str - The name of the tty, such as ttyUSB0
+        str - The root of the sysfs tree
+
+    Returns:
+        tuple - The vendor and product IDs as lowercase hex strings, or None if the tty isn't on a USB device
+    """
+    path = os.path.join(sysRoot, "class", "tty", tty, "device")
+    if not os.path.exists(path): # Virtual consoles and ptys have no device
+        return None
+    path, top = os.path.realpath(path), os.path.realpath(sysRoot)
+    while path.startswith(top) and path != top: # The IDs are on the USB device, a few levels above the interface the tty hangs off
+        try:
+            with open(os.path.join(path, "idVendor")) as vendor, open(os.path.join(path, "idProduct")) as product:
+                return vendor.read().strip().lower(), product.read().strip().lower()
+        except OSError:
+            path = os.path.dirname(path)
+    return None
+
+def matches(port, sysRoot = SYS_ROOT):
+    """FUNCTION: matches
+
+    Checks whether a device path is a tty on one of the known USB serial adapters
+
+    Arguments:
+        str - The path of the device, which may be a link such as one in /dev/serial/by-id
+        str - The root of the sysfs tree
+
+    Returns:
+        bool - Whether the port exists and belongs to a known adapter
+    """
+    return os.path.exists(port) and usbIds(os.path.basename(os.path.realpath(port)), sysRoot) in USB_IDS
+
+def findPort(cached = None, sysRoot = SYS_ROOT, devRoot = DEV_ROOT):
+    """FUNCTION: findPort
+
+    Finds the Metro Mini's serial port, checking the cached port before scanning. Links in /dev/serial/by-id are preferred over
+    the ttys they point to, because their names don't change when devices are plugged in in a different order.
+
+    Called by:
+        MetroMini.begin, AsyncMetroMini.begin
+
+    Arguments:
+        str - The port that worked last time, or None
+        str - The root of the sysfs tree
+        str - The root of the device tree
+
+    Returns:
+        str - The path of the port, or None if there is none
+        str - How it was found: "cached", "by-id", "sysfs" or "pattern"
+    """
+    if cached and matches(cached, sysRoot):
+        return cached, "cached"
+    for link in sorted(glob.glob(os.path.join(devRoot, "serial", "by-id", "*"))):
+        if matches(link, sysRoot):
+            return link, "by-id"
+    ttys = os.path.join(sysRoot, "class", "tty")
+    for tty in (sorted(os.listdir(ttys)) if os.path.isdir(ttys) else []):
+        port = os.path.join(devRoot, tty)
+        if usbIds(tty, sysRoot) in USB_IDS and os.path.exists(port):
+            return port, "sysfs"
+    ports = glob.glob(MAC_PATTERN)
+    if ports:
+        return ports[0], "pattern"
+    return None, None
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    port, how = findPort(*sys.argv[1:4])
+    print(f"{port} ({how}) in {(time.perf_counter() - start) * 1000:.2f} ms" if port else "No Metro Mini found")
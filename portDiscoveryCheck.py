@@ -0,0 +1,116 @@
+"""Checks for serial port discovery
+
+Builds a fake sysfs and /dev tree shaped like the BeagleBone's, with the Metro Mini's CP2104 on ttyUSB0, a USB modem that isn't a
+known adapter on ttyACM0, the board's own UART on ttyS0 and a virtual console, then runs portDiscovery.findPort against it for each
+way the port can be found or not found. No hardware or root access is needed:
+
+    python portDiscoveryCheck.py
+"""
+
+import os, sys, shutil, tempfile
+from portDiscovery import findPort
+
+BY_ID = "usb-Silicon_Labs_CP2104_USB_to_UART_Bridge_Controller_01A7B3C4-if00-port0"
+
+def usbDevice(sysRoot, name, vendor, product, tty):
+    """FUNCTION: usbDevice
+
+    Adds a USB device with one interface and a tty on it to a fake sysfs tree, linked from class/tty like the kernel does
+
+    Arguments:
+        str - The root of the fake sysfs tree
+        str - The device's directory name, such as 1-1
+        str - The vendor ID
+        str - The product ID
+        str - The name of the tty
+
+    Returns:
+        none
+    """
+    device = os.path.join(sysRoot, "devices", "platform", "ocp", "musb-hdrc.1", "usb1", name)
+    interface = os.path.join(device, name + ":1.0")
+    os.makedirs(os.path.join(interface, tty, "tty", tty))
+    for field, value in (("idVendor", vendor), ("idProduct", product)):
+        with open(os.path.join(device, field), "w") as file:
+            file.write(value + "\n")
+    classDir = os.path.join(sysRoot, "class", "tty", tty)
+    os.makedirs(classDir)
+    os.symlink(os.path.relpath(interface, classDir), os.path.join(classDir, "device"))
+
+def buildTree(root):
+    """FUNCTION: buildTree
+
+    Builds the fake sysfs and /dev trees
+
+    Arguments:
+        str - An empty directory to build them in
+
+    Returns:
+        str - The root of the sysfs tree
+        str - The root of the device tree
+    """
+    sysRoot, devRoot = os.path.join(root, "sys"), os.path.join(root, "dev")
+    usbDevice(sysRoot, "1-1", "10c4", "EA60", "ttyUSB0") # Upper case, which some kernels write, has to match too
+    usbDevice(sysRoot, "1-2", "1546", "01a7", "ttyACM0")
+    uart = os.path.join(sysRoot, "devices", "platform", "ocp", "44e09000.serial")
+    os.makedirs(uart)
+    os.makedirs(os.path.join(sysRoot, "class", "tty", "ttyS0"))
+    os.symlink(os.path.relpath(uart, os.path.join(sysRoot, "class", "tty", "ttyS0")), os.path.join(sysRoot, "class", "tty", "ttyS0", "device"))
+    os.makedirs(os.path.join(sysRoot, "class", "tty", "tty1")) # No device at all
+    os.makedirs(os.path.join(devRoot, "serial", "by-id"))
+    for tty in ("ttyUSB0", "ttyACM0", "ttyS0", "tty1"):
+        open(os.path.join(devRoot, tty), "w").close()
+    os.symlink("../../ttyUSB0", os.path.join(devRoot, "serial", "by-id", BY_ID))
+    os.symlink("../../ttyACM0", os.path.join(devRoot, "serial", "by-id", "usb-u-blox_AG_GNSS_receiver-if00"))
+    return sysRoot, devRoot
+
+def check(name, result, expected):
+    """FUNCTION: check
+
+    Prints whether findPort gave the expected result
+
+    Arguments:
+        str - The name of the case
+        tuple - The path and method findPort returned
+        tuple - The path and method expected
+
+    Returns:
+        bool - Whether they match
+    """
+    ok = result == expected
+    print(f"{name:<40} {'ok' if ok else 'FAILED'}   {result[1] or 'not found'}: {result[0]}" + ("" if ok else f", expected {expected}"))
+    return ok
+
+def run(root):
+    """FUNCTION: run
+
+    Runs every case against a fresh tree, changing the tree between cases the way plugging and unplugging would
+
+    Arguments:
+        str - An empty directory to build the tree in
+
+    Returns:
+        bool - Whether every case passed
+    """
+    sysRoot, devRoot = buildTree(root)
+    link = os.path.join(devRoot, "serial", "by-id", BY_ID)
+    tty = os.path.join(devRoot, "ttyUSB0")
+    results = [check("by-id link, nothing cached", findPort(None, sysRoot, devRoot), (link, "by-id")),
+               check("cached port still valid", findPort(link, sysRoot, devRoot), (link, "cached")),
+               check("cached port is another USB device", findPort(os.path.join(devRoot, "ttyACM0"), sysRoot, devRoot), (link, "by-id")),
+               check("cached port no longer exists", findPort(os.path.join(devRoot, "ttyUSB3"), sysRoot, devRoot), (link, "by-id"))]
+    shutil.rmtree(os.path.join(devRoot, "serial")) # Images without udev's by-id rules
+    results.append(check("no by-id links", findPort(None, sysRoot, devRoot), (tty, "sysfs")))
+    results.append(check("no by-id links, cached tty", findPort(tty, sysRoot, devRoot), (tty, "cached")))
+    os.remove(tty) # Unplugged: the device node and the sysfs entries go
+    shutil.rmtree(os.path.join(sysRoot, "class", "tty", "ttyUSB0"))
+    results.append(check("unplugged, cached tty", findPort(tty, sysRoot, devRoot), (None, None)))
+    return all(results)
+
+if __name__ == '__main__':
+    root = tempfile.mkdtemp(prefix = "fake-sysfs-")
+    try:
+        passed = run(root)
+    finally:
+        shutil.rmtree(root)
+    sys.exit(0 if passed else 1)
@@ -0,0 +1,162 @@
+import time
+from array import array
+from PyQt5.QtCore import QObject, pyqtSignal
+
+CAPACITY = 4096 # Readings kept, enough to cover a shot's recovery and everything between two sparkline columns
+RECOVERY_TOLERANCE = 1.0 # A shot has recovered once the pressure is back within this many PSI of where it was before the shot
+
+class PressureHistory(QObject):
+    """CLASS: PressureHistory
+
+    This class keeps the most recent pressure readings in a fixed array used as a ring buffer. It gets every reading the telemetry
+    filter accepts, timed from when the serial thread received it, so the recovery time after a shot isn't rounded to the display's
+    rate. Each display refresh becomes one sparkline column spanning every reading since the last one, so a dip between refreshes
+    still shows. A shot's statistics are worked out from the readings since it was fired, and kept once it recovers so they outlive
+    the readings. Nothing is allocated per reading.
+
+    SIGNALS                                         SLOTS
+    --------------------------    -----------------------
+    sampleAdded (float, float)    (float, float) addReading
+                                  (float)         addSample
+                                  ()              shotFired
+    """
+
+    sampleAdded = pyqtSignal(float, float)
+    """SIGNAL: sampleAdded
+
+    Announces the range of the readings since the last sample
+
+    Broadcasts:
+        float - The lowest pressure in PSI
+        float - The highest pressure in PSI
+
+    Connects to:
+        Sparkline.addSample
+    """
+
+    def __init__(self, capacity = CAPACITY):
+        super().__init__()
+        self.capacity = capacity
+        self.values = array("d", bytes(8 * capacity))
+        self.count = 0 # Readings ever added, so the newest is at (count - 1) % capacity
+        self.sampled = 0 # count when the last sample was taken
+
+        self.shotTime = None # When the last shot was fired, from time.monotonic
+        self.shotStart = None # count when the last shot was fired
+        self.baseline = 0.0 # The pressure the last shot has to recover to
+        self.lastShot = None # Lowest, highest and mean pressure and recovery time of the last shot, once it has recovered
+
+    def addSample(self, psi):
+        """SLOT: addSample
+
+        Takes a sample spanning every reading since the last one, or just the displayed value if there hasn't been one
+
+        Expects:
+            float - The pressure in PSI
+
+        Connects to:
+            MetroMini.newDataAvailable
+
+        Emits:
+            sampleAdded
+        """
+        low, high = (psi, psi) if self.sampled == self.count else self.span(self.sampled, self.count)[:2]
+        self.sampled = self.count
+        self.sampleAdded.emit(low, high)
+
+    def addReading(self, received, psi):
+        """SLOT: addReading
+
+        Stores a reading, overwriting the oldest once the buffer is full, and ends the shot in progress once the pressure has recovered
+
+        Expects:
+            float - When the reading was received, from time.monotonic
+            float - The pressure in PSI
+
+        Connects to:
+            MetroMini.newReading
+        """
+        self.values[self.count % self.capacity] = psi
+        self.count += 1
+        if self.shotStart is not None and self.lastShot is None and psi >= self.baseline - RECOVERY_TOLERANCE:
+            recovery = max(received - self.shotTime, 0.0) # A reading already on its way when the shot was fired
+            self.lastShot = (*self.span(self.shotStart, self.count), recovery)
+
+    def shotFired(self):
+        """SLOT: shotFired
+
+        Starts following the pressure from the latest reading, which becomes the level the shot has to recover to
+
+        Expects:
+            none
+
+        Connects to:
+            TouchTrigger.pressed (FHK76.trigger)
+        """
+        if self.count == 0:
+            return
+        self.shotTime = time.monotonic()
+        self.baseline = self.latest()
+        self.shotStart, self.lastShot = self.count, None
+
+    def latest(self):
+        """METHOD: latest
+
+        Access method for the newest reading
+
+        Called by:
+            shotFired
+
+        Arguments:
+            none
+
+        Returns:
+            float - The pressure in PSI
+        """
+        return self.values[(self.count - 1) % self.capacity]
+
+    def span(self, start, end):
+        """METHOD: span
+
+        Works out the lowest, highest and mean pressure of a run of readings, skipping any that have already been overwritten
+
+        Called by:
+            addSample, addReading, summary
+
+        Arguments:
+            int - The count of the first reading
+            int - The count after the last reading
+
+        Returns:
+            float - The lowest pressure in PSI
+            float - The highest pressure in PSI
+            float - The mean pressure in PSI
+        """
+        start = max(start, end - self.capacity)
+        low, high, total = float("inf"), float("-inf"), 0.0
+        for n in range(start, end):
+            psi = self.values[n % self.capacity]
+            low, high, total = min(low, psi), max(high, psi), total + psi
+        return low, high, total / (end - start)
+
+    def summary(self):
+        """METHOD: summary
+
+        Builds a one-line description of the last shot
+
+        Called by:
+            Sparkline.paintEvent
+
+        Arguments:
+            none
+
+        Returns:
+            str - The minimum, maximum and mean pressure after the shot and its recovery time, or an empty string before the first shot
+        """
+        if self.lastShot is not None:
+            low, high, mean, recovery = self.lastShot
+            return f"shot {low:.0f}-{high:.0f} psi, mean {mean:.0f}, {recovery:.2f} s to recover"
+        if self.shotStart is None or self.count == self.shotStart:
+            return ""
+        low, high, mean = self.span(self.shotStart, self.count)
+        return f"shot {low:.0f}-{high:.0f} psi, mean {mean:.0f}, recovering"
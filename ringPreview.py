@@ -0,0 +1,100 @@
+import time
+import numpy as np
+from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtGui import QImage, QPainter
+from PyQt5.QtWidgets import QWidget
+from animation import RING_SIZE
+
+PREVIEW_FPS = 20 # Frames per second drawn while an animation is running
+PREVIEW_SIZE = 200 # Width and height of the preview in pixels, matching the old layout images
+
+class RingPreview(QWidget):
+    """CLASS: RingPreview
+
+    This widget takes the place of the layout image and draws the front ring as it currently looks, animation included.
+    Each frame is built as a single NumPy array and drawn with one QImage blit.
+
+    SIGNALS           SLOTS
+    -------    ------------
+    none       ()  restart
+               () nextFrame
+    """
+
+    def __init__(self, placeholder, animator):
+        super().__init__(placeholder.parentWidget())
+        self.setObjectName(placeholder.objectName())
+        self.setFixedSize(PREVIEW_SIZE, PREVIEW_SIZE)
+        placeholder.parentWidget().layout().replaceWidget(placeholder, self)
+        placeholder.deleteLater()
+
+        self.animator = animator
+        self.start = time.monotonic()
+
+        # Every pixel of the image is mapped once to a NeoPixel (0-23), an outline (24) or the background (25)
+        y, x = np.mgrid[0:PREVIEW_SIZE, 0:PREVIEW_SIZE].astype(np.float32) - (PREVIEW_SIZE - 1) / 2.0
+        angles = np.radians(np.arange(RING_SIZE) * 360.0 / RING_SIZE - 90.0)
+        centers = 0.43 * PREVIEW_SIZE * np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        distance = np.hypot(x[..., None] - centers[:, 0], y[..., None] - centers[:, 1])
+        nearest = distance.argmin(axis=2)
+        radius = distance.min(axis=2)
+        self.indexMap = np.where(radius <= 8.0, nearest, np.where(radius <= 9.5, RING_SIZE, RING_SIZE + 1)).astype(np.intp)
+
+        self.palette = np.empty((RING_SIZE + 2, 3), dtype=np.uint8)
+        self.palette[RING_SIZE] = (0, 0, 0)
+        self.palette[RING_SIZE + 1] = (255, 255, 255)
+        self.buffer = np.empty((PREVIEW_SIZE, PREVIEW_SIZE, 3), dtype=np.uint8)
+        self.image = QImage(self.buffer.data, PREVIEW_SIZE, PREVIEW_SIZE, 3 * PREVIEW_SIZE, QImage.Format_RGB888) # Shares memory with the buffer
+
+        self.timer = QTimer(self)
+        self.timer.setTimerType(Qt.PreciseTimer)
+        self.timer.setInterval(1000 // PREVIEW_FPS)
+        self.timer.timeout.connect(self.nextFrame)
+
+    def restart(self):
+        """SLOT: restart
+
+        Draws the first frame of the current animation and runs the frame timer only if the frames change over time
+
+        Expects:
+            none
+
+        Called by:
+            RingTool.updatePreview
+        """
+        self.start = time.monotonic()
+        self.nextFrame()
+        if self.animator.isAnimated() and self.isVisible():
+            self.timer.start()
+        else:
+            self.timer.stop()
+
+    def nextFrame(self):
+        """SLOT: nextFrame
+
+        Renders the ring at the current time into the image buffer and schedules a repaint
+
+        Expects:
+            none
+
+        Connects to:
+            QTimer.timeout (timer)
+        """
+        colors = self.animator.frame(time.monotonic() - self.start)
+        self.palette[:RING_SIZE] = colors
+        self.palette[:RING_SIZE][~colors.any(axis=1)] = 255 # Pixels that are off are drawn white like the old layout images
+        np.take(self.palette, self.indexMap, axis=0, out=self.buffer)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        painter.drawImage(0, 0, self.image)
+        painter.end()
+
+    def showEvent(self, event):
+        if self.animator.isAnimated():
+            self.timer.start()
+        super().showEvent(event)
+
+    def hideEvent(self, event):
+        self.timer.stop() # No CPU is spent on frames nobody can see
+        super().hideEvent(event)
@@ -1,46 +1,27 @@
-import json
-from enum import IntEnum
-from PyQt5.QtCore import QObject, pyqtSignal, Qt, QRegularExpression
-from PyQt5.QtWidgets import QDial, QCheckBox, QLabel, QPushButton, QRadioButton, QStackedWidget
-from PyQt5.Qt import QPixmap
+from PyQt5.QtCore import QObject, pyqtSignal
+from animation import Animation, Color, RingAnimator
+from ringPreview import RingPreview
+from styleRegistry import StyleRegistry
+from colors import encodeHue
+from commands import RingPattern, RingChange
+from signalTracer import tracer
 
-class Animation(IntEnum):
-    """ENUM: Animation
-    
-    Integers representing different animation modes
-    """
-    STATIC = 0
-    BREATHE = 1
-    CYCLE = 2
-    SOLID_SPIN = 3
-    FADE_SPIN = 4
-    RAINBOW_SPIN = 5
-
-class Color(IntEnum):
-    """ENUM: Color
-    
-    Integers representing different color schemes for the pixel ring
-    """
-    SINGLE = 0
-    RAINBOW = 1
-    RGB = 2
-    YCM = 3
-    RYGCBM = 4
+DIAL_HUE_STEP = 11.25 # Degrees of hue per notch of the hue dial
 
 #FUTURE: Create superclass for all NeoPixel tool classes
-#FUTURE: Recreate layout images to allow for the on pixels to reflect actual color
 class RingTool(QObject):
     """CLASS: RingTool
     
     This class handles some of the interactions between the objects in a pair of QToolBox panes for a ring of 24 NeoPixels and sends messages to the Metro Mini when settings change.
     
-    SIGNALS                                SLOTS
-    ----------------------    ------------------
-    clearAlternate      ()    ()    colorChanged
-    enableAlternate (bool)    (*)  layoutChanged
-    sendToSerial     (str)    (*) patternChanged
-    setEightCount       ()    ()    sendNewValue
-                              (int) updateSquare
+    SIGNALS                                    SLOTS
+    --------------------------    ------------------
+    clearAlternate          ()    ()    colorChanged
+    enableAlternate     (bool)    (*)  layoutChanged
+    sendToSerial     (Command)    (*) patternChanged
+    setEightCount           ()    ()    sendNewValue
+                                  ()   updatePreview
+                                  (int) updateSquare
     """
     
     clearAlternate = pyqtSignal()
@@ -67,13 +48,13 @@ class RingTool(QObject):
         QCheckBox.setEnabled
     """
     
-    sendToSerial = pyqtSignal(str)
+    sendToSerial = pyqtSignal(object)
     """SIGNAL: sendToSerial
             
     Delivers a message to be sent over serial
     
     Broadcasts:
-        str - The message being sent
+        Command - The message being sent
             
     Connects to:
         MetroMini.broadcast
@@ -92,79 +73,63 @@ class RingTool(QObject):
     """
     
     #TODO: Add argument for passing initial settings
-    def __init__(self, patternWidget, colorWidget, serial):
+    def __init__(self, patternPanel, colorPanel, serial):
         super().__init__()
         
         self.locationOffset = 0 # Since I cannot control which LED is where, this will allow me to shift the dial values to real locations.
         
-        with open("styles.json") as file:
-            self.styles = json.load(file)
-            file.close()
+        self.styles = StyleRegistry.shared()
         
-        self.timeDial = patternWidget.findChild(QDial)
+        self.timeDial = patternPanel.get("dial", "time")
         self.timeDial.sliderReleased.connect(self.sendNewValue)
         
-        self.aLabels = []
-        for l in patternWidget.findChildren(QLabel):
-            n = l.objectName()
-            if n == "ANIMATION" or n == "timeLabel":
-                self.aLabels.append(l)
-                if n == "timeLabel":
-                    self.timeLabel = l
-                    self.timeDial.valueChanged.connect(lambda val: self.timeLabel.setText(f"{val} sec"))
-            elif n == "layoutImage":
-                self.layout = l
+        self.aLabels = [patternPanel.get("heading", "ANIMATION"), patternPanel.get("label", "time")]
+        self.timeLabel = patternPanel.get("label", "time")
+        self.timeDial.valueChanged.connect(lambda val: self.timeLabel.setText(f"{val} sec"))
         
-        self.directions = patternWidget.findChildren(QPushButton)[0].group()
-        for b in self.directions.buttons():
-            if b.objectName().endswith("CLW"):
-                self.directions.setId(b, 0)
-            elif b.objectName().endswith("CCW"):
-                self.directions.setId(b, 1)
+        self.directions = patternPanel.get("directionButton").group()
+        self.directions.setId(patternPanel.get("directionButton", "spinCLW"), 0)
+        self.directions.setId(patternPanel.get("directionButton", "spinCCW"), 1)
         self.directions.button(0).toggled.connect(self.patternChanged)
         
-        self.patterns = None
+        self.patterns = patternPanel.get("patternButton").group()
         self.patternDict = {}
-        self.counts = None
-        for b in patternWidget.findChildren(QRadioButton):
-            if b.objectName().startswith("front"):
-                if self.patterns is None:
-                    self.patterns = b.group()
-                if b.objectName()[5:].startswith("Static"):
-                    self.patterns.setId(b, Animation.STATIC)
-                    self.patternDict[self.patterns.id(b)] = "static"
-                if b.objectName()[5:].startswith("Breathe"):
-                    self.patterns.setId(b, Animation.BREATHE)
-                    self.patternDict[self.patterns.id(b)] = "breathe"
-                if b.objectName()[5:].startswith("Solid"):
-                    self.patterns.setId(b, Animation.SOLID_SPIN)
-                    self.patternDict[self.patterns.id(b)] = "spin"
-                if b.objectName()[5:].startswith("Fade"):
-                    self.patterns.setId(b, Animation.FADE_SPIN)
-                    self.patternDict[self.patterns.id(b)] = "fade"
-                if b.objectName()[5:].startswith("Rainbow"):
-                    self.patterns.setId(b, Animation.RAINBOW_SPIN)
-                    self.patternDict[self.patterns.id(b)] = "rainbow"
-            if b.objectName().startswith("button"):
-                if self.counts is None:
-                    self.counts = b.group()
-                self.counts.setId(b, int(b.text()))
+        for b in patternPanel.all("patternButton"):
+            if b.objectName()[5:].startswith("Static"):
+                self.patterns.setId(b, Animation.STATIC)
+                self.patternDict[self.patterns.id(b)] = "static"
+            if b.objectName()[5:].startswith("Breathe"):
+                self.patterns.setId(b, Animation.BREATHE)
+                self.patternDict[self.patterns.id(b)] = "breathe"
+            if b.objectName()[5:].startswith("Solid"):
+                self.patterns.setId(b, Animation.SOLID_SPIN)
+                self.patternDict[self.patterns.id(b)] = "spin"
+            if b.objectName()[5:].startswith("Fade"):
+                self.patterns.setId(b, Animation.FADE_SPIN)
+                self.patternDict[self.patterns.id(b)] = "fade"
+            if b.objectName()[5:].startswith("Rainbow"):
+                self.patterns.setId(b, Animation.RAINBOW_SPIN)
+                self.patternDict[self.patterns.id(b)] = "rainbow"
+        self.counts = patternPanel.get("countButton").group()
+        for b in patternPanel.all("countButton"):
+            self.counts.setId(b, int(b.text()))
         self.patterns.idClicked.connect(self.patternChanged)
         self.counts.idClicked.connect(self.layoutChanged)
+        self.styles.register("LayoutCountButton", *self.counts.buttons()) # These need to be handled separately because they're not standard radio buttons
         self.setEightCount.connect(self.counts.button(8).click)
         
-        self.alternateLayout = patternWidget.findChild(QCheckBox)
+        self.alternateLayout = patternPanel.get("checkBox")
         self.alternateLayout.toggled.connect(self.layoutChanged)
         self.clearAlternate.connect(lambda: self.alternateLayout.setChecked(False))
         self.enableAlternate.connect(self.alternateLayout.setEnabled)
         
-        self.colors = colorWidget.findChildren(QRadioButton)[0].group()
-        self.colorDict = {}
+        colorOptions = colorPanel.get("stack")
+        self.colors = colorPanel.get("optionButton").group()
         self.otherColors = []
         for b in self.colors.buttons():
             if b.objectName().startswith("single"):
                 self.colors.setId(b, Color.SINGLE)
-                b.toggled.connect(lambda x: colorWidget.findChild(QStackedWidget).setCurrentIndex(int(x))) # It's a cheat, but hey, it works!
+                b.toggled.connect(lambda x: colorOptions.setCurrentIndex(int(x))) # It's a cheat, but hey, it works!
             elif b.objectName().startswith("rainbow"):
                 self.colors.setId(b, Color.RAINBOW)
                 self.patterns.button(Animation.RAINBOW_SPIN).clicked.connect(b.setChecked)
@@ -174,31 +139,33 @@ class RingTool(QObject):
                 self.colors.setId(b, Color.YCM)
             elif b.objectName().startswith("rygcbm"):
                 self.colors.setId(b, Color.RYGCBM)
-            self.colorDict[self.colors.id(b)] = b.objectName().removesuffix("Button")
             if not b.objectName().startswith("rainbow"):
                 self.otherColors.append(b) # This helps with disabling color buttons in patternChanged
             
         self.colors.idClicked.connect(self.colorChanged)
         
-        for d in colorWidget.findChildren(QDial):
-            if d.objectName().startswith("hue"):
-                self.hueDial = d
-            else:
-                self.stepDial = d
+        self.hueDial = colorPanel.get("dial", "hue")
+        self.stepDial = colorPanel.get("dial", "step")
         self.hueDial.valueChanged.connect(self.updateSquare)
         self.hueDial.sliderReleased.connect(self.sendNewValue)
         self.stepDial.sliderReleased.connect(self.sendNewValue)
         
-        for l in colorWidget.findChildren(QLabel):
-            if not l.objectName().isupper():
-                if l.objectName().startswith("hue"):
-                    self.hueLabel = l
-                else:
-                    self.stepLabel = l
+        self.hueLabel = colorPanel.get("label", "hue")
+        self.stepLabel = colorPanel.get("label", "step")
         self.stepDial.valueChanged.connect(lambda val: self.stepLabel.setText(f"{max(float(val / 2.0), 0.5)} sec"))
-        self.sLabels = colorWidget.findChildren(QLabel, QRegularExpression("^step", QRegularExpression.CaseInsensitiveOption))
+        self.sLabels = [colorPanel.get("heading", "STEP"), self.stepLabel]
+        
+        self.looks = self.buildLooks()
+        self.repaintsSaved = 0 # Widgets that patternChanged didn't have to re-polish because their look was already right
+        
+        self.animator = RingAnimator()
+        self.preview = RingPreview(patternPanel.get("image"), self.animator)
+        for d in [self.timeDial, self.hueDial, self.stepDial]:
+            d.valueChanged.connect(self.updatePreview)
+        self.colors.idClicked.connect(self.updatePreview)
+        self.updatePreview()
         
-        self.sendToSerial.connect(serial.broadcast)
+        self.serialLink = tracer.connect(self.sendToSerial, serial.broadcast, "sendToSerial") # Kept so host animation can break it
     
     def initialize(self):
         """METHOD: initialize
@@ -206,7 +173,7 @@ class RingTool(QObject):
         Sends initial settings to the Metro Mini (calls patternChanged as a method)
                 
         Called by:
-            MainWindow.initializeSerialObjects
+            MainWindow.initializeLightingTools
                 
         Arguments:
             none
@@ -214,10 +181,26 @@ class RingTool(QObject):
         Returns:
             none
         """
-        self.layout.setPixmap(QPixmap(f"layouts/{self.counts.checkedId()}{'a' if self.alternateLayout.isChecked() else ''}.png").scaled(200, 200, Qt.AspectRatioMode.KeepAspectRatio, \
-                                                                                                                                        Qt.TransformationMode.SmoothTransformation))
         self.patternChanged(self.patterns.checkedId())
     
+    def updatePreview(self):
+        """SLOT: updatePreview
+                
+        Passes the current settings to the animator and restarts the ring preview
+                
+        Expects:
+            none
+                
+        Connects to:
+            QDial.valueChanged (timeDial, hueDial, stepDial), QButtonGroup.idClicked (colors)
+        
+        Called by:
+            __init__, patternChanged, layoutChanged
+        """
+        self.animator.configure(self.patterns.checkedId(), self.counts.checkedId(), self.alternateLayout.isChecked(), self.timeDial.value(),
+                                self.directions.button(0).isChecked(), self.colors.checkedId(), self.hueDial.value() * DIAL_HUE_STEP, max(float(self.stepDial.value() / 2.0), 0.5))
+        self.preview.restart()
+    
     def patternChanged(self, arg):
         """SLOT: patternChanged
                 
@@ -232,24 +215,46 @@ class RingTool(QObject):
             QPushButton.toggled (MainWindow.spinCLW, broadcasts bool)
         """
         if type(arg) is int: # Only calls from radio buttons require GUI changes
-            self.changeStyle(arg != Animation.STATIC, *self.aLabels)
+            looks = self.looks[arg]
+            self.repaintsSaved += len(looks) - self.styles.applyLooks(looks)
+            if (arg == Animation.FADE_SPIN or arg == Animation.SOLID_SPIN) and self.counts.checkedId() > 8: # This ensures a valid count button is always checked
+                self.setEightCount.emit()
+        self.updateCheckBox()
+        self.updatePreview()
+        self.composeAndSend()
+    
+    def buildLooks(self):
+        """METHOD: buildLooks
+                
+        Precomputes which widgets should appear enabled for every pattern
+                
+        Called by:
+            __init__
+                
+        Arguments:
+            none
+                
+        Returns:
+            dict - For each pattern, a dictionary of widgets and whether they should appear enabled
+        """
+        table = {}
+        for arg in self.patternDict:
             noMotion = arg == Animation.STATIC or arg == Animation.BREATHE
-            self.changeStyle(not noMotion, *self.directions.buttons())
+            looks = dict.fromkeys(self.aLabels, arg != Animation.STATIC)
+            looks.update(dict.fromkeys(self.directions.buttons(), not noMotion))
             for cb in self.counts.buttons():
                 num = self.counts.id(cb)
                 if num == 1:
-                    self.changeStyle(arg != Animation.STATIC and arg != Animation.RAINBOW_SPIN, cb)
+                    looks[cb] = arg != Animation.STATIC and arg != Animation.RAINBOW_SPIN
                 elif num == 12:
-                    self.changeStyle(noMotion, cb)
+                    looks[cb] = noMotion
                 elif num == 24:
-                    self.changeStyle(noMotion or arg == Animation.RAINBOW_SPIN, cb)
+                    looks[cb] = noMotion or arg == Animation.RAINBOW_SPIN
                 else:
-                    self.changeStyle(arg != Animation.RAINBOW_SPIN, cb)
-            if (arg == Animation.FADE_SPIN or arg == Animation.SOLID_SPIN) and self.counts.checkedId() > 8: # This ensures a valid count button is always checked
-                self.setEightCount.emit()
-            self.changeStyle(arg != Animation.RAINBOW_SPIN, *self.otherColors, *self.sLabels)
-        self.updateCheckBox()
-        self.composeAndSend()
+                    looks[cb] = arg != Animation.RAINBOW_SPIN
+            looks.update(dict.fromkeys([*self.otherColors, *self.sLabels], arg != Animation.RAINBOW_SPIN))
+            table[arg] = looks
+        return table
     
     def layoutChanged(self):
         """SLOT: layoutChanged
@@ -263,8 +268,7 @@ class RingTool(QObject):
             QButtonGroup.idClicked (counts)
             QCheckBox.clicked
         """
-        self.layout.setPixmap(QPixmap(f"layouts/{self.counts.checkedId()}{'a' if self.alternateLayout.isChecked() else ''}.png").scaled(200, 200, Qt.AspectRatioMode.KeepAspectRatio, \
-                                                                                                                                        Qt.TransformationMode.SmoothTransformation))
+        self.updatePreview()
         self.updateCheckBox()
         self.composeAndSend()
         
@@ -305,7 +309,7 @@ class RingTool(QObject):
     def composeAndSend(self):
         """METHOD: composeAndSend
                 
-        Compiles a new instruction message and sends it to the Metro Mini
+        Sends the whole ring animation to the Metro Mini
                 
         Called by:
             patternChanged, layoutChanged, colorChanged
@@ -319,18 +323,10 @@ class RingTool(QObject):
         Emits:
             sendToSerial
         """
-        pattern = self.patterns.checkedId()
-        msg = f"ring {self.patternDict[pattern]} {self.counts.checkedId()}{'a' if self.alternateLayout.isChecked() else ''}"
-        
-        if pattern != Animation.STATIC:
-            msg += f" {self.timeDial.value()}"
-            if pattern != Animation.BREATHE:
-                msg += f" {'clw' if self.directions.button(0).isChecked() else 'ccw'}"
-            
-        if pattern == Animation.RAINBOW_SPIN:
-            self.sendToSerial.emit(msg + ";")
-        else:
-            self.sendToSerial.emit(msg + f" {self.colorDict[self.colors.checkedId()]} {self.hueDial.value() * 2048 if self.colors.checkedId() == Color.SINGLE else float(self.stepDial.value() / 2.0)};")
+        scheme = self.colors.checkedId()
+        argument = encodeHue(self.hueDial.value() * DIAL_HUE_STEP) if scheme == Color.SINGLE else float(self.stepDial.value() / 2.0)
+        self.sendToSerial.emit(RingPattern(self.patterns.checkedId(), self.counts.checkedId(), self.alternateLayout.isChecked(),
+                                           self.timeDial.value(), self.directions.button(0).isChecked(), scheme, argument))
                 
     def sendNewValue(self):
         """SLOT: sendNewValue
@@ -349,12 +345,12 @@ class RingTool(QObject):
         source = self.sender()
         newVal = source.value()
         if source is self.hueDial:
-            newVal = newVal * 2048
+            newVal = encodeHue(newVal * DIAL_HUE_STEP)
         elif source is self.stepDial:
             if newVal == 0:
                 source.setValue(1)
             newVal = float(newVal / 2.0)
-        self.sendToSerial.emit(f'ring change {source.objectName().removesuffix("Dial")} {newVal};')
+        self.sendToSerial.emit(RingChange(source.objectName().removesuffix("Dial"), newVal))
     
     def updateSquare(self, hue):
         """SLOT: updateSquare
@@ -368,15 +364,15 @@ class RingTool(QObject):
             QDial.valueChanged
         """
         self.hueLabel.setStyleSheet("border: 2px solid #000000;\n"
-                                    f"background-color: hsv({hue * 11.25}, 255, 255)")
+                                    f"background-color: hsv({hue * DIAL_HUE_STEP}, 255, 255)")
         
     def changeStyle (self, en, *widgets):
         """METHOD: changeStyle
                 
-        Changes the appearance of a given widget using the style JSON
+        Changes the appearance of a given widget using the shared style registry
                 
         Called by:
-            patternChanged
+            updateCheckBox
                 
         Arguments:
             bool - Whether the widget should appear enabled or disabled
@@ -385,8 +381,4 @@ class RingTool(QObject):
         Returns:
             none
         """
-        for w in widgets:
-            if type(w).__name__ == "QRadioButton" and w.group() is self.counts: # This needs to be handled separately because they're not standard radio buttons
-                w.setStyleSheet(self.styles["LayoutCountButton-" + str(en)])
-            else:
-                w.setStyleSheet(self.styles[type(w).__name__ + "-" + str(en)])
\ No newline at end of file
+        self.styles.setLook(en, *widgets)
\ No newline at end of file
@@ -0,0 +1,194 @@
+class ShadowState:
+    """CLASS: ShadowState
+
+    This class is the host's copy of the Metro Mini's lighting and compressor settings, kept as the last command that set each one.
+    A command that would set a setting to what it already is gets dropped instead of sent, such as the ring command sent again when
+    an already-checked pattern is clicked. Commands that don't set anything, like requests and frames, always go through.
+
+    Settings are keyed by each command's key: "ring" for the whole ring animation, ("ring change", dial) for one of its dials,
+    ("pixel", index, "color") and ("pixel", index, "mode") for the side pixels, and "set" for the compressor target. A whole ring
+    command replaces any dial changes made since, so it's only skipped if no dial has been changed since it was sent.
+
+    Two copies are kept: desired, which every command sent updates, and acknowledged, which only changes when the Metro Mini confirms
+    a command (or when a command is sent without acknowledged delivery, since nothing will confirm it). A command is only skipped if
+    it matches one the Metro Mini has acknowledged or one still on its way. One that's given up on is taken back out of desired, so
+    sending the same setting again goes through.
+    """
+
+    def __init__(self):
+        self.desired = {} # The last command sent for each setting
+        self.acknowledged = {} # The last command for each setting that the Metro Mini confirmed
+        self.skipped = 0
+        self.bytesSaved = 0
+
+    def update(self, cmd):
+        """METHOD: update
+
+        Compares a command with the setting it would change and remembers it if it's a real change
+
+        Called by:
+            MetroMini.writeData
+
+        Arguments:
+            Command - The command about to be sent
+
+        Returns:
+            bool - Whether the command needs to be sent
+        """
+        key = cmd.key
+        if key is None:
+            return True
+        # desired only holds commands that are acknowledged or still on their way, because lost ones are rolled back, so matching it
+        # means matching one of those. Matching acknowledged alone isn't enough: a newer command may be on its way to replace it.
+        if self.desired.get(key) == cmd and not (key == "ring" and self.dials(self.desired)):
+            self.skipped += 1
+            self.bytesSaved += len(cmd.text())
+            return False
+        self.apply(self.desired, cmd)
+        return True
+
+    def confirm(self, cmd):
+        """METHOD: confirm
+
+        Records that the Metro Mini has applied a command
+
+        Called by:
+            MetroMini.writeData, DeliveryWindow.handle
+
+        Arguments:
+            Command - The command
+
+        Returns:
+            none
+        """
+        if cmd.key is not None:
+            self.apply(self.acknowledged, cmd)
+
+    def restore(self, cmd):
+        """METHOD: restore
+
+        Works out what to send again when a command wasn't acknowledged. Nothing is sent if a newer command has replaced it. A
+        whole ring command is followed by the dial changes made since, because sending it again resets the dials.
+
+        Called by:
+            DeliveryWindow.timeout
+
+        Arguments:
+            Command - The command that wasn't acknowledged
+
+        Returns:
+            list - The commands to send, in order
+        """
+        if self.desired.get(cmd.key) != cmd:
+            return []
+        if cmd.key == "ring":
+            return [cmd, *(self.desired[k] for k in self.dials(self.desired))]
+        return [cmd]
+
+    def lose(self, cmd):
+        """METHOD: lose
+
+        Rolls a setting back to what the Metro Mini last acknowledged, because a command for it has been given up on. Its dial
+        changes go back too if it's a whole ring command, since the dials the Metro Mini has are the ones it acknowledged.
+
+        Called by:
+            DeliveryWindow.timeout
+
+        Arguments:
+            Command - The command that was given up on
+
+        Returns:
+            none
+        """
+        keys = [cmd.key, *self.dials(self.desired), *self.dials(self.acknowledged)] if cmd.key == "ring" else [cmd.key]
+        for key in keys:
+            if key in self.acknowledged:
+                self.desired[key] = self.acknowledged[key]
+            else:
+                self.desired.pop(key, None)
+
+    def reset(self):
+        """METHOD: reset
+
+        Forgets every setting, because the Metro Mini has restarted with its defaults
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        self.desired.clear()
+        self.acknowledged.clear()
+
+    def apply(self, settings, cmd):
+        """METHOD: apply
+
+        Records a command in one of the two copies of the settings
+
+        Called by:
+            update, confirm
+
+        Arguments:
+            dict - desired or acknowledged
+            Command - The command, which must set something
+
+        Returns:
+            none
+        """
+        settings[cmd.key] = cmd
+        if cmd.key == "ring": # A whole ring command resets every dial
+            for stale in self.dials(settings):
+                del settings[stale]
+
+    @staticmethod
+    def dials(settings):
+        """METHOD: dials
+
+        Finds the ring dials changed since the last whole ring command in one of the two copies of the settings
+
+        Called by:
+            update, restore, lose, apply
+
+        Arguments:
+            dict - desired or acknowledged
+
+        Returns:
+            list - The keys of the dial changes
+        """
+        return [k for k in settings if isinstance(k, tuple) and k[0] == "ring change"]
+
+    def unconfirmed(self):
+        """METHOD: unconfirmed
+
+        Counts the settings the Metro Mini hasn't confirmed yet
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            none
+
+        Returns:
+            int - The number of settings whose last command sent hasn't been acknowledged
+        """
+        return sum(self.acknowledged.get(key) != cmd for key, cmd in self.desired.items())
+
+    def summary(self):
+        """METHOD: summary
+
+        Builds a one-line description of the messages skipped because they wouldn't have changed anything
+
+        Called by:
+            MetroMini.writeData, benchmarks.encoding, Soak.summarize
+
+        Arguments:
+            none
+
+        Returns:
+            str - The number of messages skipped and the bytes that saved
+        """
+        return f"{self.skipped} unchanged messages skipped, {self.bytesSaved} bytes saved"
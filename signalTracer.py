@@ -0,0 +1,240 @@
+import json, time, threading
+from array import array
+from collections import deque
+from itertools import count
+from PyQt5.QtCore import QObject, QThread, Qt
+
+TRACE_FILE = "signal-trace.json" # Written when tracing is enabled with --trace-signals
+CAPACITY = 65536 # Events kept in the ring buffer, after which the oldest are overwritten
+DELIVERY, EMIT = 0, 1 # Kinds of event: a slot call with its emit time, or an emit with no slot to wrap (state machine transitions)
+
+class SignalTracer:
+    """CLASS: SignalTracer
+
+    This class traces the signals that carry most of the blaster's behavior (sendToSerial, broadcast, newDataAvailable, turnOn,
+    turnOff, pressed, touched, done). Traced connections are made through connect, which only wraps the slot when tracing is enabled
+    with --trace-signals, so there is no cost otherwise.
+
+    Each delivery records when the signal was emitted and in which thread, when the slot started running and in which thread, and when
+    it finished. Events go into arrays allocated up front and used as a ring buffer, so tracing doesn't allocate per event. The trace
+    is written in Chrome's trace_event format (chrome://tracing, Perfetto, speedscope), with flow arrows from each emit to its slot.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.names = [] # Signal names, indexed by the name IDs stored with each event
+        self.threadNames = {}
+        self.slots = [] # Keeps the wrapped slots alive
+
+    def enable(self, capacity = CAPACITY):
+        """METHOD: enable
+
+        Allocates the ring buffer and wraps every traced connection made from now on
+
+        Called by:
+            main (module level)
+
+        Arguments:
+            int - The number of events to keep
+
+        Returns:
+            none
+        """
+        self.capacity = capacity
+        self.counter = count() # Taking the next number is atomic, so both threads can record without a lock
+        self.kinds = array("b", bytes(capacity))
+        self.nameIds = array("H", [0]) * capacity
+        self.emitted = array("d", [0.0]) * capacity
+        self.delivered = array("d", [0.0]) * capacity
+        self.finished = array("d", [0.0]) * capacity
+        self.emitThreads = array("Q", [0]) * capacity
+        self.slotThreads = array("Q", [0]) * capacity
+        self.enabled = True
+
+    def connect(self, signal, slot, name):
+        """METHOD: connect
+
+        Connects a signal to a slot (or another signal), tracing the connection if enabled
+
+        Called by:
+            MainWindow.__init__, MetroMini.begin, FeedbackDisplay.__init__, FHK76.__init__, FHK76.connectSimulator, PixelTool.__init__,
+            RingTool.__init__, FrameStreamer.__init__
+
+        Arguments:
+            pyqtBoundSignal - The signal
+            callable or pyqtBoundSignal - The slot
+            str - The name the events are recorded under
+
+        Returns:
+            list - The connections made, which disconnect takes
+        """
+        if not self.enabled:
+            return [signal.connect(slot)]
+        traced = _TracedSlot(self, self.nameId(name), slot)
+        self.slots.append(traced)
+        return [signal.connect(traced.stamp, Qt.DirectConnection), # Runs in the emitting thread before the slot, even if the slot is queued
+                signal.connect(traced.deliver)]
+
+    def disconnect(self, connections):
+        """METHOD: disconnect
+
+        Breaks the connections made by one call to connect, leaving any other slots on the signal connected
+
+        Called by:
+            MainWindow.buildLightingTools
+
+        Arguments:
+            list - The connections returned by connect
+
+        Returns:
+            none
+        """
+        for connection in connections:
+            QObject.disconnect(connection)
+
+    def watch(self, signal, name):
+        """METHOD: watch
+
+        Records the emits of a signal that only drives state machine transitions, so there's no slot to wrap
+
+        Called by:
+            TouchTrigger.__init__, FeedbackDisplay.__init__
+
+        Arguments:
+            pyqtBoundSignal - The signal
+            str - The name the events are recorded under
+
+        Returns:
+            none
+        """
+        if self.enabled:
+            nameId = self.nameId(name)
+            signal.connect(lambda *args: self.record(EMIT, nameId, time.perf_counter(), threading.get_ident()), Qt.DirectConnection)
+
+    def nameId(self, name):
+        if name not in self.names:
+            self.names.append(name)
+        return self.names.index(name)
+
+    def record(self, kind, nameId, emitted, emitThread, delivered = None, finished = None, slotThread = None):
+        """METHOD: record
+
+        Writes one event into the ring buffer, overwriting the oldest if it's full
+
+        Called by:
+            watch, _TracedSlot.deliver
+
+        Arguments:
+            int - DELIVERY or EMIT
+            int - The ID of the signal's name
+            float - The emit time from time.perf_counter
+            int - The ident of the emitting thread
+            float - The time the slot started (deliveries only)
+            float - The time the slot finished (deliveries only)
+            int - The ident of the thread the slot ran in (deliveries only)
+
+        Returns:
+            none
+        """
+        self.nameThread()
+        i = next(self.counter) % self.capacity
+        self.kinds[i] = kind
+        self.nameIds[i] = nameId
+        self.emitted[i] = emitted
+        self.emitThreads[i] = emitThread
+        self.delivered[i] = emitted if delivered is None else delivered
+        self.finished[i] = emitted if finished is None else finished
+        self.slotThreads[i] = emitThread if slotThread is None else slotThread
+    
+    def nameThread(self):
+        """METHOD: nameThread
+        
+        Remembers the name of the current thread the first time it's seen, using its QThread's object name if it has one
+        
+        Called by:
+            record, _TracedSlot.stamp
+        
+        Arguments:
+            none
+        
+        Returns:
+            none
+        """
+        ident = threading.get_ident()
+        if ident not in self.threadNames:
+            self.threadNames[ident] = QThread.currentThread().objectName() or threading.current_thread().name
+
+    def events(self):
+        """METHOD: events
+
+        Access method for the recorded events, oldest first
+
+        Called by:
+            write
+
+        Arguments:
+            none
+
+        Returns:
+            list - (kind, name, emitted, emit thread, delivered, finished, slot thread) for each event
+        """
+        total = next(self.counter) # Costs one number, which is never used for an event
+        first = max(total - self.capacity, 0)
+        return [(self.kinds[i], self.names[self.nameIds[i]], self.emitted[i], self.emitThreads[i], self.delivered[i], self.finished[i],
+                 self.slotThreads[i]) for i in (n % self.capacity for n in range(first, total))]
+
+    def write(self, path = TRACE_FILE):
+        """METHOD: write
+
+        Writes the trace in Chrome's trace_event JSON format
+
+        Called by:
+            MainWindow.closeEvent
+
+        Arguments:
+            str - The file to write
+
+        Returns:
+            none
+        """
+        trace = []
+        for ident, name in self.threadNames.items():
+            trace.append({"ph": "M", "name": "thread_name", "pid": 0, "tid": ident, "args": {"name": name}})
+        for n, (kind, name, emitted, emitThread, delivered, finished, slotThread) in enumerate(self.events()):
+            if kind == EMIT:
+                trace.append({"ph": "i", "s": "t", "name": name, "cat": "emit", "pid": 0, "tid": emitThread, "ts": emitted * 1e6})
+                continue
+            trace.append({"ph": "X", "name": name, "cat": "slot", "pid": 0, "tid": slotThread, "ts": delivered * 1e6,
+                          "dur": (finished - delivered) * 1e6, "args": {"waited_us": round((delivered - emitted) * 1e6, 1)}})
+            trace.append({"ph": "s", "name": name, "cat": "flow", "id": n, "pid": 0, "tid": emitThread, "ts": emitted * 1e6})
+            trace.append({"ph": "f", "bp": "e", "name": name, "cat": "flow", "id": n, "pid": 0, "tid": slotThread, "ts": delivered * 1e6})
+        with open(path, "w") as file:
+            json.dump({"traceEvents": trace, "displayTimeUnit": "ms"}, file)
+            file.close()
+        print("Signal trace written to " + path)
+
+class _TracedSlot(QObject):
+    """Calls a slot from the thread it would have run in, recording the delivery"""
+
+    def __init__(self, tracer, nameId, slot):
+        super().__init__()
+        self.tracer, self.nameId = tracer, nameId
+        self.slot = slot.emit if hasattr(slot, "emit") else slot # Signals connected to signals are emitted directly
+        self.emits = deque() # Emit times waiting for their slot, in order since Qt delivers each connection's events in order
+        receiver = getattr(slot, "__self__", None)
+        if isinstance(receiver, QObject):
+            self.moveToThread(receiver.thread()) # Keeps queued connections queued to the receiver's thread
+
+    def stamp(self, *args):
+        self.tracer.nameThread()
+        self.emits.append((time.perf_counter(), threading.get_ident()))
+
+    def deliver(self, *args):
+        start = time.perf_counter()
+        emitted, emitThread = self.emits.popleft() if self.emits else (start, threading.get_ident())
+        try:
+            self.slot(*args)
+        finally:
+            self.tracer.record(DELIVERY, self.nameId, emitted, emitThread, start, time.perf_counter(), threading.get_ident())
+
+tracer = SignalTracer()
@@ -0,0 +1,486 @@
+"""Soak test for the serial link
+
+Runs MetroMini against a stand-in for the Metro Mini on a pseudo-terminal for as long as asked, with a realistic mix of pixel, ring,
+set and request traffic, and injects the faults a real link suffers: dropped bytes, garbage bytes, reads split mid-message, writes
+stalled by a device that stops reading, and the device disappearing and restarting. It reports throughput, latency percentiles,
+parser CPU time and memory growth, so changes to the parser and the write queues can be judged on numbers. No display or hardware
+is needed:
+
+    QT_QPA_PLATFORM=offscreen python soak.py --duration 14400 --async
+
+Run with --help for every rate and fault.
+"""
+
+import os, re, sys, pty, time, random, select, argparse, threading, statistics, tracemalloc
+from bisect import bisect_left
+from collections import deque
+from queue import Queue, Empty
+from PyQt5.QtCore import QObject, QThread, QTimer, QMutexLocker, Qt
+from PyQt5.QtWidgets import QApplication
+from animation import Animation, Color
+from commands import PixelColor, PixelMode, RingPattern, RingChange, SetTarget, Request, RING_DIALS
+from metroMini import MetroMini, BAUD_RATE
+from asyncSerial import AsyncMetroMini
+from deliveryWindow import WINDOW_SIZE
+from lagMonitor import LagMonitor
+
+MIX = {"pixel color": 40, "pixel mode": 5, "ring pattern": 10, "ring change": 10, "set": 10, "request": 25} # Relative share of each command
+TICK = 10 # Milliseconds between bursts of traffic
+SETTLE_TIME = 5.0 # Seconds without new traffic or faults before the stand-in's settings are compared with the host's
+LOST_AFTER = 60.0 # Seconds after which a pixel color that never reached the stand-in stops being waited for
+EDGES = (0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000) # Histogram bucket edges in milliseconds
+REPLY = re.compile(r"5\d\.\d") # Replies to requests are 50.0-59.9 and readings are sent with two decimals, so they can't be confused
+PATTERNS = ("static", "breathe", "spin", "fade", "rainbow")
+
+class Histogram:
+    """Counts latencies in fixed buckets, so hours of samples take no more memory than a minute's"""
+
+    def __init__(self):
+        self.counts = [0] * (len(EDGES) + 1)
+        self.total = 0
+        self.worst = 0.0
+
+    def add(self, ms):
+        self.counts[bisect_left(EDGES, ms)] += 1
+        self.total += 1
+        self.worst = max(self.worst, ms)
+
+    def percentile(self, fraction):
+        needed, seen = fraction * self.total, 0
+        for edge, count in zip((*EDGES, float("inf")), self.counts):
+            seen += count
+            if seen >= needed:
+                return edge
+        return float("inf")
+
+    def summary(self):
+        if not self.total:
+            return "no samples"
+        return (f"p50 ≤ {self.percentile(0.5):g} ms   p99 ≤ {self.percentile(0.99):g} ms   p99.9 ≤ {self.percentile(0.999):g} ms   "
+                f"max {self.worst:.1f} ms   (n={self.total})")
+
+class Latency:
+    """Keeps exact samples for the current report interval and a histogram of every sample"""
+
+    def __init__(self):
+        self.recent = []
+        self.all = Histogram()
+
+    def add(self, seconds):
+        self.recent.append(seconds * 1000)
+        self.all.add(seconds * 1000)
+
+    def interval(self):
+        samples, self.recent = self.recent, []
+        if len(samples) < 2:
+            return "   -- ms /    -- ms"
+        p = statistics.quantiles(samples, n = 100)
+        return f"{p[49]:5.1f} ms / {p[98]:5.1f} ms"
+
+class StandIn:
+    """Plays the Metro Mini on the master side of a pseudo-terminal. It answers the handshake, baud negotiation, acknowledgements
+    and requests like the firmware, keeps the settings it's sent, streams pressure readings, and injects faults"""
+
+    def __init__(self, options, rng):
+        self.options, self.rng = options, rng
+        self.master, self.slave = pty.openpty() # The slave stays open so the host closing the port doesn't hang it up
+        self.path = os.ttyname(self.slave)
+        self.outbox = Queue()
+        self.state = {} # The settings applied, by the same keys as ShadowState
+        self.arrivals = {} # Text of each pixel color sent: the time it was emitted, removed when it arrives
+        self.latency = Latency() # From a pixel color's emit in the GUI thread to its arrival here
+        self.replies = {} # Request number modulo 100: when the reply was written
+        self.acks = False
+        self.requests = 0
+        self.received = 0 # Bytes from the host
+        self.commands = 0
+        self.malformed = 0
+        self.gone = False
+        self.restarts = deque() # Times the stand-in came back, waiting for the host to say it's ready
+        self.faults = {"dropped bytes": 0, "garbage bursts": 0, "split writes": 0, "stalls": 0, "disappearances": 0}
+        self.lock = threading.Lock() # Guards state and arrivals, which the GUI thread reads while the reader thread changes them
+        self.faulty = True # Cleared while settling, so the comparison at the end isn't made mid-fault
+        self.running = True
+        self.threads = [threading.Thread(target = self.read, daemon = True), threading.Thread(target = self.write, daemon = True)]
+
+    def start(self):
+        self.outbox.put(b"ready\r\n")
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self):
+        self.running = False
+        for thread in self.threads:
+            thread.join()
+
+    def close(self):
+        os.close(self.master)
+        os.close(self.slave)
+
+    def expect(self, text):
+        with self.lock:
+            self.arrivals[text] = time.monotonic()
+
+    def overdue(self, now):
+        with self.lock:
+            late = [text for text, emitted in self.arrivals.items() if now - emitted > LOST_AFTER]
+            for text in late:
+                del self.arrivals[text]
+        return len(late)
+
+    def send(self, line):
+        self.outbox.put(line.encode() + b"\r\n")
+
+    def read(self):
+        options, rng = self.options, self.rng
+        now = time.monotonic()
+        nextStall = now + rng.expovariate(1 / options.stall_every) if options.stall_every else float("inf")
+        nextGone = now + rng.expovariate(1 / options.disappear_every) if options.disappear_every else float("inf")
+        back, buffer = 0.0, b""
+        while self.running:
+            now = time.monotonic()
+            if self.faulty and now >= nextStall: # Stops reading, so the host's writes back up
+                self.faults["stalls"] += 1
+                time.sleep(options.stall_time)
+                nextStall = time.monotonic() + rng.expovariate(1 / options.stall_every)
+            if self.faulty and now >= nextGone:
+                self.faults["disappearances"] += 1
+                self.gone, back = True, now + options.disappear_time
+                nextGone = back + rng.expovariate(1 / options.disappear_every)
+            if self.gone and now >= back: # Comes back as if it had just been plugged in again
+                with self.lock:
+                    self.state = {}
+                self.gone, self.acks, buffer = False, False, b""
+                self.restarts.append(time.monotonic())
+                self.outbox.put(b"ready\r\n")
+            if not select.select([self.master], [], [], 0.05)[0]:
+                continue
+            data = os.read(self.master, 4096)
+            if self.gone:
+                continue
+            self.received += len(data)
+            buffer += self.drop(data)
+            *commands, buffer = buffer.split(b";")
+            for cmd in commands:
+                self.handle(cmd.decode(errors = "replace").strip())
+
+    def handle(self, cmd):
+        self.commands += 1
+        sequence = None
+        if cmd.startswith("@") and self.acks:
+            sequence, _, cmd = cmd[1:].partition(" ")
+            if not sequence.isdigit():
+                self.malformed += 1
+                return
+        with self.lock:
+            arrived = self.arrivals.pop(cmd, None)
+        if arrived is not None:
+            self.latency.add(time.monotonic() - arrived)
+        words = cmd.split()
+        if not words:
+            return
+        if words[0] == "baud" and len(words) == 2:
+            self.send(cmd)
+        elif words[0] == "echo":
+            self.send(cmd)
+        elif cmd == "acks on" and not self.options.no_acks:
+            self.acks = True
+            self.send(cmd)
+        elif cmd == "request":
+            self.replies[self.requests % 100] = time.monotonic()
+            self.send(f"{50 + self.requests % 100 / 10:.1f}")
+            self.requests += 1
+        elif self.apply(words):
+            if sequence is not None:
+                self.send("ack " + sequence)
+        else:
+            self.malformed += 1
+
+    def apply(self, words):
+        try:
+            if words[0] == "set" and len(words) == 2:
+                float(words[1])
+                key = "set"
+            elif words[0] == "pixel" and len(words) >= 3 and words[1] in ("0", "1"):
+                if words[2].isdigit():
+                    if len(words) != 5 or not (words[3].isdigit() and words[4].isdigit()):
+                        return False
+                    key = ("pixel", int(words[1]), "color")
+                elif words[2] == "static" and len(words) == 3 or words[2] in ("breathe", "cycle") and len(words) == 4 and words[3].isdigit():
+                    key = ("pixel", int(words[1]), "mode")
+                else:
+                    return False
+            elif words[0] == "ring" and len(words) == 4 and words[1] == "change" and words[2] in RING_DIALS:
+                float(words[3])
+                key = ("ring change", words[2])
+            elif words[0] == "ring" and len(words) >= 3 and words[1] in PATTERNS and re.fullmatch(r"\d+a?", words[2]):
+                key = "ring"
+            else:
+                return False
+        except ValueError:
+            return False
+        with self.lock:
+            if key == "ring":
+                for dial in [k for k in self.state if isinstance(k, tuple) and k[0] == "ring change"]:
+                    del self.state[dial]
+            self.state[key] = " ".join(words) + ";"
+        return True
+
+    def drop(self, data):
+        if not (self.faulty and self.options.drop):
+            return data
+        kept = bytes(b for b in data if self.rng.random() >= self.options.drop)
+        self.faults["dropped bytes"] += len(data) - len(kept)
+        return kept
+
+    def write(self):
+        options, rng = self.options, self.rng
+        period = 1 / options.telemetry if options.telemetry else None
+        nextReading = time.monotonic()
+        while self.running:
+            try:
+                line = self.outbox.get(timeout = max(nextReading - time.monotonic(), 0) if period else 0.05)
+            except Empty:
+                if period is None:
+                    continue
+                nextReading += period
+                line = f"{60 + 2 * abs((time.monotonic() % 20) / 10 - 1):.2f}\r\n".encode() # A slow sawtooth, always two decimals
+            if self.gone:
+                continue
+            line = self.drop(line)
+            if self.faulty and rng.random() < options.garbage:
+                self.faults["garbage bursts"] += 1
+                at = rng.randrange(len(line) + 1)
+                line = line[:at] + bytes(rng.randrange(256) for i in range(rng.randint(1, 8))) + line[at:]
+            if self.faulty and len(line) > 1 and rng.random() < options.split:
+                self.faults["split writes"] += 1
+                at = rng.randrange(1, len(line))
+                os.write(self.master, line[:at])
+                time.sleep(rng.uniform(0.001, 0.01)) # Long enough that the host reads the first part on its own
+                line = line[at:]
+            os.write(self.master, line)
+
+class TimedParse:
+    """Adds the soak test's measurements to a MetroMini: the CPU time spent parsing, and the port the stand-in is on"""
+
+    def findPort(self):
+        return self.port
+
+    def parse(self, data):
+        start = time.thread_time()
+        super().parse(data)
+        self.parseTime += time.thread_time() - start
+        self.parsedBytes += len(data)
+
+class SoakMetroMini(TimedParse, MetroMini):
+    parseTime, parsedBytes = 0.0, 0
+
+class SoakAsyncMetroMini(TimedParse, AsyncMetroMini):
+    parseTime, parsedBytes = 0.0, 0
+
+class Traffic(QObject):
+    """Sends a random mix of commands from the GUI thread at a steady rate, remembering when each pixel color was sent"""
+
+    def __init__(self, serial, standIn, rate, rng):
+        super().__init__()
+        self.serial, self.standIn, self.rate, self.rng = serial, standIn, rate, rng
+        self.kinds, self.weights = list(MIX), list(MIX.values())
+        self.sent = 0
+        self.hue = 0
+        self.start = None
+        self.timer = QTimer(self)
+        self.timer.setInterval(TICK)
+        self.timer.timeout.connect(self.tick)
+
+    def begin(self):
+        self.start = time.monotonic()
+        self.timer.start()
+
+    def tick(self):
+        due = int((time.monotonic() - self.start) * self.rate)
+        for kind in self.rng.choices(self.kinds, self.weights, k = due - self.sent):
+            self.serial.broadcast.emit(self.command(kind))
+        self.sent = max(due, self.sent)
+
+    def command(self, kind):
+        rng = self.rng
+        if kind == "pixel color": # Every one is different, so its arrival at the stand-in can be timed
+            self.hue = (self.hue + 1) % 65536
+            cmd = PixelColor(rng.randrange(2), self.hue, rng.randrange(256), rng.randrange(256))
+            self.standIn.expect(cmd.text().rstrip(";"))
+            return cmd
+        if kind == "pixel mode":
+            return PixelMode(rng.randrange(2), rng.choice((Animation.STATIC, Animation.BREATHE, Animation.CYCLE)), rng.randrange(1, 10))
+        if kind == "ring pattern":
+            scheme = rng.choice(list(Color))
+            argument = rng.randrange(65536) if scheme == Color.SINGLE else rng.randrange(1, 10) / 2.0
+            return RingPattern(rng.choice((Animation.STATIC, Animation.BREATHE, Animation.SOLID_SPIN, Animation.FADE_SPIN, Animation.RAINBOW_SPIN)),
+                               rng.choice((1, 2, 3, 4, 6, 8, 12, 24)), False, rng.randrange(1, 10), rng.random() < 0.5, scheme, argument)
+        if kind == "ring change":
+            dial = rng.choice(RING_DIALS)
+            return RingChange(dial, rng.randrange(65536) if dial == "hue" else rng.randrange(1, 10) / (2.0 if dial == "step" else 1))
+        if kind == "set":
+            return SetTarget(rng.randrange(40, 100, 5))
+        return Request()
+
+class Soak(QObject):
+    """Wires the host, the stand-in and the traffic together and reports on them"""
+
+    def __init__(self, app, options):
+        super().__init__()
+        self.app, self.options = app, options
+        rng = random.Random(options.seed)
+        self.standIn = StandIn(options, random.Random(rng.random()))
+        cls = SoakAsyncMetroMini if options.use_async else SoakMetroMini
+        self.uc = cls(BAUD_RATE, self.standIn.path, options.window)
+        self.traffic = Traffic(self.uc, self.standIn, options.rate, random.Random(rng.random()))
+        self.replyLatency = Latency() # From the stand-in writing a reply to a request to the host parsing it
+        self.recovery = Latency() # From the stand-in restarting to the host being ready again
+        self.lines = 0
+        self.lost = 0 # Pixel colors that never reached the stand-in
+        self.readyCount = 0
+        self.uc.received.connect(self.received, Qt.DirectConnection) # Timed in the thread that parsed it
+        self.uc.ready.connect(self.ready)
+        if options.use_async: # There's no second thread to start or monitor
+            self.thread, self.serialLag = None, None
+            QTimer.singleShot(0, self.uc.begin)
+        else:
+            self.thread = QThread()
+            self.thread.setObjectName("MetroMini")
+            self.uc.moveToThread(self.thread)
+            self.thread.started.connect(self.uc.begin)
+            self.serialLag = LagMonitor("serial")
+            self.serialLag.moveToThread(self.thread)
+            self.thread.started.connect(self.serialLag.start)
+            self.uc.close.connect(self.serialLag.stop) # Its timer has to be stopped from its own thread
+            self.thread.start()
+        self.guiLag = LagMonitor("GUI")
+        self.guiLag.start()
+        if options.trace_memory:
+            tracemalloc.start()
+        QTimer.singleShot(300, self.standIn.start) # After the host has opened the port, which flushes anything already written
+        self.reportTimer = QTimer(self)
+        self.reportTimer.timeout.connect(self.report)
+        self.began = self.lastReport = time.monotonic()
+        self.lastCounts = (0, 0, 0, 0.0)
+        self.baseline = None
+
+    def ready(self):
+        self.readyCount += 1
+        if self.readyCount == 1:
+            print(f"{'':>8} link ready, acknowledged delivery {'on' if self.uc.delivery.enabled else 'off'}")
+            self.baseline = (time.monotonic(), self.rss()) # Growth is measured from here, once everything has been allocated
+            self.traffic.begin()
+            self.reportTimer.start(int(self.options.interval * 1000))
+            QTimer.singleShot(int(self.options.duration * 1000), self.finish)
+        elif self.standIn.restarts:
+            self.recovery.add(time.monotonic() - self.standIn.restarts.popleft())
+
+    def received(self, batch):
+        now = time.monotonic()
+        self.lines += len(batch.messages)
+        for msg in batch.messages:
+            if REPLY.fullmatch(msg):
+                written = self.standIn.replies.get(round((float(msg) - 50) * 10))
+                if written is not None:
+                    self.replyLatency.add(now - written)
+
+    def rss(self):
+        try:
+            with open("/proc/self/statm") as file:
+                return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+        except OSError:
+            import resource
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 # Peak rather than current where there's no /proc
+
+    def report(self):
+        now = time.monotonic()
+        elapsed, span = now - self.began, now - self.lastReport
+        counts = (self.traffic.sent, self.standIn.received, self.lines, self.uc.parseTime)
+        sent, received, lines, parseTime = (c - l for c, l in zip(counts, self.lastCounts))
+        self.lastCounts, self.lastReport = counts, now
+        rss = self.rss()
+        self.lost += self.standIn.overdue(now)
+        queued = len(self.uc.delivery.queue) + (self.uc.outbox.qsize() if self.options.use_async else len(self.uc.outbox))
+        print(f"{elapsed:7.0f}s tx {sent / span:6.1f} cmd/s {received / span / 1000:5.2f} kB/s | rx {lines / span:6.1f} lines/s | "
+              f"cmd {self.standIn.latency.interval()} | reading {self.replyLatency.interval()} | "
+              f"parse {parseTime / max(lines, 1) * 1e6:5.1f} us/line {parseTime / span * 100:5.2f}% | rss {rss:6.1f} MB "
+              f"({rss - self.baseline[1]:+.1f}) | window {len(self.uc.delivery.inFlight)}+{queued}", flush = True)
+
+    def finish(self):
+        self.traffic.timer.stop()
+        self.standIn.faulty = False # Any fault under way finishes, but no new ones start
+        settle = SETTLE_TIME + max(self.options.stall_time, self.options.disappear_time) # Room for a fault under way to finish
+        print(f"{'':>8} traffic stopped, settling for {settle:.0f} s")
+        QTimer.singleShot(int(settle * 1000), self.summarize)
+
+    def summarize(self):
+        self.reportTimer.stop()
+        self.report()
+        uc, standIn, elapsed = self.uc, self.standIn, time.monotonic() - self.began
+        standIn.stop() # Its threads are finished with, so its settings can be read without the lock
+        self.lost += len(standIn.arrivals) # Anything still missing after the settling time isn't coming
+        with QMutexLocker(uc.lock): # The serial thread changes the shadow when it parses "ready"
+            desired = {k: c.text() for k, c in uc.shadow.desired.items()}
+        wrong = sorted(f"{desired.get(k)} sent, {standIn.state.get(k)} applied" for k in set(desired) | set(standIn.state)
+                       if desired.get(k) != standIn.state.get(k))
+        hours = (time.monotonic() - self.baseline[0]) / 3600
+        growth = self.rss() - self.baseline[1]
+        print()
+        print(f"{'duration':<24} {elapsed:.0f} s, {'async' if self.options.use_async else 'threaded'} transport, seed {self.options.seed}")
+        print(f"{'throughput':<24} {self.traffic.sent / elapsed:.1f} commands/s sent, {standIn.received / elapsed / 1000:.2f} kB/s "
+              f"reached the stand-in, {self.lines / elapsed:.1f} lines/s parsed")
+        print(f"{'command latency':<24} {self.standIn.latency.all.summary()}")
+        print(f"{'reading latency':<24} {self.replyLatency.all.summary()}")
+        print(f"{'recovery after restart':<24} {self.recovery.all.summary()}")
+        print(f"{'parser':<24} {uc.parseTime / max(self.lines, 1) * 1e6:.1f} us CPU per line, "
+              f"{uc.parseTime / max(uc.parsedBytes, 1) * 1e9:.0f} ns per byte, {uc.parseTime / elapsed * 100:.2f}% of a core")
+        print(f"{'memory':<24} {self.rss():.1f} MB, {growth:+.2f} MB since the link came up ({growth / hours:+.2f} MB/h)")
+        print(f"{'faults':<24} " + ", ".join(f"{n} {name}" for name, n in standIn.faults.items()))
+        print(f"{'delivery':<24} {uc.delivery.summary()}")
+        print(f"{'telemetry':<24} {uc.telemetry.summary()}")
+        print(f"{'shadow':<24} {uc.shadow.summary()}")
+        print(f"{'stand-in':<24} {standIn.commands} commands, {standIn.malformed} malformed, {self.lost} pixel colors never arrived "
+              f"(replaced while queued, or lost)")
+        for monitor in (self.guiLag, self.serialLag):
+            if monitor is not None:
+                print(f"{monitor.name + ' lag':<24} {monitor.summary()}")
+        print(f"{'settings':<24} " + ("all match the host's" if not wrong else f"{len(wrong)} differ from the host's"))
+        for difference in wrong:
+            print(f"{'':<24} {difference}")
+        if self.options.trace_memory:
+            for stat in tracemalloc.take_snapshot().statistics("lineno")[:10]:
+                print(f"{'':<24} {stat}")
+        uc.close.emit()
+        self.guiLag.stop()
+        if self.thread is not None:
+            self.thread.quit()
+            self.thread.wait()
+        standIn.close()
+        self.app.quit()
+
+def arguments():
+    parser = argparse.ArgumentParser(description = "Soak test for the serial link")
+    parser.add_argument("--duration", type = float, default = 60.0, help = "seconds of traffic (default 60)")
+    parser.add_argument("--interval", type = float, default = 10.0, help = "seconds between reports (default 10)")
+    parser.add_argument("--rate", type = float, default = 50.0, help = "commands per second (default 50)")
+    parser.add_argument("--telemetry", type = float, default = 20.0, help = "pressure readings per second from the stand-in (default 20)")
+    parser.add_argument("--drop", type = float, default = 0.0005, help = "chance of each byte being lost, both ways (default 0.0005)")
+    parser.add_argument("--garbage", type = float, default = 0.01, help = "chance of random bytes in each line from the stand-in (default 0.01)")
+    parser.add_argument("--split", type = float, default = 0.2, help = "chance of each line from the stand-in arriving in two reads (default 0.2)")
+    parser.add_argument("--stall-every", type = float, default = 60.0, help = "mean seconds between read stalls, 0 for none (default 60)")
+    parser.add_argument("--stall-time", type = float, default = 2.0, help = "seconds the stand-in stops reading for (default 2)")
+    parser.add_argument("--disappear-every", type = float, default = 300.0, help = "mean seconds between disappearances, 0 for none (default 300)")
+    parser.add_argument("--disappear-time", type = float, default = 3.0, help = "seconds the stand-in is gone before restarting (default 3)")
+    parser.add_argument("--window", type = int, default = WINDOW_SIZE, help = f"delivery window, 0 to turn acknowledgements off (default {WINDOW_SIZE})")
+    parser.add_argument("--no-acks", action = "store_true", help = "play firmware that doesn't acknowledge commands")
+    parser.add_argument("--async", dest = "use_async", action = "store_true", help = "use the asyncio transport instead of the serial thread")
+    parser.add_argument("--seed", type = int, default = 0, help = "seed for the traffic and the faults (default 0)")
+    parser.add_argument("--trace-memory", action = "store_true", help = "list the lines holding the most memory at the end (slow)")
+    return parser.parse_args()
+
+if __name__ == '__main__':
+    options = arguments()
+    app = QApplication(sys.argv[:1])
+    soak = Soak(app, options)
+    sys.exit(app.exec_())
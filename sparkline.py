@@ -0,0 +1,70 @@
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QColor, QFont, QImage, QPainter, QPen
+from PyQt5.QtWidgets import QWidget
+
+SPARKLINE_MIN = 20.0 # Pressures in PSI at the bottom and top of the sparkline
+SPARKLINE_MAX = 100.0
+LINE_COLOR = QColor("#61136e")
+BACKGROUND = QColor("#ffffff")
+
+class Sparkline(QWidget):
+    """CLASS: Sparkline
+
+    This widget draws the pressure history as a line, one pixel column per sample spanning the readings it covers. Columns are drawn into an image used as a ring, so
+    each sample only draws its own column and painting is two blits that put the oldest column on the left.
+
+    SIGNALS                      SLOTS
+    -------    ----------------------
+    none       (float, float) addSample
+    """
+
+    def __init__(self, parent, history, geometry):
+        super().__init__(parent)
+        self.setGeometry(geometry)
+        self.history = history
+        self.image = QImage(geometry.width(), geometry.height(), QImage.Format_RGB32)
+        self.image.fill(BACKGROUND)
+        self.column = 0 # Where the next sample is drawn
+        self.lastY = None # Top and bottom of the previous column, before it was joined to the one before it
+        self.font = QFont()
+        self.font.setPointSize(8)
+        history.sampleAdded.connect(self.addSample)
+
+    def addSample(self, low, high):
+        """SLOT: addSample
+
+        Draws the newest sample as one column from its lowest to its highest reading, joined to the previous one
+
+        Expects:
+            float - The lowest pressure in PSI
+            float - The highest pressure in PSI
+
+        Connects to:
+            PressureHistory.sampleAdded
+        """
+        h = self.image.height()
+        y = lambda psi: h - 1 - round(min(max((psi - SPARKLINE_MIN) / (SPARKLINE_MAX - SPARKLINE_MIN), 0.0), 1.0) * (h - 1))
+        top, bottom = y(high), y(low)
+        if self.lastY is not None: # Reaches the previous column's range so the line has no gaps
+            top, bottom = min(top, self.lastY[1]), max(bottom, self.lastY[0])
+        painter = QPainter(self.image)
+        painter.fillRect(self.column, 0, 1, h, BACKGROUND)
+        painter.fillRect(self.column, top, 1, bottom - top + 1, LINE_COLOR)
+        painter.end()
+        self.lastY = (y(high), y(low))
+        self.column = (self.column + 1) % self.image.width()
+        self.update()
+
+    def paintEvent(self, event):
+        w = self.image.width()
+        painter = QPainter(self)
+        painter.drawImage(0, 0, self.image, self.column, 0, w - self.column, -1)
+        painter.drawImage(w - self.column, 0, self.image, 0, 0, self.column, -1)
+        summary = self.history.summary()
+        if summary:
+            painter.setFont(self.font)
+            box = painter.boundingRect(self.rect().adjusted(4, 0, 0, 0), Qt.AlignLeft | Qt.AlignVCenter, summary)
+            painter.fillRect(box.adjusted(-4, 0, 4, 0), BACKGROUND) # Covers the oldest samples rather than the newest
+            painter.setPen(QPen(Qt.black))
+            painter.drawText(box, Qt.AlignLeft | Qt.AlignVCenter, summary)
+        painter.end()
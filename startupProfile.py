@@ -0,0 +1,208 @@
+import sys, time, json, threading
+from importlib.abc import MetaPathFinder
+
+PROCESS_START = time.perf_counter() # main.py imports this module first, so this is as close to launch as Python can measure
+REPORT_FILE = "startup-profile" # Written with .json and .folded extensions when profiling is enabled
+
+class StartupProfile:
+    """CLASS: StartupProfile
+
+    This class records how long each stage of startup takes, as well as the milestones that matter on the blaster: the first frame on
+    the screen and the moment the blaster is armed (able to fire with the Metro Mini initialized).
+
+    Phases are always recorded since they cost next to nothing. Timing every import is only done when enabled with --profile-startup,
+    in which case a JSON report and a folded-stack file (for flamegraph.pl, speedscope, etc.) are written once startup is complete.
+    """
+
+    def __init__(self):
+        self.records = [] # (stack, start, end, thread) with times in seconds since launch
+        self.stack = [] # Names of the phases and imports currently running on the main thread
+        self.milestones = {}
+        self.enabled = False
+
+    def enable(self):
+        """METHOD: enable
+
+        Starts timing every module imported from now on
+
+        Called by:
+            main (module level, before the Qt imports)
+
+        Arguments:
+            none
+
+        Returns:
+            none
+        """
+        if not self.enabled:
+            self.enabled = True
+            sys.meta_path.insert(0, _ImportTimer(self))
+
+    def phase(self, name):
+        """METHOD: phase
+
+        Times a block of code as a named phase, to be used in a with statement
+
+        Called by:
+            MainWindow.__init__, MainWindow.buildLightingTools
+
+        Arguments:
+            str - The name of the phase
+
+        Returns:
+            _Phase - The context manager timing the block
+        """
+        return _Phase(self, name)
+
+    def interval(self, name, start, end):
+        """METHOD: interval
+
+        Records something that started and ended in different places, such as a thread starting up
+
+        Called by:
+            MainWindow.__init__
+
+        Arguments:
+            str - The name of the interval
+            float - The start time from time.perf_counter
+            float - The end time from time.perf_counter
+
+        Returns:
+            none
+        """
+        self.records.append(((name,), start - PROCESS_START, end - PROCESS_START, threading.current_thread().name))
+
+    def mark(self, name):
+        """METHOD: mark
+
+        Records a milestone the first time it's reached
+
+        Called by:
+            MainWindow.eventFilter, MainWindow.initializeSerialObjects
+
+        Arguments:
+            str - The name of the milestone
+
+        Returns:
+            none
+        """
+        self.milestones.setdefault(name, time.perf_counter() - PROCESS_START)
+
+    def summary(self):
+        """METHOD: summary
+
+        Builds a one-line description of the milestones reached so far
+
+        Called by:
+            MainWindow.initializeSerialObjects, write
+
+        Arguments:
+            none
+
+        Returns:
+            str - The milestones and their times in milliseconds
+        """
+        return ", ".join(f"{name}: {t * 1000:.0f} ms" for name, t in self.milestones.items())
+
+    def write(self, path = REPORT_FILE):
+        """METHOD: write
+
+        Writes the JSON report and the folded stacks, each line of which holds a stack and the time in microseconds spent in its last
+        frame itself
+
+        Called by:
+            MainWindow.finishStartupProfile
+
+        Arguments:
+            str - The file name without extension
+
+        Returns:
+            none
+        """
+        records = list(self.records)
+        report = {"python": sys.version.split()[0],
+                  "milestones_ms": {name: round(t * 1000, 3) for name, t in self.milestones.items()},
+                  "records": [{"stack": list(stack), "start_ms": round(start * 1000, 3), "duration_ms": round((end - start) * 1000, 3),
+                               "thread": thread} for stack, start, end, thread in records]}
+        with open(path + ".json", "w") as file:
+            json.dump(report, file, indent=2)
+            file.close()
+
+        folded = {}
+        for stack, start, end, thread in records:
+            folded[stack] = folded.get(stack, 0.0) + end - start
+        for stack, start, end, thread in records: # Take each child's time out of its parent to leave self time
+            if len(stack) > 1 and stack[:-1] in folded:
+                folded[stack[:-1]] -= end - start
+        with open(path + ".folded", "w") as file:
+            for stack, t in folded.items():
+                file.write(f"{';'.join(stack)} {max(int(t * 1e6), 0)}\n")
+            file.close()
+        print("Startup profile written to " + path + ".json and " + path + ".folded (" + self.summary() + ")")
+
+class _Phase:
+    def __init__(self, profile, name):
+        self.profile, self.name = profile, name
+
+    def __enter__(self):
+        self.profile.stack.append(self.name)
+        self.start = time.perf_counter() - PROCESS_START
+
+    def __exit__(self, *args):
+        self.profile.records.append((tuple(self.profile.stack), self.start, time.perf_counter() - PROCESS_START, threading.current_thread().name))
+        self.profile.stack.pop()
+
+class _ImportTimer(MetaPathFinder):
+    """Finds modules with the other finders and wraps their loaders so loading is timed"""
+
+    def __init__(self, profile):
+        self.profile = profile
+
+    def find_spec(self, name, path, target = None):
+        if threading.current_thread() is not threading.main_thread():
+            return None
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(name, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = _TimedLoader(spec.loader, self.profile, name)
+                return spec
+        return None
+
+class _TimedLoader:
+    """Delegates to a real loader, timing module creation and execution as one import"""
+
+    def __init__(self, loader, profile, name):
+        self.loader, self.profile, self.name = loader, profile, name
+        self.start = None
+
+    def __getattr__(self, attr):
+        return getattr(self.loader, attr)
+
+    def create_module(self, spec):
+        self.begin() # Extension modules do most of their loading here, including imports of their own
+        try:
+            return self.loader.create_module(spec)
+        except BaseException:
+            self.end()
+            raise
+
+    def exec_module(self, module):
+        if self.start is None:
+            self.begin()
+        try:
+            self.loader.exec_module(module)
+        finally:
+            self.end()
+
+    def begin(self):
+        self.start = time.perf_counter() - PROCESS_START
+        self.profile.stack.append("import " + self.name)
+
+    def end(self):
+        self.profile.records.append((tuple(self.profile.stack), self.start, time.perf_counter() - PROCESS_START, "MainThread"))
+        self.profile.stack.pop()
+
+profile = StartupProfile()
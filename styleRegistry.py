@@ -0,0 +1,145 @@
+import json, re
+from PyQt5 import QtWidgets
+
+STYLE_FILE = "styles.json"
+LOOK_PROPERTY = "enabledLook" # Dynamic property that the shared style sheet selects on
+CLASS_PROPERTY = "styleClass" # Dynamic property for looks that aren't named after a Qt class, like LayoutCountButton
+
+class StyleRegistry:
+    """CLASS: StyleRegistry
+
+    This class loads the enabled and disabled looks from the style JSON once per process and turns them into a single cached style
+    sheet keyed on dynamic properties. Switching a widget's look then only re-polishes that widget, and only if its look actually changed.
+    """
+
+    _shared = None
+
+    @classmethod
+    def shared(cls):
+        """METHOD: shared
+
+        Access method for the process-wide registry, which is created the first time it's needed
+
+        Called by:
+            MainWindow.__init__, PixelTool.__init__, RingTool.__init__
+
+        Arguments:
+            none
+
+        Returns:
+            StyleRegistry - The shared registry
+        """
+        if cls._shared is None:
+            cls._shared = StyleRegistry()
+        return cls._shared
+
+    def __init__(self, path = STYLE_FILE):
+        with open(path) as file:
+            styles = json.load(file)
+            file.close()
+
+        rules = []
+        for key, sheet in styles.items():
+            name, en = key.rsplit("-", 1)
+            look = f'[{LOOK_PROPERTY}="{en.lower()}"]'
+            if not hasattr(QtWidgets, name):
+                look = f'[{CLASS_PROPERTY}="{name}"]' + look
+            if "{" not in sheet: # Bare declarations apply to the widget itself
+                sheet = f"{name}{{{sheet}}}"
+            for selector, body in re.findall(r"([^{}]+)\{([^{}]*)\}", sheet):
+                selector = selector.strip()
+                widgetType, pseudo = re.match(r"([A-Za-z]+)(.*)", selector).groups()
+                rules.append(f"{widgetType}{look}{pseudo}{{{body}}}")
+        self.styleSheet = "\n".join(rules)
+        self.polishCount = 0
+
+    def install(self, widget):
+        """METHOD: install
+
+        Adds the shared style sheet to a widget containing every styled widget. It has to be the closest common ancestor rather than the
+        application because the main window's own sheet would otherwise win over it.
+
+        Called by:
+            MainWindow.__init__
+
+        Arguments:
+            QWidget - The common ancestor of the styled widgets
+
+        Returns:
+            none
+        """
+        widget.setStyleSheet(widget.styleSheet() + "\n" + self.styleSheet)
+
+    def register(self, styleClass, *widgets):
+        """METHOD: register
+
+        Assigns a look that isn't named after the widgets' Qt class
+
+        Called by:
+            RingTool.__init__
+
+        Arguments:
+            str - The name of the look in the style JSON, without the enabled suffix
+            QWidget - One or more widgets using that look
+
+        Returns:
+            none
+        """
+        for w in widgets:
+            w.setProperty(CLASS_PROPERTY, styleClass)
+
+    def applyLooks(self, looks):
+        """METHOD: applyLooks
+
+        Applies a whole set of looks at once. Only the widgets whose look changes are touched, and their updates are suspended until
+        all of them are re-polished so each one is painted once. Suspending the containing panes instead would repaint every child.
+
+        Called by:
+            RingTool.patternChanged
+
+        Arguments:
+            dict - Widgets and whether each should appear enabled
+
+        Returns:
+            int - The number of widgets that were re-polished
+        """
+        changed = [(w, bool(en)) for w, en in looks.items() if w.property(LOOK_PROPERTY) is None or w.property(LOOK_PROPERTY) != bool(en)]
+        for w, en in changed:
+            w.setUpdatesEnabled(False)
+        for w, en in changed:
+            self.setLook(en, w)
+        for w, en in changed:
+            w.setUpdatesEnabled(True)
+        return len(changed)
+
+    def setLook(self, en, *widgets):
+        """METHOD: setLook
+
+        Changes the appearance of the given widgets to enabled or disabled, re-polishing only those whose look changes
+
+        Called by:
+            applyLooks, PixelTool.changeMode, RingTool.changeStyle
+
+        Arguments:
+            bool - Whether the widgets should appear enabled or disabled
+            QWidget - One or more widgets that need to be updated
+
+        Returns:
+            int - The number of widgets that were re-polished
+        """
+        polished = 0
+        en = bool(en)
+        for w in widgets:
+            current = w.property(LOOK_PROPERTY)
+            if current is None:
+                w.setStyleSheet("") # The widget's own sheet from the UI file would override the shared one
+            elif current == en:
+                continue
+            w.setProperty(LOOK_PROPERTY, en)
+            style = w.style()
+            style.unpolish(w)
+            style.polish(w)
+            w.update()
+            polished += 1
+        self.polishCount += polished
+        return polished
@@ -0,0 +1,110 @@
+import math, time
+from collections import deque
+
+FILTER = "median" # How readings are smoothed: "median", "ema" or "none"
+MEDIAN_WINDOW = 5 # Readings in the running median
+EMA_ALPHA = 0.3 # Weight of each new reading in the exponential moving average
+PSI_LIMITS = (0.0, 150.0) # Readings outside this range can't be real
+OUTLIER_LIMIT = 15.0 # Readings this many PSI away from the smoothed value are dropped as outliers...
+OUTLIER_RUN = 3 # ...unless this many arrive in a row, which means the pressure really changed (after a shot, for example)
+DISPLAY_INTERVAL = 0.2 # Shortest time in seconds between LCD updates
+
+class TelemetryFilter:
+    """CLASS: TelemetryFilter
+
+    This class sits between the serial port and the pressure display. It checks that each line from the Metro Mini is a plausible
+    pressure, drops isolated outliers, smooths what's left and decides when the LCD may be updated. Rejected lines are counted by
+    reason instead of crashing the serial thread or flashing on the LCD.
+    """
+
+    def __init__(self, mode = FILTER, window = MEDIAN_WINDOW, alpha = EMA_ALPHA, limits = PSI_LIMITS, outlierLimit = OUTLIER_LIMIT,
+                 interval = DISPLAY_INTERVAL):
+        if mode not in ("median", "ema", "none"):
+            raise ValueError("Unknown telemetry filter: " + str(mode))
+        self.mode, self.alpha, self.limits, self.outlierLimit, self.interval = mode, alpha, limits, outlierLimit, interval
+        self.recent = deque(maxlen = window)
+        self.smoothed = None
+        self.outlierRun = 0
+        self.accepted = 0
+        self.rejected = {"malformed": 0, "out of range": 0, "outlier": 0}
+        self.lastDisplay = float("-inf")
+
+    def addFrame(self, msg):
+        """METHOD: addFrame
+
+        Validates and smooths one line of telemetry
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            str - The line received from the Metro Mini
+
+        Returns:
+            float - The smoothed pressure, or None if the line was rejected
+            str - The reason the line was rejected, or None if it was accepted
+        """
+        try:
+            psi = float(msg)
+        except ValueError:
+            return self.reject("malformed")
+        if not math.isfinite(psi) or not self.limits[0] <= psi <= self.limits[1]:
+            return self.reject("out of range")
+        if self.smoothed is not None and abs(psi - self.smoothed) > self.outlierLimit:
+            self.outlierRun += 1
+            if self.outlierRun < OUTLIER_RUN:
+                return self.reject("outlier")
+            self.recent.clear() # The pressure has moved, so start smoothing again from here
+            self.smoothed = None
+        self.outlierRun = 0
+
+        self.recent.append(psi)
+        if self.mode == "median":
+            self.smoothed = sorted(self.recent)[len(self.recent) // 2]
+        elif self.mode == "ema" and self.smoothed is not None:
+            self.smoothed += self.alpha * (psi - self.smoothed)
+        else:
+            self.smoothed = psi
+        self.accepted += 1
+        return self.smoothed, None
+
+    def reject(self, reason):
+        self.rejected[reason] += 1
+        return None, reason
+
+    def displayDelay(self):
+        """METHOD: displayDelay
+
+        Checks whether the LCD may be updated now, and if so counts this as the latest update
+
+        Called by:
+            TelemetryRing.drain
+
+        Arguments:
+            none
+
+        Returns:
+            float - Seconds to wait before the next update is allowed, or 0 if it's allowed now
+        """
+        now = time.monotonic()
+        wait = self.lastDisplay + self.interval - now
+        if wait > 0:
+            return wait
+        self.lastDisplay = now
+        return 0.0
+
+    def summary(self):
+        """METHOD: summary
+
+        Builds a one-line description of the counters
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            none
+
+        Returns:
+            str - The number of accepted and rejected readings
+        """
+        return f"{self.accepted} accepted, " + ", ".join(f"{n} {reason}" for reason, n in self.rejected.items())
@@ -0,0 +1,135 @@
+import math, time
+from array import array
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal
+
+RING_CAPACITY = 1024 # Records kept between the serial thread and the GUI, a power of two so positions wrap with a mask
+
+class TelemetryRing(QObject):
+    """CLASS: TelemetryRing
+
+    This class hands filtered pressure readings from the serial thread to the GUI thread without a lock or an allocation per reading.
+    Records are written into fixed arrays used as a ring. Only the serial thread moves the head and only the GUI thread moves the
+    tail, and each side only reads the other's counter, so neither ever waits. The serial thread wakes the GUI with one queued signal
+    when the ring goes from drained to pending, and the GUI takes everything pending in a single pass. Every record drained is passed
+    on with the time it was received, for anything that needs every reading, while only the newest reaches the display. If the GUI
+    falls a whole ring behind, the oldest records are overwritten and counted as overruns.
+
+    SIGNALS                                    SLOTS
+    -------------------------------    -------------
+    newDataAvailable        (float)    ()      drain
+    readingDrained   (float, float)
+    wake                         ()
+    """
+
+    newDataAvailable = pyqtSignal(float)
+    """SIGNAL: newDataAvailable
+
+    Passes the newest reading on to the display, in the GUI thread and at most once per DISPLAY_INTERVAL
+
+    Broadcasts:
+        float - The pressure in PSI
+
+    Connects to:
+        MetroMini.newDataAvailable
+    """
+
+    readingDrained = pyqtSignal(float, float)
+    """SIGNAL: readingDrained
+
+    Passes on every record taken from the ring, in the GUI thread and in the order they were received
+
+    Broadcasts:
+        float - When the serial thread received the reading, from time.monotonic
+        float - The pressure in PSI
+
+    Connects to:
+        MetroMini.newReading
+    """
+
+    wake = pyqtSignal()
+    """SIGNAL: wake
+
+    An internal signal the serial thread emits when it adds a record to a drained ring
+
+    Broadcasts:
+        none
+
+    Connects to:
+        drain
+    """
+
+    def __init__(self, displayDelay, capacity = RING_CAPACITY):
+        super().__init__()
+        if capacity & (capacity - 1):
+            raise ValueError("Ring capacity must be a power of two: " + str(capacity))
+        self.mask = capacity - 1
+        self.times = array("d", bytes(8 * capacity)) # Seconds from time.monotonic
+        self.values = array("d", bytes(8 * capacity))
+        self.head = 0 # Records ever pushed, only written by the serial thread
+        self.tail = 0 # Records ever drained, only written by the GUI thread
+        self.woken = False # Set by the serial thread when it wakes the GUI, cleared by the GUI before it drains
+        self.overruns = 0
+        self.displayDelay = displayDelay
+        self.latest = None # The newest reading, waiting for the display if it was updated too recently
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.drain)
+        self.wake.connect(self.drain) # Queued, since the serial thread emits it
+
+    def push(self, psi):
+        """METHOD: push
+
+        Writes one reading into the ring and wakes the GUI thread unless it's already been woken
+
+        Called by:
+            MetroMini.parse
+
+        Arguments:
+            float - The filtered pressure in PSI
+
+        Returns:
+            none
+        """
+        head = self.head
+        i = head & self.mask
+        self.times[i] = time.monotonic()
+        self.values[i] = psi
+        self.head = head + 1 # Publishes the record
+        if not self.woken: # Checked after publishing, so a drain that cleared it will either see this record or be woken again
+            self.woken = True
+            self.wake.emit()
+
+    def drain(self):
+        """SLOT: drain
+
+        Takes every pending record and passes each one on, then sends the newest one to the display, or waits until the display may be
+        updated again
+
+        Expects:
+            none
+
+        Connects to:
+            wake, QTimer.timeout (timer)
+
+        Emits:
+            readingDrained, newDataAvailable
+        """
+        self.woken = False
+        head = self.head
+        if head != self.tail:
+            first = max(self.tail, head - self.mask - 1) # Anything older has been overwritten
+            self.overruns += first - self.tail
+            for n in range(first, head):
+                i = n & self.mask
+                self.readingDrained.emit(self.times[i], self.values[i])
+            self.latest = self.values[(head - 1) & self.mask]
+            self.tail = head
+        if self.latest is None:
+            return
+        wait = self.displayDelay()
+        if wait > 0:
+            if not self.timer.isActive():
+                self.timer.start(math.ceil(wait * 1000))
+        else:
+            psi, self.latest = self.latest, None
+            self.newDataAvailable.emit(psi)
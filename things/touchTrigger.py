@@ -1,4 +1,5 @@
 from PyQt5.QtCore import pyqtSignal, QState, QStateMachine, QSignalTransition
+from signalTracer import tracer
 from things.button import Button
 
 class TouchTrigger(QStateMachine, Button):
@@ -97,6 +98,8 @@ class TouchTrigger(QStateMachine, Button):
         self.spinDown.setTargetState(self.offState)
         self.revState.addTransition(self.pressed, self.onState)
         self.onState.addTransition(self.released, self.revState)
+        tracer.watch(self.touched, "touched")
+        tracer.watch(self.pressed, "pressed")
         
         self.start()
     
@@ -0,0 +1,137 @@
+import re
+from PyQt5.QtWidgets import QWidget
+
+CHANNELS = ("Red", "Green", "Blue")
+HEADING = re.compile(r"([A-Z]{2,})$") # Static captions are named in capitals, like leftCYCLE or ANIMATION
+
+class Panel:
+    """CLASS: Panel
+
+    This class holds every widget in one QToolBox pane, sorted by the role it plays, so the NeoPixel tools can look widgets up instead
+    of searching the widget tree.
+
+    Roles and their keys:
+        slider, label, value - keyed by color channel for the side pixels (Red, Green, Blue)
+        label                - otherwise keyed by the name before "Label" (time, hue, step)
+        dial                 - keyed by the name before "Dial" (time, hue, step, left, right)
+        heading              - keyed by the capitalized caption (CYCLE, ANIMATION, STEP)
+        square, image        - the color square of a side pixel and the ring layout image
+        patternButton, countButton, directionButton, optionButton, checkBox, stack
+    """
+
+    def __init__(self, widget):
+        self.widget = widget
+        self.roles = {}
+        self.keys = {}
+        for w in widget.findChildren(QWidget): # The only walk through this pane's widgets
+            role, key = self.classify(w.metaObject().className(), w.objectName())
+            if role is not None:
+                self.roles.setdefault(role, []).append(w)
+                self.keys.setdefault((role, key), w)
+
+    def classify(self, className, name):
+        """METHOD: classify
+
+        Decides what role a widget plays from its class and object name
+
+        Called by:
+            __init__
+
+        Arguments:
+            str - The widget's class name
+            str - The widget's object name
+
+        Returns:
+            str, str - The role and the key within that role (either can be None)
+        """
+        channel = next((c for c in CHANNELS if c in name), None)
+        if className == "QSlider":
+            return "slider", channel
+        if className == "QDial":
+            return "dial", name.removesuffix("Dial")
+        if className == "QCheckBox":
+            return "checkBox", None
+        if className == "QPushButton":
+            return "directionButton", name
+        if className == "QStackedWidget":
+            return "stack", None
+        if className == "QRadioButton":
+            if name.startswith("button"):
+                return "countButton", name.removeprefix("button")
+            if name.startswith("front"):
+                return "patternButton", name
+            return "optionButton", name
+        if className == "QLabel":
+            if channel is not None and name.endswith("Value"):
+                return "value", channel
+            if channel is not None and name.endswith("Label"):
+                return "label", channel
+            if name.endswith("Color"):
+                return "square", None
+            if name.endswith("Image"):
+                return "image", None
+            heading = HEADING.search(name)
+            if heading is not None:
+                return "heading", heading.group(1)
+            return "label", name.removesuffix("Label")
+        return None, None
+
+    def get(self, role, key = None):
+        """METHOD: get
+
+        Looks up a single widget by role, and key if the role has several widgets
+
+        Called by:
+            PixelTool.__init__, RingTool.__init__
+
+        Arguments:
+            str - The role of the widget
+            str - The key of the widget within its role (optional)
+
+        Returns:
+            QWidget - The widget
+        """
+        if key is None:
+            return self.roles[role][0]
+        return self.keys[(role, key)]
+
+    def all(self, role):
+        """METHOD: all
+
+        Looks up every widget with a given role, in the order they appear in the UI file
+
+        Called by:
+            RingTool.__init__
+
+        Arguments:
+            str - The role of the widgets
+
+        Returns:
+            list - The widgets
+        """
+        return self.roles.get(role, [])
+
+class WidgetIndex:
+    """CLASS: WidgetIndex
+
+    This class indexes every NeoPixel pane once after setupUi, so building the tools takes a single pass over the widgets in total.
+    """
+
+    def __init__(self, *widgets):
+        self.panels = {w.objectName(): Panel(w) for w in widgets}
+
+    def panel(self, widget):
+        """METHOD: panel
+
+        Access method for the index of a given pane
+
+        Called by:
+            MainWindow.buildLightingTools
+
+        Arguments:
+            QWidget - The pane
+
+        Returns:
+            Panel - The pane's index
+        """
+        return self.panels[widget.objectName()]